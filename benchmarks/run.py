@@ -0,0 +1,261 @@
+"""
+Benchmark de carga / latencia reproducible, sin servicios externos.
+
+1. Genera datos sintéticos (20 zonas x --years años) y construye con ellos el almacén
+   local (STORAGE_BACKEND=local) como sustituto de Supabase.
+2. Lanza la app FastAPI en proceso (httpx + ASGI) con --concurrency clientes a la vez
+   contra /api/zones, /api/audit y /api/dashboard/update.
+3. Micro-benchmarks de ModelService (predicción individual y por lotes, sin caché).
+4. Informa p50 / p95 / p99 y req/s y compara con benchmarks/baseline.json.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.run                     # compara con la referencia (exit 1 si hay regresión)
+    python -m benchmarks.run --save-baseline     # guarda estos resultados como nueva referencia
+    python -m benchmarks.run --years 5 --requests 500 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+ENDPOINT_SCENARIOS = ("zones", "audit_week", "audit_quarter", "dashboard_week", "dashboard_year")
+MICRO_BATCHES = (1, 168, 8760)  # una hora, una semana, un año
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de latencia de la API (datos sintéticos, en proceso).")
+    parser.add_argument("--years", type=int, default=2, help="Años de datos sintéticos")
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones por escenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clientes simultáneos")
+    parser.add_argument("--warmup", type=int, default=5, help="Peticiones de calentamiento por escenario")
+    parser.add_argument("--micro-repeats", type=int, default=30, help="Repeticiones por micro-benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--store-dir", help="Reutiliza/crea el almacén aquí (por defecto, temporal)")
+    parser.add_argument("--with-cache", action="store_true", help="Mantiene la caché de respuestas activa")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="Fichero de referencia")
+    parser.add_argument("--save-baseline", action="store_true", help="Guarda los resultados como referencia")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Margen de regresión sobre el p95 (0.25 = +25%%)")
+    parser.add_argument("--output", help="Guarda los resultados en este JSON")
+    return parser.parse_args()
+
+
+def configure_env(args, store_dir):
+    """La configuración se lee al importar src.config: hay que fijarla antes de importar la app."""
+    os.environ.update({
+        "STORAGE_BACKEND": "local",
+        "LOCAL_STORE_DIR": str(store_dir),
+        "FORECAST_SCHEDULER": "0",
+        "SLOW_REQUEST_SECONDS": "3600",  # sin logs de peticiones lentas durante la medición
+    })
+    if not args.with_cache:
+        os.environ["RESPONSE_CACHE_SIZE"] = "0"
+
+
+def build_store(store_dir, years, seed):
+    from benchmarks.synthetic import generate_frames
+    from src.services.local_store import build_local_store
+
+    if (Path(store_dir) / "meta.json").exists():
+        meta = json.loads((Path(store_dir) / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("source") == f"synthetic:{years}:{seed}":
+            print(f"💾 Reutilizando almacén sintético en {store_dir}")
+            return
+    t0 = time.perf_counter()
+    rows = build_local_store(generate_frames(years=years, seed=seed), store_dir, source=f"synthetic:{years}:{seed}")
+    print(f"💾 {rows:,} filas sintéticas en {time.perf_counter() - t0:.1f} s -> {store_dir}")
+
+
+def make_requests(scenario, n, rng, zones, first_day, last_day):
+    """Lista de (ruta, parámetros) con zonas y ventanas aleatorias (reproducibles por semilla)."""
+    import pandas as pd
+
+    if scenario == "zones":
+        return [("/api/zones", {})] * n
+
+    path = "/api/audit" if scenario.startswith("audit") else "/api/dashboard/update"
+    days = {"week": 7, "quarter": 90, "year": 365}[scenario.split("_")[1]]
+    span = (last_day - first_day).days - days
+    requests = []
+    for _ in range(n):
+        start = first_day + pd.Timedelta(days=int(rng.integers(0, max(span, 1))))
+        requests.append((path, {
+            "zone_name": zones[int(rng.integers(0, len(zones)))],
+            "start_date": start.strftime("%Y-%m-%d"),
+            "end_date": (start + pd.Timedelta(days=days)).strftime("%Y-%m-%d"),
+        }))
+    return requests
+
+
+async def drive(client, requests, concurrency):
+    """Lanza las peticiones con `concurrency` clientes; devuelve (latencias en s, duración total, errores)."""
+    queue = asyncio.Queue()
+    for item in requests:
+        queue.put_nowait(item)
+    latencies, errors = [], []
+
+    async def worker():
+        while not queue.empty():
+            path, params = queue.get_nowait()
+            t0 = time.perf_counter()
+            response = await client.get(path, params=params)
+            latencies.append(time.perf_counter() - t0)
+            if response.status_code != 200:
+                errors.append(f"{response.status_code} {path} {params}")
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - t0, errors
+
+
+def summarize(latencies, wall=None):
+    ms = np.asarray(latencies) * 1000
+    result = {
+        "n": int(len(ms)),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+    if wall:
+        result["rps"] = round(len(ms) / wall, 1)
+    return result
+
+
+async def run_endpoints(args):
+    import httpx
+    import pandas as pd
+    from src.main import app
+    from src.services.storage import storage
+
+    rng = np.random.default_rng(args.seed)
+    zones = await storage.zones()
+    first_day = pd.Timestamp(storage.meta["start"]).normalize()
+    last_day = first_day + pd.Timedelta(hours=storage.meta["hours"])
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for scenario in ENDPOINT_SCENARIOS:
+                requests = make_requests(scenario, args.warmup + args.requests, rng, zones, first_day, last_day)
+                await drive(client, requests[:args.warmup], args.concurrency)
+                latencies, wall, errors = await drive(client, requests[args.warmup:], args.concurrency)
+                if errors:
+                    print(f"⚠️ {scenario}: {len(errors)} errores (p. ej. {errors[0]})")
+                results[scenario] = {**summarize(latencies, wall), "errors": len(errors)}
+                print(f"  {scenario:<16} {_fmt(results[scenario])}")
+    return results
+
+
+def run_micro(args):
+    import pandas as pd
+    from src.services.model_service import predictor
+
+    results = {}
+    zone = predictor.schema.zones[0]
+    for batch in MICRO_BATCHES:
+        timestamps = pd.date_range("2024-01-01", periods=batch, freq="h")
+        temperatures = np.linspace(5, 35, batch)
+        predictor.predict_many(timestamps, zone, temperatures)  # calentamiento (carga sklearn si hace falta)
+        latencies = []
+        for _ in range(args.micro_repeats):
+            predictor.cache.clear()  # mide el modelo, no la caché
+            t0 = time.perf_counter()
+            if batch == 1:
+                predictor.predict(str(timestamps[0]), zone, float(temperatures[0]))
+            else:
+                predictor.predict_many(timestamps, zone, temperatures)
+            latencies.append(time.perf_counter() - t0)
+        name = "predict" if batch == 1 else f"predict_many_{batch}"
+        results[name] = summarize(latencies)
+        print(f"  {name:<16} {_fmt(results[name])}")
+    predictor.cache.clear()
+    return results
+
+
+def _fmt(r):
+    rps = f"  {r['rps']:>8.1f} req/s" if "rps" in r else ""
+    return f"p50 {r['p50_ms']:>9.2f} ms  p95 {r['p95_ms']:>9.2f} ms  p99 {r['p99_ms']:>9.2f} ms{rps}"
+
+
+def compare(results, baseline, tolerance):
+    """Regresión = p95 por encima de la referencia en más de `tolerance` (y de 1 ms, para no saltar por ruido)."""
+    regressions = []
+    print("\n📊 Comparación con la referencia (p95):")
+    for name, current in results.items():
+        ref = baseline.get("scenarios", {}).get(name)
+        if ref is None:
+            print(f"  {name:<16} (sin referencia)")
+            continue
+        change = current["p95_ms"] / ref["p95_ms"] - 1 if ref["p95_ms"] else 0.0
+        regressed = change > tolerance and current["p95_ms"] - ref["p95_ms"] > 1.0
+        mark = "❌" if regressed else "✅"
+        print(f"  {mark} {name:<16} {ref['p95_ms']:>9.2f} -> {current['p95_ms']:>9.2f} ms ({change:+.0%})")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    args = parse_args()
+    tmp = None
+    store_dir = args.store_dir
+    if store_dir is None:
+        tmp = tempfile.TemporaryDirectory(prefix="granada-bench-")
+        store_dir = tmp.name
+
+    configure_env(args, store_dir)
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    build_store(store_dir, args.years, args.seed)
+
+    print(f"\n🚀 Endpoints ({args.requests} peticiones, {args.concurrency} clientes):")
+    scenarios = asyncio.run(run_endpoints(args))
+    print("\n🧠 Modelo (sin caché):")
+    scenarios.update(run_micro(args))
+
+    results = {
+        "meta": {
+            "years": args.years,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "with_cache": args.with_cache,
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} CPUs)",
+            "date": time.strftime("%Y-%m-%d"),
+        },
+        "scenarios": scenarios,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    exit_code = 0
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"\n💾 Referencia guardada en {baseline_path}")
+    elif baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        params = ("years", "requests", "concurrency", "with_cache")
+        if any(baseline["meta"].get(p) != results["meta"][p] for p in params):
+            print("⚠️ La referencia se midió con otros parámetros; la comparación es orientativa.")
+        regressions = compare(scenarios, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ Regresiones: {', '.join(regressions)}")
+            exit_code = 1
+    else:
+        print(f"\nℹ️ Sin referencia en {baseline_path}: usa --save-baseline para crearla.")
+
+    if tmp is not None:
+        tmp.cleanup()
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Datos sintéticos con el esquema de `consumo_granada` (20 zonas x N años, horarios).
+
+Consumo = base por zona x (ciclo diario + semanal + estacional) + efecto temperatura + ruido.
+Determinista para una semilla dada: dos ejecuciones del benchmark leen los mismos datos.
+"""
+import numpy as np
+import pandas as pd
+
+from src.config import ZONES
+from src.services.feature_schema import zone_display_name
+
+
+def generate_frames(years: int = 2, start_year: int = 2023, seed: int = 42):
+    """Un DataFrame por año (memoria acotada) con las columnas de `schema.COLUMNS`."""
+    rng = np.random.default_rng(seed)
+    zones = [zone_display_name(z) for z in ZONES]
+    base = rng.uniform(600, 1600, len(zones))
+
+    for year in range(start_year, start_year + years):
+        ts = pd.date_range(f"{year}-01-01", f"{year}-12-31 23:00", freq="h")
+        hour, dow, doy = ts.hour.to_numpy(), ts.dayofweek.to_numpy(), ts.dayofyear.to_numpy()
+
+        season = np.cos(2 * np.pi * (doy - 15) / 365)
+        temperature = 16 - 9 * season - 5 * np.cos(2 * np.pi * (hour - 15) / 24)
+        daily = 1 + 0.25 * np.sin(2 * np.pi * (hour - 8) / 24)
+        weekly = np.where(dow >= 5, 0.85, 1.0)
+
+        frames = []
+        for zone, zone_base in zip(zones, base):
+            temp = temperature + rng.normal(0, 1.5, len(ts))
+            # Forma de U: más consumo con frío (calefacción) y con calor (aire acondicionado)
+            comfort = 1 + 0.004 * (temp - 19) ** 2
+            consumption = zone_base * daily * weekly * comfort * rng.normal(1, 0.05, len(ts))
+            frames.append(pd.DataFrame({
+                "timestamp": ts,
+                "zone_name": zone,
+                "consumption_kwh": consumption.round(4),
+                "temperature": temp.round(2),
+                "hour": hour,
+                "month": ts.month.to_numpy(),
+                "year": year,
+                "day_of_week": dow,
+                "is_holiday": (dow >= 5).astype(int),
+            }))
+        yield pd.concat(frames, ignore_index=True)
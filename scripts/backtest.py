@@ -0,0 +1,93 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Permite importar src/ al ejecutar "python scripts/backtest.py" desde la raíz
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.config import BACKTEST_START, BACKTEST_WORKERS
+from src.services.backtest import run_backtest, backtest_results, summarize
+
+
+def _fmt(value, spec):
+    return "-" if value is None else format(value, spec)
+
+
+def print_report(summary, top: int):
+    print(f"\n{'Zona':<20}{'Horas':>9}{'MAE':>10}{'RMSE':>10}{'Sesgo':>10}{'MAPE %':>9}")
+    zones = sorted(summary["zones"], key=lambda z: z["metrics"]["mae"] or 0, reverse=True)
+    for z in zones:
+        m = z["metrics"]
+        print(f"{z['zone']:<20}{m['n']:>9}{_fmt(m['mae'], '.2f'):>10}{_fmt(m['rmse'], '.2f'):>10}"
+              f"{_fmt(m['bias'], '.2f'):>10}{_fmt(m['mape'], '.2f'):>9}")
+    m = summary["overall"]
+    print("-" * 68)
+    print(f"{'TOTAL':<20}{m['n']:>9}{_fmt(m['mae'], '.2f'):>10}{_fmt(m['rmse'], '.2f'):>10}"
+          f"{_fmt(m['bias'], '.2f'):>10}{_fmt(m['mape'], '.2f'):>9}")
+
+    worst = sorted(summary["months"], key=lambda r: r["mae"] or 0, reverse=True)[:top]
+    if worst:
+        print(f"\n🔎 Peores {len(worst)} zona x mes por MAE:")
+        for r in worst:
+            print(f"  {r['month']}  {r['zone']:<20} MAE {_fmt(r['mae'], '.2f'):>9}  sesgo {_fmt(r['bias'], '.2f'):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest del histórico por zona x mes en un pool de procesos (reanudable).")
+    parser.add_argument("--start", default=BACKTEST_START, help="Primer mes (por defecto %(default)s)")
+    parser.add_argument("--end", help="Fin exclusivo (por defecto ahora; solo meses completos)")
+    parser.add_argument("--zones", nargs="*", help="Zonas (por defecto todas las del modelo)")
+    parser.add_argument("--workers", type=int, default=BACKTEST_WORKERS, help="Procesos (0 = uno por núcleo)")
+    parser.add_argument("--version", help="Versión del modelo (por defecto la activa)")
+    parser.add_argument("--restart", action="store_true", help="Borra los resultados de la versión y empieza de cero")
+    parser.add_argument("--report", action="store_true", help="Solo muestra los resultados guardados")
+    parser.add_argument("--top", type=int, default=10, help="Peores zona x mes a mostrar")
+    args = parser.parse_args()
+
+    from src.services.model_service import predictor
+    if args.version:
+        predictor.reload(args.version)
+    if not predictor.ensure_loaded():
+        print("❌ No hay modelo que evaluar.")
+        sys.exit(1)
+    version = predictor.model_version
+    results = backtest_results()
+
+    if not args.report:
+        zones = args.zones or predictor.schema.zones
+        print(f"🧪 Backtest del modelo {version}: {len(zones)} zonas desde {args.start}...")
+        t0 = time.perf_counter()
+        last = [0.0]
+
+        def progress(done, total):
+            now = time.perf_counter()
+            if now - last[0] >= 2 or done == total:
+                last[0] = now
+                print(f"   ⏳ {done}/{total} particiones ({done / total:.0%}) en {now - t0:.0f}s")
+
+        try:
+            stats = run_backtest(
+                version, zones, start=args.start, end=args.end, workers=args.workers,
+                results=results, restart=args.restart, progress=progress,
+            )
+        except KeyboardInterrupt:
+            print("\n⏸️ Interrumpido: lo puntuado está guardado, vuelve a lanzarlo para reanudar.")
+            sys.exit(130)
+        except Exception as e:
+            print(f"\n❌ Error en el backtest:\n{e}")
+            sys.exit(1)
+
+        rate = stats["rows"] / stats["elapsed_s"] if stats["elapsed_s"] else 0
+        print(f"🎉 {stats['scored']} particiones puntuadas ({stats['skipped']} ya estaban) con {stats['workers']} procesos "
+              f"en {stats['elapsed_s']:.1f}s: {stats['rows']:,} horas ({rate:,.0f} horas/s).")
+
+    summary = summarize(asyncio.run(results.read(version)))
+    if not summary["months"]:
+        print("⚠️ Sin resultados para esta versión.")
+        return
+    print_report(summary, args.top)
+
+
+if __name__ == "__main__":
+    main()
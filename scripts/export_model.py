@@ -0,0 +1,33 @@
+import argparse
+import os
+import sys
+import time
+
+# Permite importar src/ al ejecutar "python scripts/export_model.py" desde la raíz
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.config import MODEL_ARTIFACT_PATH
+from src.services.model_service import ModelService
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exporta el modelo activo (joblib) al artefacto compacto .npz del motor compilado (arranque sin sklearn).")
+    parser.add_argument("--out", help=f"Ruta del .npz (por defecto junto al joblib activo: registro o {MODEL_ARTIFACT_PATH})")
+    args = parser.parse_args()
+
+    t0 = time.time()
+    service = ModelService(engine="compiled", lazy=False)
+    try:
+        path = service.export_artifact(args.out)
+    except Exception as e:
+        print(f"\n❌ Error exportando el modelo:\n{e}")
+        sys.exit(1)
+
+    size_kb = os.path.getsize(path) / 1024
+    joblib_kb = service.current.joblib_path.stat().st_size / 1024
+    print(f"🎉 {path} ({size_kb:,.0f} KB; joblib {joblib_kb:,.0f} KB), "
+          f"versión {service.model_version}, en {time.time() - t0:.2f} segundos.")
+
+
+if __name__ == "__main__":
+    main()
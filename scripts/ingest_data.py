@@ -1,73 +1,203 @@
-import pandas as pd
+import argparse
+import io
 import os
+import sys
+import time
+
+import pandas as pd
 from sqlalchemy import create_engine
-from dotenv import load_dotenv
-import urllib.parse 
-
-load_dotenv()
-
-def ingest_optimized_data():
-    # --- CONFIGURACIÓN ---
-    DB_USER = os.getenv("DB_USER")
-    DB_PASSWORD = os.getenv("DB_PASSWORD")
-    DB_HOST = os.getenv("DB_HOST")
-    DB_PORT = os.getenv("DB_PORT", "5432")
-    DB_NAME = os.getenv("DB_NAME", "postgres")
-
-    encoded_password = urllib.parse.quote_plus(DB_PASSWORD)
-    DATABASE_URL = f"postgresql://{DB_USER}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-    CSV_PATH = "data/processed/consumo_granada_modelo.csv"
-    
-    if not os.path.exists(CSV_PATH):
-        print(f"❌ Error: No encuentro {CSV_PATH}")
+
+# Permite importar src/ al ejecutar "python scripts/ingest_data.py" desde la raíz
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.config import DATABASE_URL, LOCAL_STORE_DIR
+from src.services.climatology import refresh_climatology
+from src.services.local_store import build_local_store, build_climatology
+from src.services.rollups import refresh_rollups
+from src.services.schema import TABLE, COLUMNS, ensure_schema, ensure_partitions
+
+CSV_PATH = "data/processed/consumo_granada_modelo.csv"
+CHUNKSIZE = 100_000
+
+# --- LA DIETA (SELECCIONAR SOLO LO ÚTIL) ---
+# Para el Dashboard solo necesitamos esto (definido junto al esquema en src/services/schema.py).
+# Las columnas matemáticas (sin/cos/one-hot) las calcula el modelo al vuelo.
+COLUMNAS_ENTERAS = [col for col, tipo in COLUMNS.items() if tipo.startswith('INTEGER')]
+
+# Modos:
+#   full   -> vacía la tabla (TRUNCATE, sin borrarla) y la recarga entera
+#   append -> solo filas más nuevas que el último timestamp de cada zona
+#   upsert -> como append pero reescribe también el último timestamp de cada zona (datos corregidos)
+MODOS = ("full", "append", "upsert")
+
+
+def iter_chunks(csv_path, chunksize=CHUNKSIZE):
+    """Lee el CSV por bloques y devuelve cada bloque ya reducido a COLUMNS (memoria constante)."""
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        # --- RECONSTRUIR ZONE_NAME (por bloque) ---
+        chunk.columns = chunk.columns.str.lower()
+        zone_cols = [col for col in chunk.columns if col.startswith('zona_')]
+        chunk['zone_name'] = chunk[zone_cols].idxmax(axis=1).str.replace('zona_', '').str.replace('_', ' ').str.title()
+        chunk['timestamp'] = pd.to_datetime(chunk['timestamp'])
+
+        light = chunk[list(COLUMNS)].copy()
+        for col in COLUMNAS_ENTERAS:
+            light[col] = light[col].astype('Int64')  # Enteros con nulos (evita "1.0" en un INTEGER)
+        yield light
+
+
+def copy_dataframe(cursor, df, table):
+    """Carga un DataFrame con COPY FROM STDIN (mucho más rápido que INSERTs por lotes)."""
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, date_format='%Y-%m-%d %H:%M:%S')
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def current_max_timestamps(cursor):
+    """Último timestamp cargado por zona: {zona: Timestamp}."""
+    cursor.execute(f"SELECT zone_name, MAX(timestamp) FROM {TABLE} GROUP BY zone_name")
+    return {zone: pd.Timestamp(ts) for zone, ts in cursor.fetchall()}
+
+
+def filter_new_rows(df, max_ts, inclusive):
+    """Se queda con las filas posteriores al máximo de su zona (>= en modo upsert)."""
+    if not max_ts:
+        return df
+    limite = df['zone_name'].map(max_ts)
+    nuevas = df['timestamp'] >= limite if inclusive else df['timestamp'] > limite
+    return df[nuevas | limite.isna()]
+
+
+def upsert_dataframe(cursor, df):
+    """COPY a una tabla temporal y sustitución por (zone_name, timestamp)."""
+    cursor.execute(f"TRUNCATE {TABLE}_staging")
+    copy_dataframe(cursor, df, f"{TABLE}_staging")
+    cursor.execute(f"""
+        DELETE FROM {TABLE} t
+        USING {TABLE}_staging s
+        WHERE t.zone_name = s.zone_name AND t.timestamp = s.timestamp
+    """)
+    cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {TABLE}_staging")
+
+
+def build_local(csv_path=CSV_PATH, chunksize=CHUNKSIZE, out_dir=LOCAL_STORE_DIR):
+    """Almacén columnar local (STORAGE_BACKEND=local): siempre se reconstruye entero."""
+    if not os.path.exists(csv_path):
+        print(f"❌ Error: No encuentro {csv_path}")
+        return
+
+    print(f"💾 Construyendo almacén local en {out_dir}...")
+    t0 = time.time()
+    total = build_local_store(iter_chunks(csv_path, chunksize), out_dir, source=csv_path)
+    print(f"\n🎉 ¡ÉXITO! {total} filas en {time.time() - t0:.1f} s.")
+
+
+def ingest_optimized_data(mode="full", csv_path=CSV_PATH, chunksize=CHUNKSIZE, database_url=DATABASE_URL):
+    if mode not in MODOS:
+        print(f"❌ Modo desconocido '{mode}'. Opciones: {', '.join(MODOS)}")
+        return
+
+    if not os.path.exists(csv_path):
+        print(f"❌ Error: No encuentro {csv_path}")
         return
 
-    print("🚀 Cargando CSV (Versión Optimizada)...")
-    df = pd.read_csv(CSV_PATH)
-    
-    # --- PASO 1: RECONSTRUIR ZONE_NAME ---
-    print("🔄 Reconstruyendo nombre de zona...")
-    df.columns = df.columns.str.lower()
-    zone_cols = [col for col in df.columns if col.startswith('zona_')]
-    
-    # Creamos la columna bonita
-    df['zone_name'] = df[zone_cols].idxmax(axis=1).str.replace('zona_', '').str.replace('_', ' ').str.title()
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-
-    # --- PASO 2: LA DIETA (SELECCIONAR SOLO LO ÚTIL) ---
-    # Para el Dashboard solo necesitamos esto. 
-    # Las columnas matemáticas (sin/cos/one-hot) las calcula el modelo al vuelo.
-    columnas_a_guardar = [
-        'timestamp', 
-        'zone_name', 
-        'consumption_kwh', 
-        'temperature',
-        'hour', 
-        'month', 
-        'year', 
-        'day_of_week', 
-        'is_holiday' # Esta sí es útil para filtrar en gráficas
-    ]
-    
-    df_light = df[columnas_a_guardar].copy()
-    
-    print(f"📉 Reducción de columnas: De {len(df.columns)} a {len(df_light.columns)}")
-    print(f"📊 Ejemplo final ({len(df_light)} filas):")
-    print(df_light.head(3))
-    
-    # --- PASO 3: SUBIR VERSIÓN LIGHT ---
+    print(f"🚀 Ingesta en streaming (modo {mode}, bloques de {chunksize} filas)...")
+    t0 = time.time()
+
     try:
         print("☁️ Conectando a Supabase...")
-        engine = create_engine(DATABASE_URL)
-        
-        print("📤 Subiendo tabla optimizada...")
-        # Usamos chunksize más grande porque ahora pesan menos las filas
-        df_light.to_sql('consumo_granada', engine, if_exists='replace', index=False, chunksize=5000)
-        
-        print("\n🎉 ¡ÉXITO! Datos subidos. Deberían ocupar aprox 150-200MB.")
-        
+        engine = create_engine(database_url)
+        total, first_ts, last_ts = 0, None, None
+
+        # Una sola transacción: esquema, COPY y upserts se confirman juntos
+        with engine.begin() as conn:
+            # --- ESQUEMA: tabla particionada por año + índices (zone_name, timestamp) y BRIN ---
+            ensure_schema(conn, recreate=(mode == "full"))
+            cursor = conn.connection.cursor()
+
+            max_ts = {}
+            if mode == "full":
+                # Vacía sin borrar la tabla: se conservan particiones, índices y permisos
+                cursor.execute(f"TRUNCATE {TABLE}")
+            else:
+                max_ts = current_max_timestamps(cursor)
+                print(f"🔎 Último dato cargado en {len(max_ts)} zonas.")
+                if mode == "upsert":
+                    cursor.execute(f"CREATE TEMP TABLE {TABLE}_staging (LIKE {TABLE}) ON COMMIT DROP")
+
+            # --- SUBIDA POR BLOQUES ---
+            for chunk in iter_chunks(csv_path, chunksize):
+                if mode != "full":
+                    chunk = filter_new_rows(chunk, max_ts, inclusive=(mode == "upsert"))
+                if chunk.empty:
+                    continue
+
+                # Partición del año antes de copiar (si la tabla está particionada)
+                created = ensure_partitions(conn, chunk['timestamp'].dt.year.unique())
+                if created:
+                    print(f"🗂️ Particiones creadas: {', '.join(map(str, created))}")
+
+                if mode == "upsert":
+                    upsert_dataframe(cursor, chunk)
+                else:
+                    copy_dataframe(cursor, chunk, TABLE)
+
+                total += len(chunk)
+                lo, hi = chunk['timestamp'].min(), chunk['timestamp'].max()
+                first_ts = lo if first_ts is None else min(first_ts, lo)
+                last_ts = hi if last_ts is None else max(last_ts, hi)
+                print(f"📤 {total} filas cargadas...")
+
+        if total == 0:
+            print("\n✅ Nada nuevo que cargar: la tabla ya está al día.")
+            return
+
+        # --- ROLLUPS (día / mes) para rankings y KPIs ---
+        print("🧮 Calculando agregados diarios y mensuales...")
+        if mode == "full":
+            refresh_rollups(engine)
+        else:
+            # Solo los días/meses tocados por las filas nuevas
+            refresh_rollups(engine, first_ts.to_pydatetime(), last_ts.to_pydatetime())
+
+        # --- CLIMATOLOGÍA (zona x mes x hora) para las simulaciones del modo futuro ---
+        print("🌡️ Calculando climatología de temperatura...")
+        refresh_climatology(engine)
+
+        elapsed = time.time() - t0
+        print(f"\n🎉 ¡ÉXITO! {total} filas ({first_ts} → {last_ts}) en {elapsed:.1f} s ({total / elapsed:,.0f} filas/s).")
+
     except Exception as e:
         print(f"\n❌ Error en la subida:\n{e}")
 
+
+def rebuild_climatology(target, database_url=DATABASE_URL, out_dir=LOCAL_STORE_DIR):
+    """Solo la climatología, desde los datos ya cargados (sin releer el CSV)."""
+    t0 = time.time()
+    try:
+        if target == "local":
+            cells = build_climatology(out_dir).summary()["cells"]
+        else:
+            cells = refresh_climatology(create_engine(database_url))
+        print(f"🌡️ Climatología: {cells} celdas zona x mes x hora en {time.time() - t0:.1f} s.")
+    except Exception as e:
+        print(f"\n❌ Error calculando la climatología:\n{e}")
+
+
 if __name__ == "__main__":
-    ingest_optimized_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Carga consumo_granada en Supabase con COPY en streaming.")
+    parser.add_argument("--mode", choices=MODOS, default="full", help="full | append | upsert (por defecto full)")
+    parser.add_argument("--csv", default=CSV_PATH, help="Ruta del CSV procesado")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE, help="Filas por bloque")
+    parser.add_argument("--target", choices=("postgres", "local"), default="postgres",
+                        help="postgres (Supabase) o local (arrays en data/store, ignora --mode)")
+    parser.add_argument("--climatology-only", action="store_true",
+                        help="Solo recalcula la climatología de temperatura con los datos ya cargados")
+    args = parser.parse_args()
+
+    if args.climatology_only:
+        rebuild_climatology(args.target)
+    elif args.target == "local":
+        build_local(csv_path=args.csv, chunksize=args.chunksize)
+    else:
+        ingest_optimized_data(mode=args.mode, csv_path=args.csv, chunksize=args.chunksize)
@@ -0,0 +1,43 @@
+import argparse
+import os
+import sys
+
+# Permite importar src/ al ejecutar "python scripts/model_registry.py" desde la raíz
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.config import MODEL_PATH
+from src.services.model_registry import ModelRegistry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registro de versiones del modelo (data/models/registry).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Versiones publicadas")
+    publish = sub.add_parser("publish", help="Publica un joblib ya entrenado")
+    publish.add_argument("path", nargs="?", default=str(MODEL_PATH), help="Joblib (por defecto %(default)s)")
+    publish.add_argument("--no-activate", action="store_true", help="Publica sin marcarla como activa")
+    activate = sub.add_parser("activate", help="Marca una versión como activa (p. ej. rollback)")
+    activate.add_argument("version")
+    args = parser.parse_args()
+
+    registry = ModelRegistry()
+    try:
+        if args.command == "publish":
+            version = registry.publish(args.path, activate=not args.no_activate, source=os.path.basename(args.path))
+            print(f"📦 Versión {version} publicada{' y activa' if not args.no_activate else ''}.")
+        elif args.command == "activate":
+            registry.activate(args.version)
+            print(f"✅ Versión activa: {args.version} (la API la carga con /api/admin/models/reload o el vigilante).")
+        else:
+            current = registry.current()
+            for meta in registry.versions():
+                mark = "*" if meta["version"] == current else " "
+                print(f" {mark} {meta['version']}  {meta.get('created_at', '-'):<20} {meta.get('metrics', {})}")
+            if current is None:
+                print(f"(sin registro: la API usa {MODEL_PATH})")
+    except Exception as e:
+        print(f"\n❌ Error en el registro:\n{e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Permite importar src/ al ejecutar "python scripts/precompute_forecasts.py" desde la raíz
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.config import FORECAST_DAYS
+from src.database import engine
+from src.services.model_service import predictor
+from src.services.forecast_service import precompute_forecasts, FORECAST_TABLE
+from src.services.storage import storage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precalcula previsiones horarias por zona en forecast_granada.")
+    parser.add_argument("--days", type=int, default=FORECAST_DAYS, help="Horizonte en días (por defecto %(default)s)")
+    parser.add_argument("--zones", nargs="*", help="Zonas a calcular (por defecto todas las del modelo)")
+    parser.add_argument("--start", help="Inicio ISO (por defecto la hora actual)")
+    args = parser.parse_args()
+
+    print(f"🗓️ Precalculando {args.days} días de previsiones (modelo {predictor.model_version})...")
+    t0 = time.time()
+    try:
+        climatology = asyncio.run(storage.climatology())
+        if climatology is None:
+            print("⚠️ Sin climatología: se usa la temperatura fija SIMULATION_TEMPERATURE.")
+        rows = precompute_forecasts(engine, predictor, days=args.days, zones=args.zones, start=args.start,
+                                    climatology=climatology)
+    except Exception as e:
+        print(f"\n❌ Error guardando previsiones:\n{e}")
+        sys.exit(1)
+    print(f"🎉 {rows} filas escritas en {FORECAST_TABLE} en {time.time() - t0:.2f} segundos.")
+
+
+if __name__ == "__main__":
+    main()
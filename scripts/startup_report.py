@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Se ejecuta en un proceso NUEVO (arranque en frío real): import de la app, primera
+# respuesta sin modelo ("/dashboard") y primera / segunda inferencia.
+PROBE = """
+import json, time
+t0 = time.perf_counter()
+import src.main
+t_import = time.perf_counter() - t0
+
+from starlette.testclient import TestClient
+from src.services import startup
+from src.services.model_service import predictor
+client = TestClient(src.main.app)  # sin `with`: no arranca el lifespan (ni BD ni scheduler)
+
+t0 = time.perf_counter()
+client.get("/dashboard")
+t_page = time.perf_counter() - t0
+
+timings = {}
+for name in ("first_inference", "second_inference"):
+    t0 = time.perf_counter()
+    predictor.predict("2024-06-01 12:00", predictor.schema.zones[0], 20.0)
+    timings[name] = time.perf_counter() - t0
+    predictor.cache.clear()
+
+print(json.dumps({
+    "import_app": t_import, "first_page": t_page, **timings,
+    "phases": startup.report(), "model_source": predictor.source,
+}))
+"""
+
+
+def parse_importtime(stderr: str, target: str = "src.main"):
+    """Tiempo propio (s) por paquete raíz dentro del subárbol de imports de `target`."""
+    subtree = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, _cumulative, name = line[len("import time:"):].split("|")
+        if not own.strip().isdigit():
+            continue  # cabecera
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if depth == 0 and name != target:
+            subtree = []  # imports previos del propio script de sondeo
+            continue
+        subtree.append((name, int(own) / 1e6))
+        if depth == 0:
+            break
+
+    by_package = defaultdict(float)
+    for name, own in subtree:
+        root = name.split(".")[0]
+        by_package["src (la app)" if root == "src" else root] += own
+    return dict(sorted(by_package.items(), key=lambda kv: -kv[1]))
+
+
+def run_probe(lazy: bool):
+    env = {**os.environ, "MODEL_LAZY_LOAD": "1" if lazy else "0", "FORECAST_SCHEDULER": "0"}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["packages"] = parse_importtime(proc.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Desglose del arranque en frío de la API (import, modelo, primera petición).")
+    parser.add_argument("--eager", action="store_true", help="Carga el modelo al importar (MODEL_LAZY_LOAD=0)")
+    parser.add_argument("--top", type=int, default=12, help="Paquetes a mostrar")
+    args = parser.parse_args()
+
+    mode = "eager (MODEL_LAZY_LOAD=0)" if args.eager else "diferido (MODEL_LAZY_LOAD=1)"
+    print(f"⏱️ Arranque en frío, modelo {mode}...")
+    try:
+        r = run_probe(lazy=not args.eager)
+    except Exception as e:
+        print(f"\n❌ Error en el sondeo:\n{e}")
+        sys.exit(1)
+
+    print(f"\n  import src.main           {r['import_app'] * 1000:8.0f} ms")
+    print(f"  primera página (/dashboard){r['first_page'] * 1000:7.0f} ms")
+    print(f"  primera inferencia        {r['first_inference'] * 1000:8.0f} ms  (incluye cargar el modelo si es diferido)")
+    print(f"  segunda inferencia        {r['second_inference'] * 1000:8.0f} ms")
+    print(f"  origen del modelo         {r['model_source']}")
+    for phase, ms in r["phases"].items():
+        print(f"  {phase:<26}{ms:8.0f} ms")
+
+    print("\n📦 Import de la app por paquete (tiempo propio):")
+    for package, seconds in list(r["packages"].items())[:args.top]:
+        print(f"  {package:<26}{seconds * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
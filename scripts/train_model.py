@@ -1,80 +1,120 @@
-import pandas as pd
+import argparse
 import numpy as np
 import joblib
 import os
 import time
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
+# Permite importar src/ al ejecutar "python scripts/train_model.py" desde la raíz
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.services.feature_schema import ZONE_CODE_FEATURE
+from src.services.model_registry import ModelRegistry
+from src.services.training_data import load_training_data
+
 # --- CONFIGURACIÓN ---
 CSV_PATH = "data/processed/consumo_granada_modelo.csv"
 MODEL_DIR = "data/models"
 MODEL_NAME = "gradient_boosting_model.joblib"
 MODEL_PATH = os.path.join(MODEL_DIR, MODEL_NAME)
 
-def train_production_model():
-    print("🧠 INICIANDO ENTRENAMIENTO DEL MODELO 'TOP'...")
-    start_time = time.time()
-
-    # 1. Cargar datos
-    if not os.path.exists(CSV_PATH):
-        print(f"❌ Error: No encuentro el archivo {CSV_PATH}")
-        return
+# gbr:  GradientBoostingRegressor de siempre (un hilo; lo sirve el motor compilado de la API)
+# hist: HistGradientBoostingRegressor (multinúcleo, early stopping, zona como categoría nativa)
+# both: entrena los dos, compara y se queda con el de menor MAE
+ENGINES = ("gbr", "hist", "both")
+
+
+def build_model(engine):
+    if engine == "gbr":
+        # Hiperparámetros del Notebook: suelen dar el mejor equilibrio para este tipo de datos
+        return GradientBoostingRegressor(
+            n_estimators=300,       # Número de árboles (Potencia)
+            learning_rate=0.1,      # Velocidad de aprendizaje
+            max_depth=5,            # Profundidad (Complejidad)
+            min_samples_split=10,   # Evitar overfitting
+            min_samples_leaf=5,     # Evitar overfitting
+            random_state=42,
+        )
+    # Histogramas de 256 bins en todos los núcleos; para cuando deja de mejorar en validación
+    return HistGradientBoostingRegressor(
+        max_iter=1000,
+        learning_rate=0.1,
+        max_leaf_nodes=63,
+        early_stopping=True,
+        validation_fraction=0.1,
+        n_iter_no_change=20,
+        categorical_features=[ZONE_CODE_FEATURE],
+        random_state=42,
+    )
 
-    print("📂 Cargando dataset procesado...")
-    df = pd.read_csv(CSV_PATH)
 
-    # 2. Separar Features (X) y Target (y)
-    # Eliminamos columnas que no entran al modelo matemático
-    cols_to_drop = ['timestamp', 'consumption_kwh', 'zone_name'] 
-    
-    # Filtrar solo columnas que existen en el DF
-    cols_to_drop = [c for c in cols_to_drop if c in df.columns]
+def fit_and_evaluate(engine, data, train_idx, test_idx):
+    """Entrena un motor sobre el split y devuelve (modelo, tiempos y métricas)."""
+    categorical = engine == "hist"
+    X_train, X_test = data.frame(train_idx, categorical), data.frame(test_idx, categorical)
+    y_train, y_test = data.y[train_idx], data.y[test_idx]
 
-    X = df.drop(columns=cols_to_drop)
-    y = df['consumption_kwh']
+    model = build_model(engine)
+    print(f"🔥 Entrenando {type(model).__name__}...")
+    t0 = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - t0
 
-    print(f"📊 Dimensiones de entrenamiento: {X.shape}")
-    print(f"   Features ({len(X.columns)}): {list(X.columns)[:5]} ...")
+    t0 = time.perf_counter()
+    predictions = model.predict(X_test)
+    predict_s = time.perf_counter() - t0
 
-    # 3. Split Train/Test (80% - 20%)
-    # Usamos random_state=42 para que siempre salga el mismo resultado (reproducibilidad)
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-    # 4. Configuración del Modelo (Hiperparámetros del Notebook)
-    # Estos valores suelen dar el mejor equilibrio para este tipo de datos
-    gb_model = GradientBoostingRegressor(
-        n_estimators=300,       # Número de árboles (Potencia)
-        learning_rate=0.1,      # Velocidad de aprendizaje
-        max_depth=5,            # Profundidad (Complejidad)
-        min_samples_split=10,   # Evitar overfitting
-        min_samples_leaf=5,     # Evitar overfitting
-        random_state=42,
-        verbose=1               # Muestra progreso
-    )
+    return model, {
+        "engine": engine,
+        "trees": int(model.n_estimators_ if engine == "gbr" else model.n_iter_),
+        "fit_s": fit_s,
+        "predict_s": predict_s,
+        "mae": mean_absolute_error(y_test, predictions),
+        "rmse": float(np.sqrt(mean_squared_error(y_test, predictions))),
+        "r2": r2_score(y_test, predictions),
+    }
 
-    # 5. Entrenamiento
-    print("\n🔥 Entrenando Gradient Boosting (Paciencia, busca la mejor precisión)...")
-    gb_model.fit(X_train, y_train)
 
-    # 6. Evaluación
-    print("\n🧐 Evaluando rendimiento...")
-    predictions = gb_model.predict(X_test)
+def train_production_model(engine="gbr", csv_path=CSV_PATH, use_cache=True, publish=True):
+    print("🧠 INICIANDO ENTRENAMIENTO DEL MODELO 'TOP'...")
+    start_time = time.time()
 
-    mae = mean_absolute_error(y_test, predictions)
-    rmse = np.sqrt(mean_squared_error(y_test, predictions))
-    r2 = r2_score(y_test, predictions)
+    # 1. Cargar datos (matriz de features cacheada en binario por huella del CSV)
+    if not os.path.exists(csv_path):
+        print(f"❌ Error: No encuentro el archivo {csv_path}")
+        return
 
-    print("\n" + "="*50)
-    print(f"🏆 RESULTADOS DEL MODELO FINAL")
-    print("="*50)
-    print(f"Error Medio Absoluto (MAE):   {mae:.2f} kWh")
-    print(f"Raíz Error Cuadrático (RMSE): {rmse:.2f} kWh")
-    print(f"Precisión (R² Score):         {r2:.4f}")
-    print("-" * 50)
+    t0 = time.perf_counter()
+    data, hit = load_training_data(csv_path, use_cache=use_cache)
+    origin = "caché" if hit else "CSV"
+    print(f"📂 Dataset cargado desde {origin} en {time.perf_counter() - t0:.2f}s")
+    print(f"📊 Dimensiones de entrenamiento: {data.X.shape}")
 
-    # 7. Verificación de Calidad
+    # 2. Split Train/Test (80% - 20%)
+    # Usamos random_state=42 para que siempre salga el mismo resultado (reproducibilidad)
+    train_idx, test_idx = train_test_split(np.arange(len(data)), test_size=0.2, random_state=42)
+
+    # 3. Entrenamiento y evaluación
+    engines = ("gbr", "hist") if engine == "both" else (engine,)
+    results = [fit_and_evaluate(e, data, train_idx, test_idx) for e in engines]
+
+    print("\n" + "="*72)
+    print(f"🏆 RESULTADOS ({len(test_idx):,} filas de test)")
+    print("="*72)
+    print(f"{'Motor':<6}{'Árboles':>9}{'Entreno':>11}{'Predicción':>12}{'MAE':>10}{'RMSE':>10}{'R²':>9}")
+    for _, r in results:
+        print(f"{r['engine']:<6}{r['trees']:>9}{r['fit_s']:>10.1f}s{r['predict_s']:>11.2f}s"
+              f"{r['mae']:>10.2f}{r['rmse']:>10.2f}{r['r2']:>9.4f}")
+    print("-" * 72)
+
+    model, best = min(results, key=lambda pair: pair[1]["mae"])
+    if len(results) > 1:
+        print(f"🥇 Mejor MAE: {best['engine']}")
+
+    # 4. Verificación de Calidad
+    mae = best["mae"]
     if mae < 250:
         print("✅ CALIDAD: EXCELENTE. El modelo está listo para producción.")
     elif mae < 450:
@@ -82,15 +122,41 @@ def train_production_model():
     else:
         print("❌ CALIDAD: BAJA. Algo ha fallado en los datos.")
 
-    # 8. Guardar Modelo
+    if not publish:
+        print(f"\n⏱️ Tiempo total: {time.time() - start_time:.2f} segundos (sin guardar)")
+        return
+
+    # 5. Guardar Modelo
     if not os.path.exists(MODEL_DIR):
         os.makedirs(MODEL_DIR)
 
-    joblib.dump(gb_model, MODEL_PATH)
-    
+    joblib.dump(model, MODEL_PATH)
+
+    # 6. Publicar en el registro de versiones (la API lo activa en caliente, sin reiniciar)
+    registry = ModelRegistry()
+    version = registry.publish(
+        MODEL_PATH,
+        metrics={"mae": round(best["mae"], 3), "rmse": round(best["rmse"], 3), "r2": round(best["r2"], 5)},
+        engine=best["engine"],
+        n_features=int(model.n_features_in_),
+        train_rows=len(train_idx),
+        fit_seconds=round(best["fit_s"], 1),
+        dataset_hash=data.source_hash[:16],
+    )
+
     elapsed = time.time() - start_time
     print(f"\n💾 Modelo guardado en: {MODEL_PATH}")
+    print(f"📦 Publicado en el registro como versión {version} (activa): {registry.root / version}")
+    print("💡 Actívalo en la API: POST /api/admin/models/reload (o MODEL_WATCH_SECONDS > 0)")
     print(f"⏱️ Tiempo total: {elapsed:.2f} segundos")
 
+
 if __name__ == "__main__":
-    train_production_model()    
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Entrena el modelo de consumo y lo publica en el registro.")
+    parser.add_argument("--engine", choices=ENGINES, default="gbr", help="Motor de boosting (por defecto gbr)")
+    parser.add_argument("--csv", default=CSV_PATH, help="CSV procesado de entrenamiento")
+    parser.add_argument("--no-cache", action="store_true", help="Parsea el CSV sin leer ni escribir la caché")
+    parser.add_argument("--no-publish", action="store_true", help="Solo entrena y compara; no guarda ni publica")
+    args = parser.parse_args()
+
+    train_production_model(args.engine, args.csv, use_cache=not args.no_cache, publish=not args.no_publish)
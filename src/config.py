@@ -16,6 +16,99 @@ TEMPLATES_DIR = BASE_DIR / "src" / "templates"
 # --- RUTA DEL MODELO ---
 # Apunta al archivo exacto que generó el script de entrenamiento
 MODEL_PATH = MODELS_DIR / "gradient_boosting_model.joblib"
+# Artefacto compacto del motor compilado (`python scripts/export_model.py`): se carga sin sklearn ni joblib
+MODEL_ARTIFACT_PATH = MODELS_DIR / "gradient_boosting_model.npz"
+# Carga diferida: el modelo (y pandas / sklearn) se cargan en la primera inferencia, no al importar la app.
+# Activada por defecto en Vercel (arranques en frío); en local se carga al arrancar.
+MODEL_LAZY_LOAD = os.getenv("MODEL_LAZY_LOAD", "1" if os.getenv("VERCEL") else "0") == "1"
+# Registro de versiones (model.joblib + model.npz + meta.json por versión; CURRENT = activa).
+# Si no existe se usa MODEL_PATH. Ver src/services/model_registry.py
+MODEL_REGISTRY_DIR = Path(os.getenv("MODEL_REGISTRY_DIR", str(MODELS_DIR / "registry")))
+# Cada cuántos segundos se mira si cambió la versión activa para recargarla en caliente (0 = no se vigila)
+MODEL_WATCH_SECONDS = float(os.getenv("MODEL_WATCH_SECONDS", "0"))
+# Token de los endpoints /api/admin (cabecera X-Admin-Token). Sin token, desactivados.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Motor de inferencia: "compiled" (árboles aplanados en NumPy) o "sklearn" (predict estándar)
+# Si el motor compilado no es equivalente a sklearn se vuelve a "sklearn" automáticamente.
+MODEL_ENGINE = os.getenv("MODEL_ENGINE", "compiled").lower()
+# Por encima de este tamaño de lote el bucle en Cython de sklearn es más rápido que el recorrido NumPy.
+# Medido con el modelo real (300 árboles, profundidad 5), compilado vs sklearn en ms:
+# 1 fila 0.08/1.32, 50 0.57/1.21, 100 1.03/1.43, 192 2.2/1.6, 500 7.8/2.9, 1000 23/4.
+# El recorrido NumPy ya va por niveles con todos los árboles a la vez (un gather de filas x árboles
+# por nivel), así que su coste crece lineal con filas x 300 árboles; el corte cae entre 100 y 150.
+# Con otro modelo conviene volver a medir (engine.predict vs model.predict) y ajustar este valor.
+COMPILED_MAX_BATCH = int(os.getenv("COMPILED_MAX_BATCH", "128"))
+
+# Caché de predicciones (zona + franja de calendario + temperatura exacta)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "50000"))  # 0 = desactivada
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "21600"))  # segundos (6 h)
+
+# Caché de respuestas (dashboard / auditoría) por endpoint + zona + rango
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))  # 0 = desactivada
+# Rangos ya pasados no cambian: TTL largo. Los que tocan "ahora" (o el futuro): TTL corto
+RESPONSE_CACHE_TTL_HISTORICAL = float(os.getenv("RESPONSE_CACHE_TTL_HISTORICAL", "86400"))
+RESPONSE_CACHE_TTL_RECENT = float(os.getenv("RESPONSE_CACHE_TTL_RECENT", "60"))
+
+# Caché HTTP (ETag): cada cuánto se re-comprueba la versión de los datos y max-age de rangos históricos
+DATA_VERSION_TTL = float(os.getenv("DATA_VERSION_TTL", "60"))
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "86400"))
+
+# Peticiones más lentas que esto se registran en consola con su desglose (BD / modelo / resto)
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+
+# --- ZONAS ---
+# Slugs canónicos (minúsculas con guiones bajos), en el mismo orden que las columnas one-hot del modelo.
+# En la BD el nombre va "bonito" ("Albaicin Alto"); ambos se normalizan al mismo slug.
+ZONES = (
+    "albaicin_alto", "albaicin_bajo", "bola_de_oro", "camino_ronda",
+    "cartuja", "centro_catedral", "cervantes", "chana_barrio",
+    "chana_bobadilla", "fuentenueva", "mercagranada", "norte_almanjayar",
+    "pedro_antonio", "periodistas", "plaza_toros", "pts_tecnologico",
+    "realejo", "sacromonte", "zaidin_nuevo", "zaidin_vergeles",
+)
+
+# --- SERIES / RANGOS ---
+# Máximo de puntos por gráfico: por encima se agrega (día/semana/mes) o se submuestrea (LTTB)
+SERIES_POINT_BUDGET = int(os.getenv("SERIES_POINT_BUDGET", "500"))
+# La auditoría predice hora a hora: se limita a un año para acotar la inferencia
+AUDIT_MAX_DAYS = int(os.getenv("AUDIT_MAX_DAYS", "366"))
+# Auditoría en streaming (/api/audit/stream): se lee y predice por tramos, memoria constante
+AUDIT_STREAM_MAX_DAYS = int(os.getenv("AUDIT_STREAM_MAX_DAYS", "3660"))
+AUDIT_STREAM_CHUNK_HOURS = int(os.getenv("AUDIT_STREAM_CHUNK_HOURS", "720"))
+# Exportación masiva (/api/export): lotes de DB_FETCH_BATCH_ROWS filas, memoria acotada
+EXPORT_MAX_DAYS = int(os.getenv("EXPORT_MAX_DAYS", "3660"))
+
+# --- SIMULACIÓN / PREVISIONES ---
+# Temperatura fija del modo futuro si no hay climatología (o la celda zona x mes x hora no tiene datos)
+SIMULATION_TEMPERATURE = float(os.getenv("SIMULATION_TEMPERATURE", "15.0"))
+# Estadístico de la climatología usado en el modo futuro: "mean", "p10", "p50" o "p90"
+SIMULATION_TEMPERATURE_STAT = os.getenv("SIMULATION_TEMPERATURE_STAT", "mean")
+# Paso (°C) al que se redondean las temperaturas SIMULADAS antes de predecir: horas con la misma
+# temperatura redondeada comparten entrada en la caché de predicciones (0 = sin redondeo).
+# Los datos reales se predicen y cachean siempre con su temperatura exacta.
+SIMULATION_TEMPERATURE_STEP = float(os.getenv("SIMULATION_TEMPERATURE_STEP", "0.1"))
+# Horizonte (días) de las previsiones precalculadas en `forecast_granada`
+FORECAST_DAYS = int(os.getenv("FORECAST_DAYS", "14"))
+# Cada cuántas horas se regeneran (además de tras cada carga de modelo)
+FORECAST_REFRESH_HOURS = float(os.getenv("FORECAST_REFRESH_HOURS", "6"))
+# Tarea en segundo plano dentro de la app ("0" para desactivarla, p. ej. en serverless)
+FORECAST_SCHEDULER = os.getenv("FORECAST_SCHEDULER", "1") == "1"
+
+# --- ALMACENAMIENTO ---
+# "postgres": Supabase (DATABASE_URL). "local": almacén columnar en disco (arrays NumPy
+# memory-mapped por zona) construido con `python scripts/ingest_data.py --target local`.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "postgres").lower()
+LOCAL_STORE_DIR = Path(os.getenv("LOCAL_STORE_DIR", str(DATA_DIR / "store")))
+
+# --- BACKTEST ---
+# Histórico completo puntuado por zona x mes en un pool de procesos (0 = un proceso por núcleo)
+BACKTEST_WORKERS = int(os.getenv("BACKTEST_WORKERS", "0"))
+BACKTEST_START = os.getenv("BACKTEST_START", "2015-01-01")
+
+# --- ENTRENAMIENTO ---
+# Matriz de features del CSV procesado en binario (.npz), por huella del CSV (scripts/train_model.py)
+TRAINING_CACHE_DIR = Path(os.getenv("TRAINING_CACHE_DIR", str(DATA_DIR / "cache")))
 
 # --- CONFIGURACIÓN BASE DE DATOS (SUPABASE) ---
 DB_USER = os.getenv("DB_USER")
@@ -26,4 +119,10 @@ DB_NAME = os.getenv("DB_NAME", "postgres")
 
 # Construcción segura de la URL (Codificando símbolos en la contraseña)
 encoded_password = urllib.parse.quote_plus(DB_PASSWORD) if DB_PASSWORD else ""
-DATABASE_URL = f"postgresql://{DB_USER}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
\ No newline at end of file
+DATABASE_URL = f"postgresql://{DB_USER}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Pool de conexiones (compartido por todos los endpoints; las consultas async usan uno por consulta)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Lecturas grandes: filas por lote del cursor de servidor (memoria acotada en rangos largos)
+DB_FETCH_BATCH_ROWS = int(os.getenv("DB_FETCH_BATCH_ROWS", "10000"))
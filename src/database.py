@@ -1,10 +1,19 @@
-from sqlalchemy import create_engine
+import time
+import anyio
+import numpy as np
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base
-from src.config import DATABASE_URL
+from src.config import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_FETCH_BATCH_ROWS
+from src.services.metrics import DB_QUERY_LATENCY, DB_ROWS, DB_POOL_WAIT, add_phase
 
 # 1. Crear el motor de conexión
 # pool_pre_ping=True es VITAL para Supabase: reconecta si la conexión se cae.
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+engine = create_engine(
+    DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+)
 
 # 2. Crear la fábrica de sesiones
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -17,4 +26,129 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# 4. Acceso NO bloqueante para los endpoints async
+# Las consultas síncronas de SQLAlchemy se ejecutan en hilos de trabajo; el limitador
+# evita lanzar más hilos que conexiones tiene el pool (el resto espera sin bloquear el loop).
+_limiter = anyio.CapacityLimiter(DB_POOL_SIZE + DB_MAX_OVERFLOW)
+
+
+def _connect():
+    # Checkout del pool (incluye el pre-ping y, si hace falta, abrir la conexión)
+    t0 = time.perf_counter()
+    conn = engine.connect()
+    DB_POOL_WAIT.observe(time.perf_counter() - t0, stage="checkout")
+    return conn
+
+
+async def _run_query(fn, name, *args):
+    """Ejecuta `fn` en un hilo con el limitador y registra espera, duración y fase de la petición."""
+    t0 = time.perf_counter()
+    async with _limiter:
+        DB_POOL_WAIT.observe(time.perf_counter() - t0, stage="limiter")
+        result = await anyio.to_thread.run_sync(fn, *args)
+    elapsed = time.perf_counter() - t0
+    DB_QUERY_LATENCY.observe(elapsed, query=name)
+    add_phase("db", elapsed)
+    return result
+
+
+def _fetch_all(query, params):
+    # Cada llamada usa su propia conexión del pool: varias pueden ir en paralelo
+    with _connect() as conn:
+        return conn.execute(query, params or {}).fetchall()
+
+
+async def fetch_all(query, params=None, name="sql"):
+    """Ejecuta una consulta de lectura en el threadpool y devuelve todas las filas."""
+    if isinstance(query, str):
+        query = text(query)
+    rows = await _run_query(_fetch_all, name, query, params)
+    DB_ROWS.inc(len(rows), query=name)
+    return rows
+
+
+def _fetch_columns(query, params, dtypes):
+    # Cursor de servidor: las filas llegan por lotes y cada lote pasa directo a arrays NumPy
+    parts = {name: [] for name in dtypes}
+    with _connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=DB_FETCH_BATCH_ROWS).execute(query, params or {})
+        for batch in result.partitions():
+            for (name, dtype), values in zip(dtypes.items(), zip(*batch)):
+                parts[name].append(np.array(values, dtype=dtype))  # NULL -> NaN / NaT
+    return {
+        name: np.concatenate(parts[name]) if parts[name] else np.empty(0, dtype=dtype)
+        for name, dtype in dtypes.items()
+    }
+
+
+async def fetch_columns(query, dtypes, params=None, name="sql"):
+    """
+    Lectura columnar para rangos grandes: {columna: array} en el orden del SELECT.
+    `dtypes` mapea cada columna a su tipo NumPy (p. ej. "datetime64[us]", np.float32, object).
+    """
+    if isinstance(query, str):
+        query = text(query)
+    columns = await _run_query(_fetch_columns, name, query, params, dtypes)
+    DB_ROWS.inc(len(next(iter(columns.values()), ())), query=name)
+    return columns
+
+
+def _iter_columns(query, params, dtypes):
+    # Generador síncrono: la conexión (y el cursor de servidor) viven mientras se consume
+    with _connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=DB_FETCH_BATCH_ROWS).execute(query, params or {})
+        for batch in result.partitions():
+            yield {name: np.array(values, dtype=dtype) for (name, dtype), values in zip(dtypes.items(), zip(*batch))}
+
+
+_END = object()
+
+
+async def stream_columns(query, dtypes, params=None, name="sql"):
+    """
+    Como `fetch_columns` pero entregando lote a lote (DB_FETCH_BATCH_ROWS filas) según se
+    consumen: memoria acotada aunque el resultado tenga millones de filas (exportaciones).
+    La conexión queda ocupada hasta agotar o cerrar el generador.
+    """
+    if isinstance(query, str):
+        query = text(query)
+    batches = _iter_columns(query, params, dtypes)
+    t0 = time.perf_counter()
+    async with _limiter:
+        DB_POOL_WAIT.observe(time.perf_counter() - t0, stage="limiter")
+        try:
+            while True:
+                t0 = time.perf_counter()
+                columns = await anyio.to_thread.run_sync(next, batches, _END)
+                if columns is _END:
+                    break
+                DB_QUERY_LATENCY.observe(time.perf_counter() - t0, query=name)
+                DB_ROWS.inc(len(next(iter(columns.values()), ())), query=name)
+                yield columns
+        finally:
+            # Cierra el cursor y devuelve la conexión al pool (también si el cliente se desconecta)
+            await anyio.to_thread.run_sync(batches.close)
+
+
+# 5. Tablas opcionales (rollups, previsiones...): existencia cacheada.
+# Solo se cachea el "sí"; un "no" se vuelve a comprobar pasado un rato (p. ej. tras la ingesta).
+_TABLE_CHECK_TTL = 300
+_tables_seen = {}
+
+
+async def table_exists(name: str) -> bool:
+    now = time.monotonic()
+    state = _tables_seen.get(name)
+    if state is True or (state is not None and now - state < _TABLE_CHECK_TTL):
+        return state is True
+    rows = await fetch_all(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}, name="table_exists")
+    exists = bool(rows and rows[0][0])
+    _tables_seen[name] = True if exists else now
+    return exists
+
+
+def remember_table(name: str):
+    """Marca una tabla como existente (p. ej. justo después de crearla en este proceso)."""
+    _tables_seen[name] = True
@@ -1,22 +1,103 @@
-from fastapi import FastAPI, Request, HTTPException, Depends
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+# Cronómetro del arranque en frío: antes que el resto de imports
+from src.services import startup
+
+from fastapi import FastAPI, Request, HTTPException, Query, Header
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+from typing import List, Optional
 from datetime import datetime, timedelta
-import pandas as pd
+from contextlib import asynccontextmanager
+import asyncio
+import hmac
+import time
+import anyio
+import numpy as np
+# pandas se importa dentro de los endpoints que lo usan: "/" y las páginas no lo cargan
 
 # Importaciones propias
-from src.config import STATIC_DIR, TEMPLATES_DIR
-from src.database import get_db
+from src.config import (
+    STATIC_DIR, TEMPLATES_DIR, SERIES_POINT_BUDGET, AUDIT_MAX_DAYS, AUDIT_STREAM_MAX_DAYS,
+    EXPORT_MAX_DAYS, FORECAST_SCHEDULER,
+    RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_HISTORICAL, RESPONSE_CACHE_TTL_RECENT,
+    DATA_VERSION_TTL, HTTP_CACHE_MAX_AGE, SLOW_REQUEST_SECONDS,
+    MODEL_WATCH_SECONDS, ADMIN_TOKEN,
+)
+from src.database import engine
 from src.services.model_service import predictor
+from src.services.model_registry import RegistryWatcher
+from src.services.cache import ResponseCache
+from src.services.http_cache import ConditionalGetMiddleware, DataVersion
+from src.services.metrics import REGISTRY, MetricsMiddleware
+from src.services.feature_schema import UnknownZoneError, zone_slug
+from src.services.evaluation import error_metrics
+from src.services.audit_stream import audit_events, ndjson
+from src.services.climatology import ClimatologyIndex, simulation_temperatures
+from src.services.export import ENCODERS, export_stream, parquet_available
+from src.services.backtest import BacktestJob, backtest_results, summarize
+from src.services.series import choose_resolution, lttb_indices, json_values
+from src.services.forecast_service import ForecastScheduler
+from src.services.schema import verify_schema
+from src.services.storage import storage
+from src.routes import dashboard_router
+
+startup.record("imports", time.perf_counter() - startup.PROCESS_START)
+
+# Temperatura esperada por zona x mes x hora para el modo futuro (cargada una vez, en memoria)
+climatology = ClimatologyIndex(storage.climatology)
+forecast_scheduler = ForecastScheduler(engine, predictor, climatology=climatology)
+# Recarga en caliente cuando cambia la versión activa del registro (además de POST /api/admin/models/reload)
+model_watcher = RegistryWatcher(predictor, predictor.registry, MODEL_WATCH_SECONDS)
+# Backtest del histórico (zona x mes) en un pool de procesos, lanzado desde /api/admin/backtest
+backtest_job = BacktestJob(predictor)
+backtest_store = backtest_results()
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_HISTORICAL, RESPONSE_CACHE_TTL_RECENT)
+# Si cambian los datos (nueva ingesta) las respuestas cacheadas y la climatología dejan de valer
+def _on_data_change():
+    response_cache.clear()
+    climatology.invalidate()
 
-app = FastAPI(title="Granada Smart City - Auditoría")
+data_version = DataVersion(storage.data_version, DATA_VERSION_TTL, on_change=_on_data_change)
+http_cache_stats = {}
+schema_issues = None  # None = sin comprobar (BD no disponible al arrancar)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global schema_issues
+    if storage.name == "postgres":
+        # Índices y particiones de consumo_granada (solo informa; la ingesta es quien los crea)
+        try:
+            schema_issues = await verify_schema(engine)
+        except Exception as e:
+            print(f"⚠️ No se pudo comprobar el esquema: {e}")
+        # Previsiones del modo futuro en segundo plano (tras cargar el modelo y cada N horas)
+        if FORECAST_SCHEDULER:
+            forecast_scheduler.start()
+    if MODEL_WATCH_SECONDS > 0:
+        model_watcher.start()
+    yield
+    await backtest_job.stop()
+    await model_watcher.stop()
+    await forecast_scheduler.stop()
+
+app = FastAPI(title="Granada Smart City - Auditoría", lifespan=lifespan)
 
 # --- CONFIGURACIÓN ---
+# ETag / 304 en las lecturas GET: repetir una vista no toca la BD ni el modelo
+# (se registra antes que CORS para que CORS envuelva también las respuestas 304)
+async def _cache_versions():
+    return f"{await data_version.get()}|{predictor.model_version}"
+
+app.add_middleware(
+    ConditionalGetMiddleware,
+    paths=("/api/zones", "/api/audit", "/api/audit/batch", "/api/dashboard/update", "/api/dashboard/filtrar"),
+    versions=_cache_versions,
+    max_age=HTTP_CACHE_MAX_AGE,
+    stats=http_cache_stats,
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -25,7 +106,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas (la más externa: mide también los 304 y las respuestas CORS)
+app.add_middleware(MetricsMiddleware, slow_seconds=SLOW_REQUEST_SECONDS)
+
+@REGISTRY.collector
+def _cache_gauges():
+    prediction, response = predictor.cache.stats(), response_cache.stats()
+    return [
+        ("prediction_cache_hit_ratio", "Aciertos / consultas de la caché de predicciones.", prediction["hit_ratio"]),
+        ("prediction_cache_size", "Entradas en la caché de predicciones.", prediction["size"]),
+        ("response_cache_hit_ratio", "Aciertos / consultas de la caché de respuestas.", response["hit_ratio"]),
+        ("response_cache_size", "Entradas en la caché de respuestas.", response["size"]),
+        ("response_cache_coalesced", "Peticiones que esperaron a un cálculo idéntico en curso.", response["coalesced"]),
+        ("http_not_modified", "Respuestas 304 (ETag coincidente).", http_cache_stats.get("not_modified", 0)),
+        ("db_pool_checked_out", "Conexiones del pool en uso ahora mismo.", engine.pool.checkedout()),
+    ]
+
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
+# Filtros del dashboard (/api/dashboard/filtrar): una sola lectura de la ventana
+app.include_router(dashboard_router)
 templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
 
 # --- MODELOS DE DATOS (PYDANTIC) ---
@@ -35,11 +134,23 @@ class AuditRequest(BaseModel):
     end_date: str
     zone_name: str
 
+class BatchAuditRequest(BaseModel):
+    start_date: str
+    end_date: str
+    zones: Optional[List[str]] = None  # None = las 20 zonas
+
 class DashboardFilter(BaseModel):
     zone_name: str
     start_date: str
     end_date: str
 
+class BacktestRequest(BaseModel):
+    start: Optional[str] = None  # None = BACKTEST_START
+    end: Optional[str] = None    # None = ahora (solo meses completos)
+    zones: Optional[List[str]] = None
+    workers: Optional[int] = None
+    restart: bool = False
+
 # --- RUTAS DE NAVEGACIÓN ---
 
 @app.get("/")
@@ -72,170 +183,488 @@ async def prediction_page(request: Request):
 # --- ENDPOINTS API (LÓGICA) ---
 
 @app.get("/api/zones")
-def get_zones(db: Session = Depends(get_db)):
+async def get_zones():
     """Obtiene la lista de zonas ordenada alfabéticamente."""
     try:
-        res = db.execute(text("SELECT DISTINCT zone_name FROM consumo_granada ORDER BY zone_name ASC")).fetchall()
-        return {"zones": [r[0] for r in res]}
+        return {"zones": await storage.zones()}
     except:
         return {"zones": []}
 
+async def _audit_payload(request: AuditRequest, start, end):
+    """Cálculo de /api/audit (lo cachea y coalesce `response_cache`)."""
+    import pandas as pd
+
+    # 1. Intentamos buscar datos REALES (Pasado)
+    cols = await storage.hourly(request.zone_name, start, end)
+
+    is_future = False
+    totals = {}
+
+    if len(cols["timestamp"]):
+        # CASO A: TENEMOS DATOS (AUDITORÍA)
+        # El ranking de zonas (rollups) solo hace falta aquí: se lanza ya y corre mientras predice el modelo
+        ranking = asyncio.create_task(storage.range_aggregates(start, end))
+        timestamps = pd.DatetimeIndex(cols["timestamp"])
+        real_data = cols["consumption_kwh"] # Dato Real
+
+        # Predicción IA usando temperatura real histórica (un solo lote), en un hilo:
+        # el loop sigue libre para lanzar el ranking y atender otras peticiones.
+        # Sin caché: hasta un año de horas desalojaría la LRU de predicciones compartida
+        # (la respuesta entera ya la cachea `response_cache`)
+        try:
+            ai_data = await anyio.to_thread.run_sync(
+                predictor.predict_bulk, timestamps, request.zone_name, np.nan_to_num(cols["temperature"])
+            )
+        except BaseException:
+            ranking.cancel()
+            raise
+        totals = await ranking
+    else:
+        # CASO B: NO HAY DATOS (FUTURO / SIMULACIÓN)
+        is_future = True
+
+        # Generamos el rango de fechas hora a hora nosotros mismos
+        timestamps = pd.date_range(start, end, freq="h")
+        real_data = np.full(len(timestamps), np.nan) # No hay dato real
+
+        # Primero las previsiones precalculadas; solo las horas que falten van al modelo
+        stored = await storage.read_forecasts(request.zone_name, start, end, predictor.model_version)
+        missing = [ts for ts in timestamps if ts not in stored]
+
+        # Temperatura esperada de la zona para ese mes y hora (climatología en memoria, sin red)
+        temps = simulation_temperatures(await climatology.get(), request.zone_name, missing)
+        live = predictor.predict_many(missing, request.zone_name, temps)
+        stored.update(zip(missing, live))
+        ai_data = np.array([stored[ts] for ts in timestamps])
+
+    # Rangos largos: LTTB sobre la serie de referencia (real o IA) para no perder picos
+    total_points = len(timestamps)
+    keep = lttb_indices(ai_data if is_future else real_data, SERIES_POINT_BUDGET)
+    labels = timestamps[keep].strftime("%d/%m %H:%M").tolist()
+
+    # 2. Gráfico de Barras (Ranking)
+    bar_labels = []
+    bar_values = []
+
+    if not is_future:
+        bar_labels = list(totals)
+        bar_values = [round(agg["sum"], 2) for agg in totals.values()]
+
+    return {
+        "status": "success",
+        "is_future": is_future,
+        "line_chart": {
+            "labels": labels, "real": json_values(real_data[keep]), "ai": json_values(ai_data[keep]),
+            "resolution": "hour", "total_points": total_points
+        },
+        "bar_chart": { "labels": bar_labels, "values": bar_values }
+    }
+
 @app.post("/api/audit")
-async def audit_model(request: AuditRequest, db: Session = Depends(get_db)):
+async def audit_model(request: AuditRequest):
     """
     Versión Híbrida Inteligente para la página de PREDICCIÓN:
     - Si hay datos históricos (Pasado) -> Auditoría (Real vs IA).
     - Si NO hay datos (Futuro) -> Simulación Pura (Solo IA).
     """
+    import pandas as pd
+
     try:
         start = pd.to_datetime(request.start_date)
         end = pd.to_datetime(request.end_date)
         
         # Validaciones
-        if (end - start).days > 7:
-            raise HTTPException(status_code=400, detail="El rango máximo permitido es de 7 días.")
+        if (end - start).days > AUDIT_MAX_DAYS:
+            raise HTTPException(status_code=400, detail=f"El rango máximo permitido es de {AUDIT_MAX_DAYS} días.")
         if start >= end:
             raise HTTPException(status_code=400, detail="La fecha fin debe ser posterior a la de inicio.")
 
-        # 1. Intentamos buscar datos REALES (Pasado)
-        query_line = text("""
-            SELECT timestamp, consumption_kwh, temperature 
-            FROM consumo_granada 
-            WHERE zone_name = :zone 
-              AND timestamp >= :start 
-              AND timestamp <= :end
-            ORDER BY timestamp ASC
-        """)
-        
-        rows = db.execute(query_line, {"zone": request.zone_name, "start": start, "end": end}).fetchall()
-
-        labels = []
-        real_data = []
-        ai_data = []
-        is_future = False
-
-        if rows:
-            # CASO A: TENEMOS DATOS (AUDITORÍA)
-            for row in rows:
-                ts = row[0]
-                labels.append(ts.strftime("%d/%m %H:%M"))
-                real_data.append(row[1]) # Dato Real
-                
-                # Predicción IA usando temperatura real histórica
-                pred = predictor.predict(str(ts), request.zone_name, float(row[2]))
-                ai_data.append(pred)
-        else:
-            # CASO B: NO HAY DATOS (FUTURO / SIMULACIÓN)
-            is_future = True
-            
-            # Generamos el rango de fechas hora a hora nosotros mismos
-            current = start
-            while current <= end:
-                labels.append(current.strftime("%d/%m %H:%M"))
-                real_data.append(None) # No hay dato real
-                
-                # Temp estimada fija para simulación rápida (o llamar a API externa)
-                temp_estimada = 15.0 
-                
-                pred = predictor.predict(str(current), request.zone_name, temp_estimada)
-                ai_data.append(pred)
-                
-                current += timedelta(hours=1)
-
-        # 2. Gráfico de Barras (Ranking)
-        bar_labels = []
-        bar_values = []
-        
-        if not is_future:
-            query_bar = text("""
-                SELECT zone_name, SUM(consumption_kwh) as total
-                FROM consumo_granada
-                WHERE timestamp >= :start AND timestamp <= :end
-                GROUP BY zone_name
-                ORDER BY zone_name ASC
-            """)
-            rows_bar = db.execute(query_bar, {"start": start, "end": end}).fetchall()
-            bar_labels = [r[0] for r in rows_bar]
-            bar_values = [round(r[1], 2) for r in rows_bar]
+        key = ("audit", request.zone_name, start, end, predictor.model_version)
+        return await response_cache.get_or_compute(
+            key, lambda: _audit_payload(request, start, end), response_cache.ttl_for(end)
+        )
 
-        return {
-            "status": "success",
-            "is_future": is_future,
-            "line_chart": { "labels": labels, "real": real_data, "ai": ai_data },
-            "bar_chart": { "labels": bar_labels, "values": bar_values }
-        }
+    except HTTPException:
+        raise
+    except UnknownZoneError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"detail": str(e)})
+
+@app.get("/api/audit")
+async def audit_model_get(zone_name: str, start_date: str, end_date: str):
+    """Igual que POST /api/audit, cacheable por el navegador/CDN (ETag)."""
+    return await audit_model(AuditRequest(zone_name=zone_name, start_date=start_date, end_date=end_date))
+
+@app.post("/api/audit/stream")
+async def audit_stream(request: AuditRequest):
+    """
+    Auditoría en STREAMING (NDJSON) para rangos largos: cabecera, un evento por tramo
+    (Real vs IA con las métricas acumuladas) y un trailer con las métricas finales.
+    Memoria constante y el primer tramo llega sin esperar al rango completo.
+    """
+    import pandas as pd
+
+    try:
+        start = pd.to_datetime(request.start_date)
+        end = pd.to_datetime(request.end_date)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Fecha no válida: {e}")
+    if (end - start).days > AUDIT_STREAM_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"El rango máximo permitido es de {AUDIT_STREAM_MAX_DAYS} días.")
+    if start >= end:
+        raise HTTPException(status_code=400, detail="La fecha fin debe ser posterior a la de inicio.")
+    # Zona desconocida: 400 antes de empezar a emitir (luego ya no se puede cambiar el status)
+    if not predictor.ensure_loaded():
+        raise HTTPException(status_code=503, detail="Modelo no disponible.")
+    try:
+        predictor.schema.zone_position(request.zone_name)
+    except UnknownZoneError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    events = audit_events(storage, predictor, request.zone_name, start, end, climatology=climatology)
+    return StreamingResponse(
+        ndjson(events),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/audit/stream")
+async def audit_stream_get(zone_name: str, start_date: str, end_date: str):
+    """Igual que POST /api/audit/stream (p. ej. para `fetch` + ReadableStream desde el navegador)."""
+    return await audit_stream(AuditRequest(zone_name=zone_name, start_date=start_date, end_date=end_date))
+
+async def _audit_batch_payload(request: BatchAuditRequest, start, end):
+    """Cálculo de /api/audit/batch (lo cachea y coalesce `response_cache`)."""
+    import pandas as pd
+
+    # Zonas pedidas: se validan contra el modelo antes de tocar la BD
+    for zone in request.zones or []:
+        predictor.schema.zone_position(zone)
+
+    cols = await storage.hourly_zones(request.zones, start, end)
+    if not len(cols["zone_name"]):
+        raise HTTPException(status_code=404, detail="No hay datos reales para esta selección.")
+
+    zone_col = cols["zone_name"]
+    timestamps = pd.DatetimeIndex(cols["timestamp"])
+    real = cols["consumption_kwh"].astype(np.float64)
+    temps = cols["temperature"]
+
+    # Todas las zonas en UNA llamada al modelo, sin caché (hasta 20 zonas x un año de horas)
+    # y en un hilo para no bloquear el loop
+    ai = await anyio.to_thread.run_sync(predictor.predict_bulk, timestamps, zone_col, np.nan_to_num(temps))
+
+    # Filas ordenadas por zona: cada zona es un tramo contiguo
+    zone_names, starts = np.unique(zone_col, return_index=True)
+    bounds = list(starts) + [len(zone_col)]
+    results = []
+    for zone, lo, hi in zip(zone_names, bounds[:-1], bounds[1:]):
+        keep = lo + lttb_indices(real[lo:hi], SERIES_POINT_BUDGET)
+        results.append({
+            "zone": str(zone),
+            "metrics": error_metrics(real[lo:hi], ai[lo:hi]),
+            "line_chart": {
+                "labels": timestamps[keep].strftime("%d/%m %H:%M").tolist(),
+                "real": json_values(real[keep]),
+                "ai": json_values(ai[keep]),
+            },
+        })
+
+    return {
+        "status": "success",
+        "overall": error_metrics(real, ai),
+        "zones": results,
+    }
 
+@app.post("/api/audit/batch")
+async def audit_batch(request: BatchAuditRequest):
+    """
+    Auditoría MULTI-ZONA (Realidad vs IA) en una pasada:
+    una consulta para todas las zonas pedidas, una llamada vectorizada al modelo
+    y métricas de error (MAE, RMSE, MAPE) por zona y globales.
+    """
+    import pandas as pd
+
+    try:
+        start = pd.to_datetime(request.start_date)
+        end = pd.to_datetime(request.end_date)
+
+        if (end - start).days > AUDIT_MAX_DAYS:
+            raise HTTPException(status_code=400, detail=f"El rango máximo permitido es de {AUDIT_MAX_DAYS} días.")
+        if start >= end:
+            raise HTTPException(status_code=400, detail="La fecha fin debe ser posterior a la de inicio.")
+
+        zones = tuple(sorted(request.zones)) if request.zones else None
+        key = ("audit_batch", zones, start, end, predictor.model_version)
+        return await response_cache.get_or_compute(
+            key, lambda: _audit_batch_payload(request, start, end), response_cache.ttl_for(end)
+        )
+
+    except HTTPException:
+        raise
+    except UnknownZoneError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         return JSONResponse(status_code=500, content={"detail": str(e)})
 
+@app.get("/api/audit/batch")
+async def audit_batch_get(start_date: str, end_date: str, zones: Optional[List[str]] = Query(None)):
+    """Igual que POST /api/audit/batch (`?zones=a&zones=b`), cacheable por ETag."""
+    return await audit_batch(BatchAuditRequest(start_date=start_date, end_date=end_date, zones=zones))
+
+@app.get("/api/export")
+async def export_data(
+    start_date: str,
+    end_date: str,
+    zones: Optional[List[str]] = Query(None),
+    fmt: str = Query("csv", alias="format"),
+    predictions: bool = False,
+):
+    """
+    Exportación MASIVA en streaming (`?zones=a&zones=b&format=csv|parquet&predictions=1`):
+    histórico horario por lotes desde un cursor de servidor, con la predicción y el residuo
+    calculados por lote si se piden. Memoria acotada sea cual sea el rango.
+    """
+    import pandas as pd
+
+    if fmt not in ENCODERS:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: '{fmt}' (csv o parquet).")
+    if fmt == "parquet" and not parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet no disponible en este servidor (falta pyarrow).")
+    try:
+        start = pd.to_datetime(start_date)
+        end = pd.to_datetime(end_date)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Fecha no válida: {e}")
+    if (end - start).days > EXPORT_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"El rango máximo permitido es de {EXPORT_MAX_DAYS} días.")
+    if start >= end:
+        raise HTTPException(status_code=400, detail="La fecha fin debe ser posterior a la de inicio.")
+
+    # Todo lo que puede fallar se valida antes de emitir (luego ya no se puede cambiar el status)
+    known = await storage.zones()
+    slugs = {zone_slug(z) for z in known}
+    unknown = [z for z in zones or [] if zone_slug(z) not in slugs]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Zonas desconocidas: {', '.join(unknown)}.")
+    headers = {
+        "Cache-Control": "no-store",
+        "X-Accel-Buffering": "no",
+        "Content-Disposition": f'attachment; filename="consumo_{start:%Y%m%d}_{end:%Y%m%d}.{fmt}"',
+    }
+    if predictions:
+        if not predictor.ensure_loaded():
+            raise HTTPException(status_code=503, detail="Modelo no disponible.")
+        try:
+            for zone in zones or known:
+                predictor.schema.zone_position(zone)
+        except UnknownZoneError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        headers["X-Model-Version"] = str(predictor.model_version)
+
+    encoder = ENCODERS[fmt]()
+    return StreamingResponse(
+        export_stream(storage, predictor, zones, start, end, encoder, predictions),
+        media_type=encoder.media_type,
+        headers=headers,
+    )
+
+async def _dashboard_payload(request: DashboardFilter, start, end):
+    """Cálculo de /api/dashboard/update (lo cachea y coalesce `response_cache`)."""
+    import pandas as pd
+
+    # Resolución según el rango: horas si caben en el presupuesto, si no día/semana/mes
+    resolution, unit, label_format = choose_resolution(start, end, SERIES_POINT_BUDGET)
+
+    if resolution == "hour":
+        series = storage.hourly(request.zone_name, start, end)
+    else:
+        series = storage.bucketed_series(request.zone_name, start, end, unit)
+
+    # Serie para el gráfico y KPIs (desde los rollups) en paralelo
+    rows, totals = await asyncio.gather(
+        series,
+        storage.range_aggregates(start, end, zone=request.zone_name),
+    )
+
+    if not len(rows["timestamp"] if resolution == "hour" else rows):
+        raise HTTPException(status_code=404, detail="No hay datos para esta selección.")
+
+    # Procesar datos
+    timestamps = []
+    consumptions = []
+    temperatures = []
+    chart = {"resolution": resolution}
+
+    if resolution == "hour":
+        # Columnas NumPy: formato vectorizado (nulos como 0)
+        timestamps = pd.DatetimeIndex(rows["timestamp"]).strftime(label_format).tolist()
+        consumptions = json_values(rows["consumption_kwh"], fill=0)
+        temperatures = json_values(rows["temperature"], fill=0)
+    else:
+        # Buckets: consumo medio por hora + pico del bucket (los picos no se pierden al agregar)
+        peaks = []
+        for bucket, n_rows, sum_kwh, _min_kwh, max_kwh, sum_temp in rows:
+            n_rows = int(n_rows)
+            timestamps.append(bucket.strftime(label_format))
+            consumptions.append(round(float(sum_kwh or 0) / n_rows, 2))
+            temperatures.append(round(float(sum_temp or 0) / n_rows, 2))
+            peaks.append(float(max_kwh) if max_kwh is not None else 0)
+        chart["consumption_max"] = peaks
+
+    # CÁLCULO DE KPIS (nulos cuentan como 0, igual que en la serie)
+    kpis = totals.get(request.zone_name, {"sum": 0.0, "avg": 0.0, "temp_avg": 0.0, "max": 0.0})
+    total_consumo = kpis["sum"]
+    promedio_hora = kpis["avg"]
+    temp_media = kpis["temp_avg"]
+    pico_maximo = kpis["max"]
+
+    return {
+        "status": "success",
+        "kpis": {
+            "total_consumo": f"{total_consumo:,.2f}",
+            "promedio_hora": f"{promedio_hora:.2f}",
+            "temp_media": f"{temp_media:.1f}",
+            "pico_maximo": f"{pico_maximo:.2f}"
+        },
+        "chart": {
+            "labels": timestamps,
+            "consumption": consumptions,
+            "temperature": temperatures,
+            **chart
+        }
+    }
+
 @app.post("/api/dashboard/update")
-async def update_dashboard(request: DashboardFilter, db: Session = Depends(get_db)):
+async def update_dashboard(request: DashboardFilter):
     """
     Calcula KPIs y datos para el gráfico del DASHBOARD.
     """
+    import pandas as pd
+
     try:
         start = pd.to_datetime(request.start_date)
         end = pd.to_datetime(request.end_date)
         
-        # Validación de 7 días
-        if (end - start).days > 7:
-            raise HTTPException(status_code=400, detail="Por rendimiento, selecciona un máximo de 7 días.")
         if start >= end:
             raise HTTPException(status_code=400, detail="La fecha fin debe ser posterior a la de inicio.")
 
-        # Consulta SQL Principal
-        query = text("""
-            SELECT timestamp, consumption_kwh, temperature 
-            FROM consumo_granada 
-            WHERE zone_name = :zone 
-              AND timestamp >= :start 
-              AND timestamp <= :end
-            ORDER BY timestamp ASC
-        """)
-        
-        rows = db.execute(query, {"zone": request.zone_name, "start": start, "end": end}).fetchall()
+        key = ("dashboard", request.zone_name, start, end)
+        return await response_cache.get_or_compute(
+            key, lambda: _dashboard_payload(request, start, end), response_cache.ttl_for(end)
+        )
 
-        if not rows:
-            raise HTTPException(status_code=404, detail="No hay datos para esta selección.")
+    except HTTPException:
+        raise
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"detail": str(e)})
 
-        # Procesar datos
-        timestamps = []
-        consumptions = []
-        temperatures = []
-        
-        for row in rows:
-            timestamps.append(row[0].strftime("%d/%m %H:%M"))
-            consumptions.append(float(row[1]) if row[1] is not None else 0)
-            temperatures.append(float(row[2]) if row[2] is not None else 0)
+@app.get("/api/dashboard/update")
+async def update_dashboard_get(zone_name: str, start_date: str, end_date: str):
+    """Igual que POST /api/dashboard/update, cacheable por el navegador/CDN (ETag)."""
+    return await update_dashboard(DashboardFilter(zone_name=zone_name, start_date=start_date, end_date=end_date))
 
-        # CÁLCULO DE KPIS
-        total_consumo = sum(consumptions)
-        promedio_hora = total_consumo / len(consumptions) if consumptions else 0
-        temp_media = sum(temperatures) / len(temperatures) if temperatures else 0
-        pico_maximo = max(consumptions) if consumptions else 0
+# --- ADMINISTRACIÓN DEL MODELO ---
 
-        return {
-            "status": "success",
-            "kpis": {
-                "total_consumo": f"{total_consumo:,.2f}",
-                "promedio_hora": f"{promedio_hora:.2f}",
-                "temp_media": f"{temp_media:.1f}",
-                "pico_maximo": f"{pico_maximo:.2f}"
-            },
-            "chart": {
-                "labels": timestamps,
-                "consumption": consumptions,
-                "temperature": temperatures
-            }
-        }
+def _check_admin(token: Optional[str]):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Administración desactivada (define ADMIN_TOKEN).")
+    if not hmac.compare_digest(token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Token de administración incorrecto.")
+
+@app.get("/api/admin/models")
+async def list_models(x_admin_token: Optional[str] = Header(None)):
+    """Versiones publicadas en el registro y las que hay cargadas en memoria."""
+    _check_admin(x_admin_token)
+    return {
+        **predictor.status(),
+        "registry_current": predictor.registry.current(),
+        "versions": predictor.registry.versions(),
+    }
 
+@app.post("/api/admin/models/reload")
+async def reload_model(version: Optional[str] = None, x_admin_token: Optional[str] = Header(None)):
+    """
+    Carga y activa en caliente una versión (por defecto la activa del registro).
+    La carga y el calentamiento van en un hilo: mientras tanto se sigue sirviendo la versión anterior.
+    """
+    _check_admin(x_admin_token)
+    try:
+        status = await anyio.to_thread.run_sync(predictor.reload, version)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"detail": f"Se mantiene el modelo {predictor.model_version}: {e}"})
+
+    # Versión pedida explícitamente: queda como activa también en el registro (reinicios, vigilante)
+    persisted = False
+    if version is not None and predictor.registry.current() is not None:
+        try:
+            predictor.registry.activate(version)
+            persisted = True
+        except OSError as e:
+            print(f"⚠️ No se pudo marcar {version} como activa en el registro: {e}")
+    return {"status": "success", **status, "persisted": persisted}
+
+@app.post("/api/admin/backtest")
+async def start_backtest(request: Optional[BacktestRequest] = None, x_admin_token: Optional[str] = Header(None)):
+    """
+    Lanza el backtest del modelo activo sobre todo el histórico (zona x mes, pool de procesos).
+    Reanuda donde se quedó: las particiones ya puntuadas de esta versión no se repiten.
+    """
+    _check_admin(x_admin_token)
+    options = {k: v for k, v in (request or BacktestRequest()).model_dump().items() if v is not None}
+    try:
+        started = backtest_job.start(**options)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if not started:
+        raise HTTPException(status_code=409, detail="Ya hay un backtest en marcha.")
+    return JSONResponse(status_code=202, content={"status": "started", **backtest_job.status()})
+
+@app.get("/api/admin/backtest")
+async def backtest_status(x_admin_token: Optional[str] = Header(None)):
+    """Progreso del backtest en curso (o resumen del último)."""
+    _check_admin(x_admin_token)
+    return backtest_job.status()
+
+@app.get("/api/backtest")
+async def backtest_report(model_version: Optional[str] = None, zone: Optional[str] = None):
+    """Error del modelo por zona x mes, por zona y global (de la tabla de resultados del backtest)."""
+    version = model_version or predictor.model_version
+    try:
+        rows = await backtest_store.read(version, zone)
     except Exception as e:
         return JSONResponse(status_code=500, content={"detail": str(e)})
+    return {"status": "success", "model_version": version, **summarize(rows)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas en formato de texto Prometheus (sin colector externo)."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/health")
-def health(db: Session = Depends(get_db)):
+async def health():
     try:
-        db.execute(text("SELECT 1"))
-        return {"status": "ok", "model": True}
+        await storage.ping()
+        return {
+            "status": "ok",
+            "storage": storage.name,
+            "model": True,
+            "model_version": predictor.model_version,
+            "model_loaded": predictor.loaded,
+            "model_source": predictor.source,
+            "models": {**predictor.status(), "watcher": model_watcher.status() if MODEL_WATCH_SECONDS > 0 else None},
+            "prediction_cache": predictor.cache_stats(),
+            "response_cache": response_cache.stats(),
+            "http_cache": {"data_version": data_version.value, **http_cache_stats},
+            "forecasts": forecast_scheduler.status(),
+            "climatology": climatology.status(),
+            "schema_issues": schema_issues,
+            "startup": startup.report(),
+        }
     except:
-        return {"status": "error"}
\ No newline at end of file
+        return {"status": "error"}
+
+startup.mark("app_ready")
@@ -1,6 +1,5 @@
 # Este archivo permite importar los routers fácilmente
-# VERSIÓN SIMPLIFICADA: Solo predicción
-from .prediction import router as prediction_router
-
-__all__ = ["prediction_router"]
+# (la predicción y el resto de la API viven en src/main.py)
+from .dashboard import router as dashboard_router
 
+__all__ = ["dashboard_router"]
@@ -0,0 +1,114 @@
+"""
+Auditoría en streaming (NDJSON): Realidad vs IA por tramos, sin cargar el rango entero.
+
+El rango se recorre en tramos de `chunk_hours`: cada tramo es una lectura acotada
+(`storage.hourly`) y una llamada vectorizada al modelo sin caché (`predict_bulk`), y se
+emite en cuanto está listo.
+La memoria no depende de la longitud del rango y el primer punto llega tras el primer
+tramo, no al final. Una línea JSON por evento:
+
+    {"type": "header",  "zone", "start", "end", "is_future", "model_version", "expected_points"}
+    {"type": "chunk",   "labels", "real", "ai", "metrics"}     <- métricas acumuladas hasta aquí
+    {"type": "trailer", "metrics", "points", "chunks", "elapsed_ms"}
+    {"type": "error",   "detail"}                               <- si falla a mitad (ya hay 200 enviado)
+
+Sin datos reales en el rango (futuro) se simula como en /api/audit: previsiones guardadas
+y, para las horas que falten, el modelo con la temperatura de la climatología zona x mes x hora
+(o SIMULATION_TEMPERATURE si no la hay).
+"""
+import json
+import time
+
+import numpy as np
+
+from src.config import AUDIT_STREAM_CHUNK_HOURS
+from src.services.climatology import simulation_temperatures
+from src.services.evaluation import RunningErrorMetrics
+from src.services.series import json_values
+
+LABEL_FORMAT = "%Y-%m-%d %H:%M"
+
+
+def chunk_bounds(start, end, chunk_hours: int = AUDIT_STREAM_CHUNK_HOURS):
+    """Tramos [lo, hi] consecutivos y sin solape que cubren [start, end] (ambos inclusivos)."""
+    import pandas as pd
+
+    step = pd.Timedelta(hours=chunk_hours)
+    lo = pd.Timestamp(start)
+    end = pd.Timestamp(end)
+    while lo <= end:
+        hi = min(lo + step - pd.Timedelta(microseconds=1), end)
+        yield lo, hi
+        lo = lo + step
+
+
+async def audit_events(storage, predictor, zone_name: str, start, end, chunk_hours: int = AUDIT_STREAM_CHUNK_HOURS,
+                       climatology=None):
+    """Genera los eventos (dicts) de la auditoría en streaming de una zona (`climatology`: ClimatologyIndex)."""
+    import pandas as pd
+
+    t0 = time.perf_counter()
+    # Nº de filas reales del rango (rollups: no lee la serie) -> modo y progreso esperado
+    totals = await storage.range_aggregates(start, end, zone=zone_name)
+    n_real = sum(agg["n_rows"] for agg in totals.values())
+    is_future = n_real == 0
+    model_version = predictor.model_version
+    yield {
+        "type": "header",
+        "zone": zone_name,
+        "start": pd.Timestamp(start).isoformat(),
+        "end": pd.Timestamp(end).isoformat(),
+        "is_future": is_future,
+        "model_version": model_version,
+        "expected_points": n_real if not is_future else len(pd.date_range(start, end, freq="h")),
+    }
+
+    climate = await climatology.get() if is_future and climatology is not None else None
+    metrics = RunningErrorMetrics()
+    points = chunks = 0
+    for lo, hi in chunk_bounds(start, end, chunk_hours):
+        if is_future:
+            timestamps = pd.date_range(lo.ceil("h"), hi, freq="h")
+            real = np.full(len(timestamps), np.nan)
+            stored = await storage.read_forecasts(zone_name, lo, hi, model_version)
+            missing = [ts for ts in timestamps if ts not in stored]
+            temps = simulation_temperatures(climate, zone_name, missing)
+            stored.update(zip(missing, predictor.predict_many(missing, zone_name, temps)))
+            ai = np.array([stored[ts] for ts in timestamps], dtype=np.float64)
+        else:
+            cols = await storage.hourly(zone_name, lo, hi)
+            timestamps = pd.DatetimeIndex(cols["timestamp"])
+            real = cols["consumption_kwh"].astype(np.float64)
+            # Sin caché: un rango de años desalojaría la LRU de predicciones del resto de usuarios
+            ai = predictor.predict_bulk(timestamps, zone_name, np.nan_to_num(cols["temperature"]))
+            metrics.update(real, ai)
+
+        if not len(timestamps):
+            continue
+        points += len(timestamps)
+        chunks += 1
+        yield {
+            "type": "chunk",
+            "labels": timestamps.strftime(LABEL_FORMAT).tolist(),
+            "real": json_values(real),
+            "ai": json_values(ai),
+            "metrics": metrics.result(),
+        }
+
+    yield {
+        "type": "trailer",
+        "metrics": metrics.result(),
+        "points": points,
+        "chunks": chunks,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+
+async def ndjson(events):
+    """Serializa eventos a NDJSON; un fallo a mitad se emite como evento `error` (el 200 ya salió)."""
+    try:
+        async for event in events:
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    except Exception as e:
+        print(f"❌ Error en la auditoría en streaming: {e}")
+        yield json.dumps({"type": "error", "detail": str(e)}, ensure_ascii=False) + "\n"
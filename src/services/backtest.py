@@ -0,0 +1,334 @@
+"""
+Backtest del histórico completo: error del modelo por zona x mes.
+
+El histórico se parte en particiones (zona, mes) que se puntúan en un pool de procesos
+(un núcleo por proceso; cada proceso carga el modelo UNA vez en su inicializador). Cada
+partición devuelve las sumas de `RunningErrorMetrics`, que se guardan en cuanto llegan:
+
+- postgres: tabla `backtest_granada` (clave modelo + zona + mes)
+- local:    `<LOCAL_STORE_DIR>/backtest/<versión>.jsonl` (una línea por partición)
+
+Como cada partición se guarda al terminar, un backtest interrumpido se reanuda saltando
+las que ya están. MAE / RMSE / sesgo por zona, por mes o globales salen de sumar las
+sumas guardadas (`summarize`), sin volver a puntuar.
+
+Se lanza con `python scripts/backtest.py` o con `POST /api/admin/backtest`; los
+resultados se consultan en `GET /api/backtest`.
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+import anyio
+import numpy as np
+from sqlalchemy import text
+
+from src.config import BACKTEST_WORKERS, BACKTEST_START, STORAGE_BACKEND, LOCAL_STORE_DIR
+from src.database import fetch_all, table_exists, remember_table
+from src.services.evaluation import RunningErrorMetrics
+from src.services.feature_schema import zone_display_name
+
+BACKTEST_TABLE = "backtest_granada"
+
+_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {BACKTEST_TABLE} (
+        model_version TEXT NOT NULL,
+        zone_name TEXT NOT NULL,
+        month DATE NOT NULL,
+        n_rows INTEGER NOT NULL,
+        n INTEGER NOT NULL,
+        abs_err DOUBLE PRECISION NOT NULL,
+        sq_err DOUBLE PRECISION NOT NULL,
+        err DOUBLE PRECISION NOT NULL,
+        ape DOUBLE PRECISION NOT NULL,
+        n_ape INTEGER NOT NULL,
+        scored_at TIMESTAMP NOT NULL,
+        PRIMARY KEY (model_version, zone_name, month)
+    )
+"""
+
+COLUMNS = ("zone_name", "month", "n_rows", *RunningErrorMetrics.STATE, "scored_at")
+
+
+def month_partitions(zones, start=BACKTEST_START, end=None):
+    """Particiones (zona, inicio de mes) de los meses COMPLETOS en [start, end)."""
+    import pandas as pd
+
+    end = pd.Timestamp(end or datetime.now())
+    months = pd.date_range(pd.Timestamp(start).to_period("M").to_timestamp(), end, freq="MS")
+    # El mes en curso (o el que corta `end`) aún puede recibir datos: no se congela
+    months = [m for m in months if m + pd.offsets.MonthBegin(1) <= end]
+    return [(zone_display_name(z), m.date()) for z in zones for m in months]
+
+
+# --- PROCESOS DEL POOL ---
+
+_worker = {}
+
+
+def _init_worker(model_version: str):
+    """Una vez por proceso: modelo fijado a `model_version`."""
+    # Ctrl+C lo gestiona el proceso principal (cancela lo pendiente y guarda lo hecho)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from src.services.model_service import ModelService
+    from src.services.storage import storage
+
+    service = ModelService(lazy=True)
+    try:
+        service.registry.paths(model_version)
+        service.reload(model_version)
+    except FileNotFoundError:
+        service.reload()  # modelo suelto (MODEL_PATH), sin registro
+    if service.model_version != model_version:
+        raise RuntimeError(f"El modelo cargado ({service.model_version}) no es el del backtest ({model_version}).")
+    _worker.update(service=service, storage=storage, loop=asyncio.new_event_loop())
+
+
+def score_partition(zone_name: str, month):
+    """Real vs IA de una zona en un mes. Devuelve la fila de resultados (sumas, no medias)."""
+    import pandas as pd
+
+    lo = pd.Timestamp(month)
+    hi = lo + pd.offsets.MonthBegin(1) - pd.Timedelta(microseconds=1)
+    cols = _worker["loop"].run_until_complete(_worker["storage"].hourly(zone_name, lo, hi))
+
+    metrics = RunningErrorMetrics()
+    if len(cols["timestamp"]):
+        # Sin caché: cada hora se predice una sola vez
+        ai = _worker["service"].predict_bulk(
+            pd.DatetimeIndex(cols["timestamp"]), zone_name, np.nan_to_num(cols["temperature"])
+        )
+        metrics.update(cols["consumption_kwh"], ai)
+    return {
+        "zone_name": zone_name,
+        "month": month,
+        "n_rows": int(len(cols["timestamp"])),
+        **metrics.state(),
+        "scored_at": datetime.now().replace(microsecond=0),
+    }
+
+
+# --- TABLA DE RESULTADOS ---
+
+class SqlBacktestResults:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def done(self, model_version: str):
+        with self.engine.begin() as conn:
+            conn.execute(text(_DDL))
+            rows = conn.execute(
+                text(f"SELECT zone_name, month FROM {BACKTEST_TABLE} WHERE model_version = :version"),
+                {"version": model_version},
+            ).fetchall()
+        remember_table(BACKTEST_TABLE)
+        return {(zone, month) for zone, month in rows}
+
+    def save(self, model_version: str, rows):
+        updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in COLUMNS if c not in ("zone_name", "month"))
+        with self.engine.begin() as conn:
+            conn.execute(
+                text(f"""
+                    INSERT INTO {BACKTEST_TABLE} (model_version, {", ".join(COLUMNS)})
+                    VALUES (:model_version, {", ".join(":" + c for c in COLUMNS)})
+                    ON CONFLICT (model_version, zone_name, month) DO UPDATE SET {updates}
+                """),
+                [{"model_version": model_version, **row} for row in rows],
+            )
+
+    def clear(self, model_version: str):
+        with self.engine.begin() as conn:
+            conn.execute(text(_DDL))
+            conn.execute(text(f"DELETE FROM {BACKTEST_TABLE} WHERE model_version = :version"), {"version": model_version})
+
+    async def read(self, model_version: str, zone=None):
+        if not await table_exists(BACKTEST_TABLE):
+            return []
+        zone_filter = "AND zone_name = :zone" if zone else ""
+        rows = await fetch_all(
+            text(f"""
+                SELECT {", ".join(COLUMNS)} FROM {BACKTEST_TABLE}
+                WHERE model_version = :version {zone_filter}
+                ORDER BY zone_name, month
+            """),
+            {"version": model_version, "zone": zone_display_name(zone) if zone else None},
+            name="read_backtest",
+        )
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+
+class FileBacktestResults:
+    """Una línea JSON por partición, añadida al terminarla (sobrevive a un corte a mitad)."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _path(self, model_version: str):
+        return self.root / f"{model_version}.jsonl"
+
+    def _rows(self, model_version: str):
+        import pandas as pd
+
+        rows = {}
+        try:
+            with open(self._path(model_version), encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # última línea a medias tras un corte
+                    row["month"] = pd.Timestamp(row["month"]).date()
+                    rows[(row["zone_name"], row["month"])] = row  # la última gana
+        except FileNotFoundError:
+            pass
+        return rows
+
+    def done(self, model_version: str):
+        return set(self._rows(model_version))
+
+    def save(self, model_version: str, rows):
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self._path(model_version), "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, default=str, ensure_ascii=False) + "\n")
+
+    def clear(self, model_version: str):
+        self._path(model_version).unlink(missing_ok=True)
+
+    async def read(self, model_version: str, zone=None):
+        rows = self._rows(model_version).values()
+        if zone:
+            rows = [r for r in rows if r["zone_name"] == zone_display_name(zone)]
+        return sorted(rows, key=lambda r: (r["zone_name"], r["month"]))
+
+
+def backtest_results(backend: str = STORAGE_BACKEND):
+    if backend == "local":
+        return FileBacktestResults(LOCAL_STORE_DIR / "backtest")
+    from src.database import engine
+    return SqlBacktestResults(engine)
+
+
+def summarize(rows):
+    """Métricas por zona x mes, por zona y globales a partir de las sumas guardadas."""
+    months, by_zone, overall = [], {}, RunningErrorMetrics()
+    for row in rows:
+        if not row["n_rows"]:
+            continue  # meses sin datos (antes del inicio de la serie, huecos...)
+        metrics = RunningErrorMetrics.from_state(row)
+        months.append({"zone": row["zone_name"], "month": str(row["month"])[:7], **metrics.result()})
+        by_zone.setdefault(row["zone_name"], RunningErrorMetrics()).merge(metrics)
+        overall.merge(metrics)
+    return {
+        "overall": overall.result(),
+        "zones": [{"zone": zone, "metrics": m.result()} for zone, m in sorted(by_zone.items())],
+        "months": months,
+    }
+
+
+# --- EJECUCIÓN ---
+
+def run_backtest(model_version: str, zones, start=BACKTEST_START, end=None, workers: int = BACKTEST_WORKERS,
+                 results=None, restart: bool = False, progress=None, stop: threading.Event = None):
+    """
+    Puntúa las particiones pendientes de `model_version` en un pool de procesos y guarda cada
+    una al terminar. `progress(hechas, total)` se llama tras cada partición; `stop` la corta
+    (lo ya guardado se conserva). Devuelve un resumen de la ejecución.
+    """
+    results = results or backtest_results()
+    if restart:
+        results.clear(model_version)
+    partitions = month_partitions(zones, start, end)
+    done = results.done(model_version)
+    pending = [p for p in partitions if p not in done]
+    workers = workers or os.cpu_count() or 1
+    stats = {
+        "model_version": model_version, "partitions": len(partitions), "skipped": len(partitions) - len(pending),
+        "scored": 0, "rows": 0, "workers": workers, "interrupted": False,
+    }
+    t0 = time.perf_counter()
+
+    if pending:
+        # "spawn": procesos limpios (sin el pool de la BD ni los hilos del proceso padre)
+        executor = ProcessPoolExecutor(
+            max_workers=min(workers, len(pending)), mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker, initargs=(model_version,),
+        )
+        try:
+            futures = [executor.submit(score_partition, zone, month) for zone, month in pending]
+            for future in as_completed(futures):
+                row = future.result()
+                results.save(model_version, [row])
+                stats["scored"] += 1
+                stats["rows"] += row["n_rows"]
+                if progress:
+                    progress(stats["skipped"] + stats["scored"], len(partitions))
+                if stop is not None and stop.is_set():
+                    stats["interrupted"] = True
+                    break
+        except KeyboardInterrupt:
+            stats["interrupted"] = True
+            raise
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            stats["elapsed_s"] = round(time.perf_counter() - t0, 2)
+
+    stats.setdefault("elapsed_s", round(time.perf_counter() - t0, 2))
+    return stats
+
+
+class BacktestJob:
+    """Backtest lanzado desde la API: corre en un hilo (el pool de procesos no bloquea el loop)."""
+
+    def __init__(self, predictor):
+        self.predictor = predictor
+        self.state = {"running": False, "done": 0, "total": 0, "last_run": None, "error": None}
+        self._stop = threading.Event()
+        self._task = None
+
+    def start(self, **options):
+        """Lanza el backtest del modelo activo. Devuelve False si ya hay uno en marcha."""
+        if self.state["running"]:
+            return False
+        if not self.predictor.ensure_loaded():
+            raise RuntimeError("Modelo no disponible.")
+        self._stop.clear()
+        self.state.update(running=True, done=0, total=0, error=None, model_version=self.predictor.model_version)
+        self._task = asyncio.create_task(self._run(options))
+        return True
+
+    async def _run(self, options):
+        zones = options.pop("zones", None) or self.predictor.schema.zones
+        try:
+            self.state["last_run"] = await anyio.to_thread.run_sync(
+                lambda: run_backtest(
+                    self.state["model_version"], zones, progress=self._progress, stop=self._stop, **options
+                )
+            )
+        except Exception as e:
+            print(f"❌ Error en el backtest: {e}")
+            self.state["error"] = str(e)
+        finally:
+            self.state["running"] = False
+
+    def _progress(self, done, total):
+        self.state.update(done=done, total=total)
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self):
+        return dict(self.state)
@@ -0,0 +1,128 @@
+"""
+Caché en memoria LRU + TTL con contadores (aciertos, fallos, expulsiones).
+Segura entre hilos: FastAPI ejecuta los endpoints síncronos en un threadpool.
+
+`ResponseCache` añade encima "single-flight" para corrutinas: peticiones idénticas
+concurrentes esperan al mismo cálculo en vez de repetirlo.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = int(maxsize)
+        self.ttl = float(ttl)
+        self._data = OrderedDict()  # clave -> (caduca_en, valor)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class ResponseCache:
+    """
+    Respuestas de endpoints async: TTLCache + coalescencia de peticiones en vuelo.
+    El cálculo corre en su propia tarea, así que si el cliente que lo lanzó se desconecta
+    los demás siguen esperando el mismo resultado (y se cachea igual).
+    Los errores no se cachean: se propagan a todos los que esperaban.
+    """
+
+    def __init__(self, maxsize: int, historical_ttl: float, recent_ttl: float):
+        self.cache = TTLCache(maxsize, historical_ttl)
+        self.historical_ttl = float(historical_ttl)
+        self.recent_ttl = float(recent_ttl)
+        self._inflight = {}
+        self.coalesced = 0
+
+    def ttl_for(self, end):
+        """TTL largo si el rango termina antes de la hora actual (datos inmutables)."""
+        import pandas as pd
+
+        return self.historical_ttl if pd.Timestamp(end) < pd.Timestamp.now().floor("h") else self.recent_ttl
+
+    async def get_or_compute(self, key, compute, ttl: float = None):
+        """Valor cacheado, o el resultado de `compute()` (una sola vez por clave a la vez)."""
+        value = self.cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t, ttl))
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task, ttl):
+        self._inflight.pop(key, None)
+        if task.cancelled():
+            return
+        if task.exception() is None:  # (marca la excepción como recogida)
+            self.cache.set(key, task.result(), ttl)
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        return {
+            **self.cache.stats(),
+            "recent_ttl_seconds": self.recent_ttl,
+            "inflight": len(self._inflight),
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,216 @@
+"""
+Climatología de temperatura para el modo futuro (simulación y previsiones precalculadas).
+
+En vez de una temperatura fija (SIMULATION_TEMPERATURE) para todas las horas, el modelo
+recibe la temperatura histórica esperada de la zona para ese mes y hora del día: media y
+percentiles (p10, p50, p90) de `consumo_granada.temperature`.
+
+Se construye en la ingesta (tabla `climatologia_granada` en Postgres, `climatology.npz` en el
+almacén local) y la app la carga una vez en un array denso float32[zonas, 12, 24, estadísticos]
+(~90 KB para 20 zonas): cada consulta es un indexado NumPy, sin red ni BD por petición.
+Sin climatología (o celda sin datos) se usa SIMULATION_TEMPERATURE.
+"""
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from src.config import SIMULATION_TEMPERATURE, SIMULATION_TEMPERATURE_STAT, SIMULATION_TEMPERATURE_STEP
+from src.database import fetch_all, table_exists
+from src.services.feature_schema import zone_slug
+
+CLIMATOLOGY_TABLE = "climatologia_granada"
+STATS = ("mean", "p10", "p50", "p90")
+PERCENTILES = (10, 50, 90)
+_CELLS = 12 * 24
+
+_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {CLIMATOLOGY_TABLE} (
+        zone_name TEXT NOT NULL,
+        month SMALLINT NOT NULL,
+        hour SMALLINT NOT NULL,
+        n_rows BIGINT NOT NULL,
+        mean_temp DOUBLE PRECISION,
+        p10_temp DOUBLE PRECISION,
+        p50_temp DOUBLE PRECISION,
+        p90_temp DOUBLE PRECISION,
+        PRIMARY KEY (zone_name, month, hour)
+    )
+"""
+
+if SIMULATION_TEMPERATURE_STAT not in STATS:
+    print(f"⚠️ SIMULATION_TEMPERATURE_STAT desconocido '{SIMULATION_TEMPERATURE_STAT}': se usa la media.")
+    DEFAULT_STAT = "mean"
+else:
+    DEFAULT_STAT = SIMULATION_TEMPERATURE_STAT
+
+
+class Climatology:
+    """Estadísticos de temperatura por zona x mes x hora en arrays densos (búsqueda O(1) por hora)."""
+
+    def __init__(self, zones, counts, stats):
+        self.zones = [str(z) for z in zones]
+        self.index = {zone_slug(z): i for i, z in enumerate(self.zones)}
+        self.counts = np.asarray(counts, dtype=np.int32)   # [zona, mes-1, hora]
+        self.stats = np.asarray(stats, dtype=np.float32)   # [zona, mes-1, hora, STATS] (NaN = sin datos)
+
+    @classmethod
+    def from_records(cls, records):
+        """Desde filas (zone_name, month, hour, n_rows, mean, p10, p50, p90), p. ej. la tabla de la BD."""
+        records = list(records)
+        zones = sorted({r[0] for r in records})
+        position = {z: i for i, z in enumerate(zones)}
+        counts = np.zeros((len(zones), 12, 24), dtype=np.int32)
+        stats = np.full((len(zones), 12, 24, len(STATS)), np.nan, dtype=np.float32)
+        for zone, month, hour, n_rows, *values in records:
+            i = position[zone]
+            counts[i, month - 1, hour] = n_rows
+            stats[i, month - 1, hour] = [np.nan if v is None else v for v in values]
+        return cls(zones, counts, stats)
+
+    @classmethod
+    def from_series(cls, series):
+        """Desde series horarias {zona: (timestamps, temperaturas)}; NaN = hora sin temperatura."""
+        import pandas as pd
+
+        zones = sorted(series)
+        counts = np.zeros((len(zones), _CELLS), dtype=np.int32)
+        stats = np.full((len(zones), _CELLS, len(STATS)), np.nan, dtype=np.float32)
+        for i, zone in enumerate(zones):
+            timestamps, temps = series[zone]
+            ts = pd.DatetimeIndex(timestamps)
+            temps = np.asarray(temps, dtype=np.float64)
+            valid = ~np.isnan(temps)
+            cells = ((ts.month.values - 1) * 24 + ts.hour.values)[valid]
+            temps = temps[valid]
+            # Orden por celda: cada celda es un tramo contiguo
+            order = np.argsort(cells, kind="stable")
+            cells, temps = cells[order], temps[order]
+            bounds = np.searchsorted(cells, np.arange(_CELLS + 1))
+            for cell, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])):
+                if hi > lo:
+                    values = temps[lo:hi]
+                    counts[i, cell] = hi - lo
+                    stats[i, cell] = [values.mean(), *np.percentile(values, PERCENTILES)]
+        return cls(zones, counts.reshape(-1, 12, 24), stats.reshape(-1, 12, 24, len(STATS)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["zones"], data["counts"], data["stats"])
+
+    def save(self, path):
+        np.savez(path, zones=np.array(self.zones, dtype=str), counts=self.counts, stats=self.stats)
+
+    def temperatures(self, zone_names, timestamps, stat: str = DEFAULT_STAT, fallback: float = SIMULATION_TEMPERATURE):
+        """
+        Temperatura esperada de cada hora (`zone_names`: una zona o una por hora).
+        Zona desconocida o celda sin datos -> `fallback`.
+        """
+        import pandas as pd
+
+        ts = pd.DatetimeIndex(timestamps)
+        result = np.full(len(ts), fallback, dtype=np.float64)
+        if not len(ts):
+            return result
+        if isinstance(zone_names, str):
+            zone_idx = np.full(len(ts), self.index.get(zone_slug(zone_names), -1))
+        else:
+            unique_zones, inverse = np.unique(np.asarray(zone_names, dtype=str), return_inverse=True)
+            zone_idx = np.array([self.index.get(zone_slug(z), -1) for z in unique_zones])[inverse]
+
+        rows = np.flatnonzero(zone_idx >= 0)
+        values = self.stats[zone_idx[rows], ts.month.values[rows] - 1, ts.hour.values[rows], STATS.index(stat)]
+        has_value = ~np.isnan(values)
+        result[rows[has_value]] = values[has_value]
+        return result
+
+    def summary(self):
+        return {"zones": len(self.zones), "cells": int(np.count_nonzero(self.counts)), "rows": int(self.counts.sum())}
+
+
+def simulation_temperatures(climatology, zone_names, timestamps, step: float = SIMULATION_TEMPERATURE_STEP):
+    """
+    Temperaturas del modo futuro: climatología si la hay; si no, SIMULATION_TEMPERATURE.
+    Se redondean a `step` (es la entrada real del modelo, no solo la clave de caché).
+    """
+    if climatology is None:
+        temps = np.full(len(timestamps), SIMULATION_TEMPERATURE, dtype=np.float64)
+    else:
+        temps = climatology.temperatures(zone_names, timestamps)
+    if step > 0:
+        temps = np.round(temps / step) * step
+    return temps
+
+
+# --- CONSTRUCCIÓN (ingesta) ---
+
+def refresh_climatology(engine):
+    """Recalcula la tabla entera desde consumo_granada (un GROUP BY). Devuelve el nº de celdas."""
+    with engine.begin() as conn:
+        conn.execute(text(_DDL))
+        conn.execute(text(f"TRUNCATE {CLIMATOLOGY_TABLE}"))
+        result = conn.execute(text(f"""
+            INSERT INTO {CLIMATOLOGY_TABLE}
+            SELECT zone_name,
+                   EXTRACT(MONTH FROM timestamp)::SMALLINT,
+                   EXTRACT(HOUR FROM timestamp)::SMALLINT,
+                   COUNT(*),
+                   AVG(temperature),
+                   percentile_cont(0.1) WITHIN GROUP (ORDER BY temperature),
+                   percentile_cont(0.5) WITHIN GROUP (ORDER BY temperature),
+                   percentile_cont(0.9) WITHIN GROUP (ORDER BY temperature)
+            FROM consumo_granada
+            WHERE temperature IS NOT NULL
+            GROUP BY 1, 2, 3
+        """))
+    return result.rowcount
+
+
+async def read_climatology():
+    """Climatología guardada en la BD (o None si aún no se ha construido)."""
+    if not await table_exists(CLIMATOLOGY_TABLE):
+        return None
+    rows = await fetch_all(
+        text(f"""
+            SELECT zone_name, month, hour, n_rows, mean_temp, p10_temp, p50_temp, p90_temp
+            FROM {CLIMATOLOGY_TABLE}
+        """),
+        name="climatology",
+    )
+    return Climatology.from_records(rows) if rows else None
+
+
+# --- EN MEMORIA (app) ---
+
+class ClimatologyIndex:
+    """
+    Climatología cargada una vez desde el almacenamiento (`loader`: corrutina que la devuelve
+    o None). Si aún no existe se reintenta pasado `retry_seconds` (p. ej. tras la ingesta).
+    """
+
+    def __init__(self, loader, retry_seconds: float = 300):
+        self.loader = loader
+        self.retry_seconds = retry_seconds
+        self.current = None
+        self._checked_at = None
+
+    async def get(self):
+        now = time.monotonic()
+        if self.current is None and (self._checked_at is None or now - self._checked_at >= self.retry_seconds):
+            self._checked_at = now
+            try:
+                self.current = await self.loader()
+            except Exception as e:
+                print(f"⚠️ No se pudo cargar la climatología: {e}")
+            if self.current is not None:
+                print(f"🌡️ Climatología cargada: {self.current.summary()['zones']} zonas x 12 meses x 24 horas.")
+        return self.current
+
+    def invalidate(self):
+        """Datos nuevos: se recarga en la siguiente consulta."""
+        self.current = None
+        self._checked_at = None
+
+    def status(self):
+        return {"loaded": self.current is not None, "stat": DEFAULT_STAT, **(self.current.summary() if self.current else {})}
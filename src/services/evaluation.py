@@ -0,0 +1,72 @@
+"""
+Métricas de error Realidad vs IA (MAE, RMSE, MAPE, sesgo), vectorizadas con NumPy.
+"""
+import numpy as np
+
+
+def error_metrics(real, predicted):
+    """
+    Métricas sobre los pares con dato real. MAPE ignora los reales a 0 (división indefinida).
+    Devuelve None en las métricas si no hay pares válidos.
+    """
+    return RunningErrorMetrics().update(real, predicted).result()
+
+
+class RunningErrorMetrics:
+    """
+    Las mismas métricas acumuladas por tramos (sumas, no pares): memoria constante en
+    auditorías en streaming. `result()` da lo mismo que `error_metrics` sobre todos los pares.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.abs_err = 0.0
+        self.sq_err = 0.0
+        self.err = 0.0
+        self.ape = 0.0
+        self.n_ape = 0
+
+    def update(self, real, predicted):
+        real = np.asarray(real, dtype=np.float64)
+        predicted = np.asarray(predicted, dtype=np.float64)
+        valid = np.isfinite(real) & np.isfinite(predicted)
+        real, predicted = real[valid], predicted[valid]
+
+        err = predicted - real
+        nonzero = real != 0
+        self.n += len(real)
+        self.abs_err += float(np.sum(np.abs(err)))
+        self.sq_err += float(np.sum(err ** 2))
+        self.err += float(np.sum(err))
+        self.ape += float(np.sum(np.abs(err[nonzero] / real[nonzero])))
+        self.n_ape += int(np.count_nonzero(nonzero))
+        return self
+
+    # Estado serializable: las sumas se pueden guardar (p. ej. por zona x mes) y volver a sumar
+    STATE = ("n", "abs_err", "sq_err", "err", "ape", "n_ape")
+
+    def state(self):
+        return {name: getattr(self, name) for name in self.STATE}
+
+    @classmethod
+    def from_state(cls, state):
+        metrics = cls()
+        for name in cls.STATE:
+            setattr(metrics, name, type(getattr(metrics, name))(state[name]))
+        return metrics
+
+    def merge(self, other):
+        for name in self.STATE:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        return self
+
+    def result(self):
+        if self.n == 0:
+            return {"n": 0, "mae": None, "rmse": None, "mape": None, "bias": None}
+        return {
+            "n": self.n,
+            "mae": round(self.abs_err / self.n, 2),
+            "rmse": round(float(np.sqrt(self.sq_err / self.n)), 2),
+            "mape": round(self.ape / self.n_ape * 100, 2) if self.n_ape else None,
+            "bias": round(self.err / self.n, 2),
+        }
@@ -0,0 +1,141 @@
+"""
+Esquema de features del modelo, congelado al cargarlo.
+
+Se calcula UNA vez por modelo: posición de cada columna, posición one-hot de cada zona
+y una fila plantilla en float64. En el camino caliente construir el lote es solo
+asignar columnas por índice en un buffer NumPy (sin dicts ni búsquedas lineales).
+"""
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+import numpy as np
+
+from src.config import ZONES
+
+ZONE_PREFIX = "zona_"
+# Zona como una sola columna categórica (HistGradientBoosting): código = posición en config.ZONES
+ZONE_CODE_FEATURE = "zone_code"
+
+# Columnas numéricas que sabemos reconstruir a partir de fecha + temperatura
+CALENDAR_FEATURES = (
+    "temperature", "hour", "month", "day_of_month", "day_of_week", "year",
+    "hour_sin", "hour_cos", "month_sin", "month_cos", "temp_sq",
+    "is_weekend", "is_holiday", "is_non_working",
+)
+
+
+class UnknownZoneError(ValueError):
+    """La zona pedida no tiene columna one-hot en el modelo."""
+
+
+def zone_slug(zone_name: str) -> str:
+    """'Albaicin Alto' / 'albaicin_alto' / 'zona_Albaicin_Alto' -> 'albaicin_alto'."""
+    slug = str(zone_name).strip().lower().replace(" ", "_")
+    return slug[len(ZONE_PREFIX):] if slug.startswith(ZONE_PREFIX) else slug
+
+
+def zone_display_name(zone_name: str) -> str:
+    """Nombre tal y como lo guarda la ingesta en `consumo_granada.zone_name` ('Albaicin Alto')."""
+    return zone_slug(zone_name).replace("_", " ").title()
+
+
+def zone_feature_name(zone_name: str) -> str:
+    """Columna one-hot de la zona, como en el CSV procesado ('zona_Albaicin_Alto')."""
+    return ZONE_PREFIX + zone_display_name(zone_name).replace(" ", "_")
+
+
+def calendar_features(dt, temperature):
+    """
+    Features matemáticas (idéntico al notebook) a partir de fechas (DatetimeIndex) y temperatura.
+    Las usan tanto la API (al predecir) como el entrenamiento (si el CSV no trae la columna).
+    """
+    hour = dt.hour.to_numpy()
+    month = dt.month.to_numpy()
+    day_of_week = dt.dayofweek.to_numpy()
+    weekend = (day_of_week >= 5).astype(np.float64)
+
+    return {
+        'temperature': temperature,
+        'hour': hour,
+        'month': month,
+        'day_of_month': dt.day.to_numpy(),
+        'day_of_week': day_of_week,
+        'year': dt.year.to_numpy(),
+        'hour_sin': np.sin(2 * np.pi * hour / 24),
+        'hour_cos': np.cos(2 * np.pi * hour / 24),
+        'month_sin': np.sin(2 * np.pi * month / 12),
+        'month_cos': np.cos(2 * np.pi * month / 12),
+        'temp_sq': temperature ** 2,
+        'is_weekend': weekend,
+        'is_holiday': weekend, # Simplificado
+        'is_non_working': weekend
+    }
+
+
+@dataclass(frozen=True)
+class FeatureSchema:
+    names: Tuple[str, ...]
+    index: Mapping[str, int]          # nombre de columna -> posición
+    zone_index: Mapping[str, int]     # slug de zona -> posición de su columna one-hot
+    numeric: Tuple[Tuple[str, int], ...]  # (feature de calendario, posición) presentes en el modelo
+    template: np.ndarray              # fila base (todo a 0), solo lectura
+    zone_column: Optional[int] = None  # posición de ZONE_CODE_FEATURE (zona categórica) o None (one-hot)
+
+    @classmethod
+    def from_feature_names(cls, feature_names):
+        names = tuple(str(col) for col in feature_names)
+        index = {name: pos for pos, name in enumerate(names)}
+        if ZONE_CODE_FEATURE in index:
+            zone_index = {zone: code for code, zone in enumerate(ZONES)}
+        else:
+            zone_index = {
+                zone_slug(name): pos for pos, name in enumerate(names) if name.lower().startswith(ZONE_PREFIX)
+            }
+
+        unexpected = sorted(set(zone_index) - set(ZONES))
+        missing = sorted(set(ZONES) - set(zone_index))
+        if unexpected or missing:
+            print(f"⚠️ Las zonas del modelo no coinciden con config.ZONES (sobran {unexpected}, faltan {missing}).")
+
+        template = np.zeros(len(names), dtype=np.float64)
+        template.flags.writeable = False
+
+        return cls(
+            names=names,
+            index=MappingProxyType(index),
+            zone_index=MappingProxyType(zone_index),
+            numeric=tuple((name, index[name]) for name in CALENDAR_FEATURES if name in index),
+            template=template,
+            zone_column=index.get(ZONE_CODE_FEATURE),
+        )
+
+    @property
+    def zones(self):
+        return tuple(self.zone_index)
+
+    def zone_position(self, zone_name: str) -> int:
+        """Posición one-hot de la zona (o su código, si es categórica). Falla en vez de predecir con todas las zonas a 0."""
+        try:
+            return self.zone_index[zone_slug(zone_name)]
+        except KeyError:
+            raise UnknownZoneError(f"Zona desconocida para el modelo: '{zone_name}'.") from None
+
+    def fill_zones(self, X: np.ndarray, zone_names):
+        """Escribe la zona de cada fila: 1 en su columna one-hot o su código en la columna categórica."""
+        if isinstance(zone_names, str):
+            rows, positions = slice(None), self.zone_position(zone_names)
+        else:
+            unique_zones, inverse = np.unique(np.asarray(zone_names, dtype=str), return_inverse=True)
+            rows = np.arange(len(X))
+            positions = np.array([self.zone_position(z) for z in unique_zones], dtype=np.intp)[inverse]
+        if self.zone_column is None:
+            X[rows, positions] = 1
+        else:
+            X[rows, self.zone_column] = positions
+
+    def empty_matrix(self, n_rows: int) -> np.ndarray:
+        """Buffer (n_rows x n_features) inicializado con la fila plantilla."""
+        X = np.empty((n_rows, len(self.names)), dtype=np.float64)
+        X[:] = self.template
+        return X
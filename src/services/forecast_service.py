@@ -0,0 +1,225 @@
+"""
+Previsiones precalculadas (modo futuro).
+
+Genera previsiones horarias para los próximos N días de TODAS las zonas en un solo lote
+y las guarda en `forecast_granada`. El modo simulación de /api/audit lee de ahí y solo
+infiere en vivo las horas que falten. La temperatura de cada hora sale de la climatología
+zona x mes x hora (`climatology.py`) o, si no la hay, de SIMULATION_TEMPERATURE.
+
+Se regeneran tras cada carga de modelo (cambia `model_version`) o cada
+FORECAST_REFRESH_HOURS, desde una tarea en segundo plano o con
+`python scripts/precompute_forecasts.py`.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import anyio
+import numpy as np
+from sqlalchemy import text, bindparam
+
+from src.config import FORECAST_DAYS, FORECAST_REFRESH_HOURS
+from src.database import fetch_all, table_exists, remember_table
+from src.services.climatology import simulation_temperatures
+from src.services.feature_schema import zone_display_name
+
+FORECAST_TABLE = "forecast_granada"
+
+_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {FORECAST_TABLE} (
+        zone_name TEXT NOT NULL,
+        timestamp TIMESTAMP NOT NULL,
+        prediction_kwh DOUBLE PRECISION NOT NULL,
+        temperature DOUBLE PRECISION,
+        model_version TEXT NOT NULL,
+        generated_at TIMESTAMP NOT NULL,
+        PRIMARY KEY (zone_name, timestamp, model_version)
+    )
+"""
+
+
+def _ensure_table(conn):
+    """Crea la tabla; si es anterior (clave sin model_version) amplía la clave primaria."""
+    conn.execute(text(_DDL))
+    key = conn.execute(
+        text("""
+            SELECT c.conname, array_agg(a.attname::text)
+            FROM pg_constraint c
+            JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey)
+            WHERE c.conrelid = to_regclass(:table) AND c.contype = 'p'
+            GROUP BY c.conname
+        """),
+        {"table": FORECAST_TABLE},
+    ).fetchone()
+    if key is not None and "model_version" not in key[1]:
+        print(f"🔧 {FORECAST_TABLE}: se añade model_version a la clave primaria.")
+        conn.execute(text(f"ALTER TABLE {FORECAST_TABLE} DROP CONSTRAINT {key[0]}"))
+        conn.execute(text(f"ALTER TABLE {FORECAST_TABLE} ADD PRIMARY KEY (zone_name, timestamp, model_version)"))
+
+
+def precompute_forecasts(engine, predictor, days: int = FORECAST_DAYS, zones=None, start=None, climatology=None):
+    """
+    Calcula y guarda previsiones horarias [start, start + days) para las zonas dadas (todas por defecto).
+    `climatology`: temperaturas esperadas por zona x mes x hora (None = SIMULATION_TEMPERATURE).
+    Devuelve el número de filas escritas.
+    """
+    import pandas as pd
+
+    if not predictor.ensure_loaded():
+        print("⚠️ Sin modelo cargado: no se generan previsiones.")
+        return 0
+
+    zones = [zone_display_name(z) for z in (zones or predictor.schema.zones)]
+    start = pd.Timestamp(start or datetime.now()).floor("h")
+    timestamps = pd.date_range(start, periods=days * 24, freq="h")
+
+    # Todas las zonas x todas las horas en un único lote, sin caché: los valores se guardan
+    # en la tabla y meterlos en la LRU solo desalojaría las entradas de los usuarios
+    zone_col = np.repeat(zones, len(timestamps))
+    ts_col = np.tile(timestamps, len(zones))
+    temps = simulation_temperatures(climatology, zone_col, ts_col)
+    preds = predictor.predict_bulk(ts_col, zone_col, temps).tolist()
+
+    generated_at = datetime.now()
+    records = [
+        {
+            "zone_name": zone,
+            "timestamp": ts.to_pydatetime(),
+            "prediction_kwh": pred,
+            "temperature": float(temp),
+            "model_version": predictor.model_version,
+            "generated_at": generated_at,
+        }
+        for zone, ts, pred, temp in zip(zone_col, pd.DatetimeIndex(ts_col), preds, temps)
+    ]
+
+    with engine.begin() as conn:
+        _ensure_table(conn)
+        # Se sustituye la ventana de esta versión del modelo (las demás siguen sirviendo a
+        # los workers que aún no la han cargado) y se purga lo ya pasado de todas
+        conn.execute(
+            text(f"""
+                DELETE FROM {FORECAST_TABLE}
+                WHERE zone_name IN :zones
+                  AND ((timestamp >= :start AND model_version = :version)
+                       OR timestamp < :start - INTERVAL '1 day')
+            """).bindparams(bindparam("zones", expanding=True)),
+            {"zones": zones, "start": start.to_pydatetime(), "version": predictor.model_version},
+        )
+        conn.execute(
+            text(f"""
+                INSERT INTO {FORECAST_TABLE}
+                    (zone_name, timestamp, prediction_kwh, temperature, model_version, generated_at)
+                VALUES (:zone_name, :timestamp, :prediction_kwh, :temperature, :model_version, :generated_at)
+            """),
+            records,
+        )
+    return len(records)
+
+
+async def read_forecasts(zone_name: str, start, end, model_version: str):
+    """Previsiones guardadas del modelo actual para [start, end]: {timestamp: kWh}."""
+    import pandas as pd
+
+    if not await table_exists(FORECAST_TABLE):
+        return {}
+    rows = await fetch_all(
+        text(f"""
+            SELECT timestamp, prediction_kwh
+            FROM {FORECAST_TABLE}
+            WHERE zone_name = :zone AND model_version = :version
+              AND timestamp >= :start AND timestamp <= :end
+        """),
+        {"zone": zone_display_name(zone_name), "version": model_version, "start": start, "end": end},
+        name="read_forecasts",
+    )
+    return {pd.Timestamp(ts): float(pred) for ts, pred in rows}
+
+
+class ForecastScheduler:
+    """
+    Tarea asyncio que regenera las previsiones cuando cambia la versión del modelo
+    o cuando han pasado FORECAST_REFRESH_HOURS. El cálculo va en un hilo (no bloquea el loop).
+    """
+
+    def __init__(self, engine, predictor, refresh_hours: float = FORECAST_REFRESH_HOURS, poll_seconds: float = 60,
+                 climatology=None):
+        self.engine = engine
+        self.predictor = predictor
+        self.climatology = climatology  # ClimatologyIndex (o None: temperatura fija)
+        self.refresh_seconds = refresh_hours * 3600
+        self.poll_seconds = poll_seconds
+        self.last_version = None
+        self.last_run = 0.0
+        self.last_rows = 0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _due(self):
+        version = self.predictor.model_version
+        return version is not None and (
+            version != self.last_version or time.monotonic() - self.last_run >= self.refresh_seconds
+        )
+
+    async def _loop(self):
+        while True:
+            try:
+                if self._due():
+                    await self.run_once()
+            except Exception as e:
+                print(f"❌ Error precalculando previsiones: {e}")
+                self.last_run = time.monotonic()  # reintento en el siguiente intervalo
+            await asyncio.sleep(self.poll_seconds)
+
+    async def run_once(self):
+        version = self.predictor.model_version
+        if await self._fresh_in_db(version):
+            # Otra instancia (o un arranque anterior) ya las generó para este modelo
+            print(f"🗓️ Previsiones al día para el modelo {version}.")
+            self.last_rows = 0
+        else:
+            t0 = time.perf_counter()
+            climatology = await self.climatology.get() if self.climatology is not None else None
+            self.last_rows = await anyio.to_thread.run_sync(
+                lambda: precompute_forecasts(self.engine, self.predictor, climatology=climatology)
+            )
+            remember_table(FORECAST_TABLE)
+            print(f"🗓️ {self.last_rows} previsiones generadas en {time.perf_counter() - t0:.2f}s (modelo {version}).")
+        self.last_version = version
+        self.last_run = time.monotonic()
+
+    async def _fresh_in_db(self, version):
+        if not await table_exists(FORECAST_TABLE):
+            return False
+        rows = await fetch_all(
+            text(f"SELECT MAX(generated_at), MAX(timestamp) FROM {FORECAST_TABLE} WHERE model_version = :version"),
+            {"version": version},
+            name="forecast_freshness",
+        )
+        generated_at, horizon = rows[0] if rows else (None, None)
+        if generated_at is None:
+            return False
+        now = datetime.now()
+        return (
+            now - generated_at < timedelta(seconds=self.refresh_seconds)
+            and horizon >= now + timedelta(days=FORECAST_DAYS - 1)
+        )
+
+    def status(self):
+        return {
+            "model_version": self.last_version,
+            "last_rows": self.last_rows,
+            "seconds_since_run": round(time.monotonic() - self.last_run, 1) if self.last_run else None,
+        }
@@ -0,0 +1,138 @@
+"""
+Caché HTTP condicional (ETag / Cache-Control) para las lecturas GET de la API.
+
+El ETag se calcula ANTES de ejecutar el endpoint a partir de:
+versión de los datos + versión del modelo + ruta + parámetros (ordenados).
+Si coincide con `If-None-Match` se responde 304 sin tocar la BD ni el modelo.
+
+La versión de los datos se guarda en memoria y se refresca en segundo plano
+cada DATA_VERSION_TTL segundos: la comprobación del ETag nunca espera a la BD
+(salvo la primera vez).
+"""
+import asyncio
+import hashlib
+import time
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+
+
+class DataVersion:
+    """Versión de los datos cacheada; `on_change` se llama cuando cambia (p. ej. tras una ingesta)."""
+
+    def __init__(self, fetch, ttl: float, on_change=None):
+        self.fetch = fetch
+        self.ttl = float(ttl)
+        self.on_change = on_change
+        self.value = None
+        self.checked_at = 0.0
+        self._refreshing = None
+
+    async def get(self):
+        if self.value is None:
+            await self.refresh()
+        elif time.monotonic() - self.checked_at >= self.ttl and self._refreshing is None:
+            # Versión algo vieja: se sirve la actual y se refresca sin bloquear la petición
+            self._refreshing = asyncio.ensure_future(self.refresh())
+            self._refreshing.add_done_callback(self._refreshed)
+        return self.value
+
+    def _refreshed(self, task):
+        self._refreshing = None
+        if not task.cancelled() and task.exception() is not None:
+            print(f"⚠️ No se pudo refrescar la versión de los datos: {task.exception()}")
+
+    async def refresh(self):
+        value = hashlib.sha256(str(await self.fetch()).encode()).hexdigest()[:12]
+        self.checked_at = time.monotonic()
+        if self.value is not None and value != self.value and self.on_change is not None:
+            print(f"🔄 Datos nuevos (versión {value}).")
+            self.on_change()
+        self.value = value
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha256("\x1f".join(str(p) for p in parts).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def is_historical(end_date) -> bool:
+    """El rango termina antes de la hora actual: su respuesta ya no puede cambiar (salvo re-ingesta)."""
+    import pandas as pd
+
+    try:
+        return pd.Timestamp(end_date) < pd.Timestamp.now().floor("h")
+    except (ValueError, TypeError):
+        return False
+
+
+_END_PARTS = ("anio_fin", "mes_fin", "dia_fin", "hora_fin")
+
+
+def range_end(query_params):
+    """
+    Fin del rango pedido: `end_date` o, en /api/dashboard/filtrar, anio/mes/dia/hora_fin.
+    None si la petición no tiene un fin de rango válido.
+    """
+    end_date = query_params.get("end_date")
+    if end_date is not None:
+        return end_date
+    try:
+        year, month, day, hour = (int(query_params[name]) for name in _END_PARTS)
+        return datetime(year, month, day, hour)
+    except (KeyError, ValueError):
+        return None
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+class ConditionalGetMiddleware(BaseHTTPMiddleware):
+    """
+    ETag + 304 para las rutas GET indicadas.
+    `versions`: corrutina que devuelve la parte "global" del ETag (datos + modelo).
+    Rangos históricos (fin del rango en el pasado, ver `range_end`): `Cache-Control: public, max-age=...`;
+    el resto `no-cache` (el navegador revalida y normalmente recibe un 304).
+    """
+
+    def __init__(self, app, paths, versions, max_age: int, stats: dict = None):
+        super().__init__(app)
+        self.paths = frozenset(paths)
+        self.versions = versions
+        self.max_age = int(max_age)
+        self.stats = stats if stats is not None else {}
+        self.stats.update(not_modified=0, validated=0)
+
+    async def dispatch(self, request, call_next):
+        if request.method != "GET" or request.url.path not in self.paths:
+            return await call_next(request)
+
+        try:
+            version = await self.versions()
+        except Exception:
+            return await call_next(request)  # sin versión no hay ETag fiable
+
+        params = sorted(parse_qsl(request.url.query, keep_blank_values=True))
+        etag = make_etag(version, request.url.path, params)
+        end = range_end(request.query_params)
+        if end is not None and is_historical(end):
+            cache_control = f"public, max-age={self.max_age}"
+        else:
+            cache_control = "no-cache"
+        headers = {"ETag": etag, "Cache-Control": cache_control}
+
+        self.stats["validated"] += 1
+        if _matches(request.headers.get("if-none-match"), etag):
+            self.stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+
+        response = await call_next(request)
+        if response.status_code == 200:
+            response.headers.update(headers)
+        return response
@@ -0,0 +1,298 @@
+"""
+Almacén columnar local: alternativa a Supabase sin servicios externos.
+
+Una serie horaria densa por zona y columna, en ficheros .npy abiertos con memory-map:
+
+    data/store/meta.json                       inicio, nº de horas y zonas
+    data/store/<slug>.consumption_kwh.npy      float64[horas] (NaN = nulo; KPIs idénticos a la BD)
+    data/store/<slug>.temperature.npy          float64[horas]
+    data/store/<slug>.present.npy              bool[horas] (hay fila para esa hora)
+    data/store/climatology.npz                 temperatura por zona x mes x hora (modo futuro)
+
+La posición de un timestamp es su desfase en horas desde el inicio, así que un rango
+[start, end] es un slice directo (sin índices ni búsquedas). Agregados y buckets se
+calculan sobre el slice con NumPy con la misma semántica que el SQL (COUNT(*), SUM/MIN/MAX
+ignorando nulos).
+"""
+import json
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.config import DB_FETCH_BATCH_ROWS
+from src.services.climatology import Climatology
+from src.services.feature_schema import zone_slug
+from src.services.window_aggregates import SERIES_LIMIT
+
+COLUMNS = ("consumption_kwh", "temperature", "present")
+CLIMATOLOGY_FILE = "climatology.npz"
+_HOUR = np.timedelta64(1, "h")
+
+
+def build_local_store(frames, out_dir, source: str = ""):
+    """
+    Construye el almacén a partir de DataFrames con columnas timestamp, zone_name,
+    consumption_kwh y temperature (p. ej. los bloques de la ingesta). Devuelve el nº de filas.
+    """
+    parts = [df[["timestamp", "zone_name", "consumption_kwh", "temperature"]] for df in frames]
+    if not parts:
+        return 0
+    data = pd.concat(parts, ignore_index=True)
+    hours = pd.to_datetime(data["timestamp"]).dt.floor("h").values.astype("datetime64[h]")
+
+    start = hours.min()
+    n_hours = int((hours.max() - start) / _HOUR) + 1
+    offsets = ((hours - start) / _HOUR).astype(np.int64)
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    zones = {}
+    for zone_name, idx in data.groupby("zone_name").indices.items():
+        slug = zone_slug(zone_name)
+        zones[slug] = zone_name
+        pos = offsets[idx]
+        columns = {
+            "consumption_kwh": np.full(n_hours, np.nan, dtype=np.float64),
+            "temperature": np.full(n_hours, np.nan, dtype=np.float64),
+            "present": np.zeros(n_hours, dtype=bool),
+        }
+        # Horas duplicadas: gana la última fila (como un upsert)
+        columns["consumption_kwh"][pos] = data["consumption_kwh"].values[idx]
+        columns["temperature"][pos] = data["temperature"].values[idx]
+        columns["present"][pos] = True
+        for name, values in columns.items():
+            np.save(out_dir / f"{slug}.{name}.npy", values)
+
+    meta = {
+        "start": str(pd.Timestamp(start)),
+        "hours": n_hours,
+        "zones": dict(sorted(zones.items(), key=lambda item: item[1])),
+        "rows": int(len(data)),
+        "source": str(source),
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    (out_dir / "meta.json").write_text(json.dumps(meta, indent=2, ensure_ascii=False), encoding="utf-8")
+    build_climatology(out_dir)
+    return len(data)
+
+
+def build_climatology(out_dir):
+    """Climatología de temperatura (zona x mes x hora) del almacén ya construido -> climatology.npz."""
+    out_dir = Path(out_dir)
+    meta = json.loads((out_dir / "meta.json").read_text(encoding="utf-8"))
+    timestamps = pd.date_range(meta["start"], periods=meta["hours"], freq="h")
+    climatology = Climatology.from_series({
+        zone_name: (timestamps, np.load(out_dir / f"{slug}.temperature.npy", mmap_mode="r"))
+        for slug, zone_name in meta["zones"].items()
+    })
+    climatology.save(out_dir / CLIMATOLOGY_FILE)
+    return climatology
+
+
+class LocalStore:
+    """Backend de lectura sobre el almacén local (misma interfaz que `storage.PostgresStorage`)."""
+
+    name = "local"
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._meta = None
+        self._arrays = {}
+
+    # --- CARGA (perezosa: la app arranca aunque el almacén aún no exista) ---
+
+    @property
+    def meta(self):
+        if self._meta is None:
+            meta_path = self.path / "meta.json"
+            if not meta_path.exists():
+                raise RuntimeError(
+                    f"No existe el almacén local en {self.path}. "
+                    "Constrúyelo con: python scripts/ingest_data.py --target local"
+                )
+            self._meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            self._start = np.datetime64(pd.Timestamp(self._meta["start"]), "h")
+        return self._meta
+
+    def _zone(self, zone_name):
+        """Arrays memory-mapped de la zona (o None si no existe)."""
+        slug = zone_slug(zone_name)
+        if slug not in self.meta["zones"]:
+            return None
+        if slug not in self._arrays:
+            self._arrays[slug] = {
+                name: np.load(self.path / f"{slug}.{name}.npy", mmap_mode="r") for name in COLUMNS
+            }
+        return self._arrays[slug]
+
+    def _bounds(self, start, end):
+        """Slice [lo, hi) de horas para [start, end] (ambos inclusivos)."""
+        start_h = np.datetime64(pd.Timestamp(start).ceil("h"), "h")
+        end_h = np.datetime64(pd.Timestamp(end).floor("h"), "h")
+        lo = max(int((start_h - self._start) / _HOUR), 0)
+        hi = min(int((end_h - self._start) / _HOUR) + 1, self.meta["hours"])
+        return lo, max(hi, lo)
+
+    def _slice(self, zone_name, start, end):
+        arrays = self._zone(zone_name)
+        if arrays is None:
+            return None, None
+        lo, hi = self._bounds(start, end)
+        present = np.flatnonzero(arrays["present"][lo:hi])
+        return arrays, lo + present
+
+    # --- INTERFAZ DE ALMACENAMIENTO ---
+
+    async def ping(self):
+        return bool(self.meta)
+
+    async def data_version(self):
+        return f"{self.meta['built_at']}|{self.meta['rows']}"
+
+    async def zones(self):
+        return sorted(self.meta["zones"].values())
+
+    async def hourly(self, zone_name, start, end):
+        """{timestamp, consumption_kwh, temperature} de una zona en [start, end]."""
+        arrays, rows = self._slice(zone_name, start, end)
+        if arrays is None:
+            rows = np.empty(0, dtype=np.int64)
+            arrays = {"consumption_kwh": np.empty(0, np.float32), "temperature": np.empty(0, np.float32)}
+        return {
+            "timestamp": (self._start + rows * _HOUR).astype("datetime64[us]"),
+            "consumption_kwh": np.asarray(arrays["consumption_kwh"][rows], dtype=np.float32),
+            "temperature": np.asarray(arrays["temperature"][rows], dtype=np.float32),
+        }
+
+    async def hourly_zones(self, zones, start, end):
+        """Como `hourly` para varias zonas (todas si `zones` es None), ordenado por zona y hora."""
+        names = await self.zones() if zones is None else sorted({self.meta["zones"].get(zone_slug(z), z) for z in zones})
+        parts = []
+        for zone_name in names or [""]:
+            cols = await self.hourly(zone_name, start, end)
+            parts.append({"zone_name": np.full(len(cols["timestamp"]), zone_name, dtype=object), **cols})
+        return {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+
+    async def hourly_batches(self, zones, start, end, batch_rows: int = DB_FETCH_BATCH_ROWS):
+        """Como `hourly_zones`, en lotes de `batch_rows` filas (slices del memory-map, sin copiar el rango)."""
+        names = await self.zones() if zones is None else sorted({self.meta["zones"].get(zone_slug(z), z) for z in zones})
+        for zone_name in names:
+            arrays, rows = self._slice(zone_name, start, end)
+            if arrays is None:
+                continue
+            for lo in range(0, len(rows), batch_rows):
+                part = rows[lo:lo + batch_rows]
+                yield {
+                    "zone_name": np.full(len(part), zone_name, dtype=object),
+                    "timestamp": (self._start + part * _HOUR).astype("datetime64[us]"),
+                    "consumption_kwh": np.asarray(arrays["consumption_kwh"][part], dtype=np.float32),
+                    "temperature": np.asarray(arrays["temperature"][part], dtype=np.float32),
+                }
+
+    async def range_aggregates(self, start, end, zone=None):
+        """{zona: {n_rows, sum, min, max, avg, temp_avg}}, igual que `rollups.range_aggregates`."""
+        names = await self.zones() if zone is None else [zone]
+        result = {}
+        for zone_name in names:
+            arrays = self._zone(zone_name)
+            if arrays is None:
+                continue
+            # Slice directo (sin copiar filas): las horas sin fila ya son NaN
+            lo, hi = self._bounds(start, end)
+            n_rows = int(np.count_nonzero(arrays["present"][lo:hi]))
+            if n_rows == 0:
+                continue
+            cons = arrays["consumption_kwh"][lo:hi]
+            total = float(np.nansum(cons))
+            has_value = not np.isnan(cons).all()
+            result[self.meta["zones"][zone_slug(zone_name)]] = {
+                "n_rows": n_rows,
+                "sum": total,
+                "min": float(np.nanmin(cons)) if has_value else 0.0,
+                "max": float(np.nanmax(cons)) if has_value else 0.0,
+                "avg": total / n_rows,
+                "temp_avg": float(np.nansum(arrays["temperature"][lo:hi])) / n_rows,
+            }
+        return result
+
+    async def window_aggregates(self, zone_name, start, end, series_limit: int = SERIES_LIMIT):
+        """Totales por zona + por hora y serie de `zone_name`, como `window_aggregates.window_aggregates`."""
+        lo, hi = self._bounds(start, end)
+        result = {"zones": {}, "by_hour": [], "series": []}
+        for name in await self.zones():
+            arrays = self._zone(name)
+            present = arrays["present"][lo:hi]
+            n_rows = int(np.count_nonzero(present))
+            if n_rows == 0:
+                continue
+            cons, temp = arrays["consumption_kwh"][lo:hi], arrays["temperature"][lo:hi]
+            has_kwh, has_temp = ~np.isnan(cons), ~np.isnan(temp)
+            n_kwh, n_temp = int(np.count_nonzero(has_kwh)), int(np.count_nonzero(has_temp))
+            result["zones"][name] = {
+                "n_rows": n_rows,
+                "sum": float(np.nansum(cons)) if n_kwh else None,
+                "n_kwh": n_kwh,
+                "max": float(np.nanmax(cons)) if n_kwh else None,
+                "sum_temp": float(np.nansum(temp)) if n_temp else None,
+                "n_temp": n_temp,
+            }
+
+            if zone_slug(name) != zone_slug(zone_name):
+                continue
+            rows = np.flatnonzero(present)
+            hours = self._start + (lo + rows) * _HOUR
+            hour_of_day = (hours.astype(np.int64) % 24).astype(np.intp)
+            values = np.asarray(cons[rows], dtype=np.float64)
+            sums = np.bincount(hour_of_day, weights=np.nan_to_num(values), minlength=24)
+            counts = np.bincount(hour_of_day, minlength=24)
+            valid = np.bincount(hour_of_day, weights=~np.isnan(values), minlength=24)
+            result["by_hour"] = [
+                (h, float(sums[h]) if valid[h] else None) for h in np.flatnonzero(counts).tolist()
+            ]
+            head = rows[:series_limit]
+            result["series"] = [
+                (pd.Timestamp(ts), None if np.isnan(c) else float(c), None if np.isnan(t) else float(t))
+                for ts, c, t in zip(hours[:series_limit], cons[head], temp[head])
+            ]
+        return result
+
+    async def bucketed_series(self, zone_name, start, end, unit: str):
+        """Filas (bucket, n_rows, sum_kwh, min_kwh, max_kwh, sum_temp) como `series.bucketed_series`."""
+        arrays, rows = self._slice(zone_name, start, end)
+        if arrays is None or len(rows) == 0:
+            return []
+        hours = self._start + rows * _HOUR
+        if unit == "month":
+            buckets = hours.astype("datetime64[M]").astype("datetime64[h]")
+        else:
+            days = hours.astype("datetime64[D]")
+            if unit == "week":
+                # date_trunc('week'): lunes (1970-01-01 fue jueves)
+                days = days - (days.astype(np.int64) + 3) % 7
+            buckets = days.astype("datetime64[h]")
+
+        # Filas ordenadas: cada bucket es un tramo contiguo -> reduceat
+        keys, first = np.unique(buckets, return_index=True)
+        cons = np.asarray(arrays["consumption_kwh"][rows], dtype=np.float64)
+        temp = np.asarray(arrays["temperature"][rows], dtype=np.float64)
+        n_rows = np.diff(np.append(first, len(rows)))
+        sums = np.add.reduceat(np.nan_to_num(cons), first)
+        mins = np.fmin.reduceat(cons, first)
+        maxs = np.fmax.reduceat(cons, first)
+        temps = np.add.reduceat(np.nan_to_num(temp), first)
+
+        return [
+            (pd.Timestamp(k), int(n), float(s), None if np.isnan(lo) else float(lo),
+             None if np.isnan(hi) else float(hi), float(t))
+            for k, n, s, lo, hi, t in zip(keys, n_rows, sums, mins, maxs, temps)
+        ]
+
+    async def climatology(self):
+        path = self.path / CLIMATOLOGY_FILE
+        return Climatology.load(path) if path.exists() else None
+
+    async def read_forecasts(self, zone_name, start, end, model_version):
+        # Sin tabla de previsiones: el modo futuro infiere en vivo
+        return {}
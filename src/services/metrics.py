@@ -0,0 +1,197 @@
+"""
+Instrumentación sin dependencias externas: contadores e histogramas en memoria
+expuestos en formato de texto Prometheus (`GET /metrics`).
+
+Además de los agregados, cada petición lleva (vía contextvars) un desglose de fases
+(BD, modelo, resto); si tarda más de SLOW_REQUEST_SECONDS se imprime en consola.
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.routing import Match
+
+from src.services import startup
+
+# Buckets en segundos: de 1 ms a 10 s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 10, 100, 500, 1000, 5000, 10000, 50000, 100000, 500000)
+
+
+def _label_str(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()  # se observa también desde hilos de la BD
+
+    def _key(self, labels):
+        return tuple(labels.get(n, "") for n in self.labels)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_label_str(self.labels, k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [cuentas por bucket..., +Inf], suma
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        pos = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[pos] += 1
+            self._series[key] = (counts, total + value)
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = sorted((k, (list(c), s)) for k, (c, s) in self._series.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = _label_str((*self.labels, "le"), (*key, bound))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_label_str(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        """`fn()` -> [(nombre, ayuda, valor)]: gauges calculados al hacer scrape (p. ej. cachés)."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for fn in self._collectors:
+            for name, help_text, value in fn():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {float(value or 0)}"]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta.", ("method", "route", "status"))
+DB_QUERY_LATENCY = REGISTRY.histogram(
+    "db_query_duration_seconds", "Duración de las consultas a la BD por nombre.", ("query",))
+DB_ROWS = REGISTRY.counter(
+    "db_rows_fetched_total", "Filas leídas de la BD por consulta.", ("query",))
+DB_POOL_WAIT = REGISTRY.histogram(
+    "db_pool_wait_seconds", "Espera por una conexión (limitador de hilos y checkout del pool).", ("stage",))
+MODEL_LATENCY = REGISTRY.histogram(
+    "model_inference_seconds", "Tiempo de inferencia por lote.", ("engine",))
+MODEL_BATCH = REGISTRY.histogram(
+    "model_batch_rows", "Filas por lote de inferencia (solo fallos de caché).", ("engine",), SIZE_BUCKETS)
+EXPORT_ROWS = REGISTRY.counter(
+    "export_rows_total", "Filas servidas por /api/export (rate() = filas/s).", ("format",))
+EXPORT_DURATION = REGISTRY.histogram(
+    "export_duration_seconds", "Duración de cada exportación completa.", ("format",),
+    (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0))
+
+
+# --- DESGLOSE POR PETICIÓN ---
+
+_phases = contextvars.ContextVar("request_phases", default=None)
+
+
+def add_phase(phase: str, seconds: float):
+    """Suma tiempo a una fase de la petición en curso (no hace nada fuera de una petición)."""
+    phases = _phases.get()
+    if phases is not None:
+        phases[phase] = phases.get(phase, 0.0) + seconds
+        phases[f"{phase}_calls"] = phases.get(f"{phase}_calls", 0) + 1
+
+
+def _route_path(request):
+    route = request.scope.get("route")
+    if route is not None:
+        return route.path
+    for route in request.app.routes:
+        if route.matches(request.scope)[0] == Match.FULL:
+            return getattr(route, "path", request.url.path)
+    return "unmatched"  # sin ruta: no se etiqueta con la URL (cardinalidad)
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    """Latencia por ruta + log de peticiones lentas con el desglose BD / modelo / resto."""
+
+    def __init__(self, app, slow_seconds: float):
+        super().__init__(app)
+        self.slow_seconds = float(slow_seconds)
+
+    async def dispatch(self, request, call_next):
+        phases = {}
+        token = _phases.set(phases)
+        t0 = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - t0
+            _phases.reset(token)
+            startup.mark("first_response")
+            REQUEST_LATENCY.observe(elapsed, method=request.method, route=_route_path(request), status=status)
+            if elapsed >= self.slow_seconds:
+                db, model = phases.get("db", 0.0), phases.get("model", 0.0)
+                print(
+                    f"🐢 {request.method} {request.url.path}?{request.url.query} -> {status} "
+                    f"en {elapsed * 1000:.0f} ms | BD {db * 1000:.0f} ms ({phases.get('db_calls', 0)} consultas) "
+                    f"| modelo {model * 1000:.0f} ms ({phases.get('model_calls', 0)} lotes) "
+                    f"| resto {max(elapsed - db - model, 0) * 1000:.0f} ms"
+                )
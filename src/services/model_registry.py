@@ -0,0 +1,151 @@
+"""
+Registro de versiones del modelo en disco (MODEL_REGISTRY_DIR):
+
+    data/models/registry/
+        CURRENT                 <- versión activa (una línea de texto)
+        8f6ea199a598/
+            model.joblib        <- estimador sklearn
+            model.npz           <- motor compilado (se crea al cargarla la primera vez)
+            meta.json           <- versión, fecha, features y métricas del entrenamiento
+
+La versión es la huella del joblib (como `model_version` hasta ahora), así que las
+previsiones y cachés guardadas siguen siendo válidas. Publicar una versión no la
+carga: la API la activa en caliente con `POST /api/admin/models/reload` o con el
+vigilante (MODEL_WATCH_SECONDS), sin reiniciar.
+
+Sin registro (o vacío) se usa el modelo suelto de MODEL_PATH.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import anyio
+
+from src.config import MODEL_REGISTRY_DIR
+
+CURRENT_FILE = "CURRENT"
+
+
+def file_version(path) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()[:12]
+
+
+def _write_atomic(path: Path, text: str):
+    """Escribe y renombra: un lector nunca ve el fichero a medias."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class ModelRegistry:
+    def __init__(self, root=MODEL_REGISTRY_DIR):
+        self.root = Path(root)
+
+    def current(self):
+        """Versión activa, o None si no hay registro."""
+        try:
+            version = (self.root / CURRENT_FILE).read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def paths(self, version: str):
+        """(joblib, npz) de una versión publicada. FileNotFoundError si no existe."""
+        folder = self.root / version
+        if not (folder / "model.joblib").exists():
+            raise FileNotFoundError(f"La versión {version} no está en el registro ({self.root}).")
+        return folder / "model.joblib", folder / "model.npz"
+
+    def meta(self, version: str) -> dict:
+        try:
+            return json.loads((self.root / version / "meta.json").read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {"version": version}
+
+    def versions(self):
+        """Versiones publicadas (más reciente primero) con sus metadatos."""
+        if not self.root.exists():
+            return []
+        found = [self.meta(p.name) for p in self.root.iterdir() if (p / "model.joblib").exists()]
+        return sorted(found, key=lambda m: m.get("created_at", ""), reverse=True)
+
+    def publish(self, model_path, metrics: dict = None, activate: bool = True, **extra) -> str:
+        """Copia un joblib al registro (versión = su huella) y opcionalmente lo marca como activo."""
+        version = file_version(model_path)
+        folder = self.root / version
+        folder.mkdir(parents=True, exist_ok=True)
+        if not (folder / "model.joblib").exists():
+            shutil.copyfile(model_path, folder / ".model.joblib.tmp")
+            os.replace(folder / ".model.joblib.tmp", folder / "model.joblib")
+
+        # Re-publicar la misma versión conserva su fecha y sus métricas
+        meta = self.meta(version)
+        meta.setdefault("created_at", datetime.now().isoformat(timespec="seconds"))
+        meta.setdefault("metrics", {})
+        if metrics:
+            meta["metrics"] = metrics
+        meta.update(extra)
+        _write_atomic(folder / "meta.json", json.dumps(meta, indent=2, ensure_ascii=False))
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version: str):
+        self.paths(version)  # falla si no existe
+        _write_atomic(self.root / CURRENT_FILE, version + "\n")
+
+
+class RegistryWatcher:
+    """
+    Tarea asyncio que vigila `CURRENT` y recarga el modelo en caliente cuando cambia.
+    La carga (y el calentamiento) van en un hilo: las peticiones siguen con la versión anterior.
+    """
+
+    def __init__(self, predictor, registry: ModelRegistry, poll_seconds: float):
+        self.predictor = predictor
+        self.registry = registry
+        self.poll_seconds = poll_seconds
+        self.failed = None  # versión que falló: no se reintenta hasta que cambie CURRENT
+        self.last_check = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            self.last_check = time.monotonic()
+            version = self.registry.current()
+            if version is None or version in (self.predictor.model_version, self.failed):
+                continue
+            try:
+                await anyio.to_thread.run_sync(self.predictor.reload, version)
+                self.failed = None
+            except Exception as e:
+                print(f"❌ No se pudo activar el modelo {version} (se mantiene {self.predictor.model_version}): {e}")
+                self.failed = version
+
+    def status(self):
+        return {
+            "poll_seconds": self.poll_seconds,
+            "failed_version": self.failed,
+            "seconds_since_check": round(time.monotonic() - self.last_check, 1) if self.last_check else None,
+        }
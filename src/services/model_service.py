@@ -1,74 +1,403 @@
-import joblib
-import pandas as pd
+import threading
+import time
 import numpy as np
-from src.config import MODEL_PATH
+from src.config import (
+    MODEL_PATH, MODEL_ARTIFACT_PATH, MODEL_ENGINE, MODEL_LAZY_LOAD, COMPILED_MAX_BATCH,
+    PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL,
+)
+from src.services.tree_engine import CompiledEnsemble, check_equivalence
+from src.services.feature_schema import FeatureSchema, calendar_features, zone_slug
+from src.services.cache import TTLCache
+from src.services.metrics import MODEL_LATENCY, MODEL_BATCH, add_phase
+from src.services.model_registry import ModelRegistry, file_version
+from src.services import startup
+
+# pandas, joblib y sklearn se importan dentro de los métodos que los usan:
+# con MODEL_LAZY_LOAD la app arranca sin ellos y los carga en la primera inferencia.
+
+
+class LoadedModel:
+    """
+    Una versión del modelo ya cargada. No se modifica tras crearla: una petición toma la
+    versión activa al empezar y la usa hasta el final aunque entre tanto se active otra.
+    """
+
+    def __init__(self, version, feature_names, engine, source, joblib_path, artifact_path, model=None):
+        self.version = version
+        self.feature_names = feature_names
+        self.schema = FeatureSchema.from_feature_names(feature_names)  # índices congelados por modelo
+        self.engine = engine        # CompiledEnsemble o None
+        self.source = source        # "artefacto" o "joblib"
+        self.joblib_path = joblib_path
+        self.artifact_path = artifact_path
+        self._model = model
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        """Estimador sklearn; si el motor salió del artefacto compacto se carga aquí la primera vez."""
+        if self._model is None and self.joblib_path.exists():
+            with self._lock:
+                if self._model is None:
+                    self._model = _load_joblib(self.joblib_path)
+        return self._model
+
+
+def _load_joblib(path):
+    import joblib  # arrastra sklearn / scipy: lo más caro del arranque
+
+    t0 = time.perf_counter()
+    print(f"🧠 Cargando modelo desde {path}...")
+    model = joblib.load(path)
+    startup.record("sklearn_load", time.perf_counter() - t0)
+    return model
+
 
 class ModelService:
-    def __init__(self):
-        self.model = None
-        self.feature_names = None
-        self.load_model()
+    def __init__(self, engine: str = MODEL_ENGINE, lazy: bool = MODEL_LAZY_LOAD, registry: ModelRegistry = None):
+        self.engine_name = engine
+        self.registry = registry or ModelRegistry()
+        self.current = None   # LoadedModel activo
+        self.previous = None  # el anterior (rollback inmediato); como mucho 2 versiones residentes
+        self.loaded = False
+        self.reloads = 0
+        self.cache = TTLCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+        self._lock = threading.RLock()         # primera carga
+        self._reload_lock = threading.Lock()   # una recarga a la vez
+        self._pending_version = None
+        if lazy:
+            # Solo la versión (ETags y claves de caché); el modelo, en la primera inferencia
+            try:
+                self._pending_version = self._resolve()[0]
+            except Exception:
+                pass
+        else:
+            self.load_model()
+
+    # --- Versión activa (compatibilidad: `predictor.schema`, `predictor.model_version`...) ---
+
+    @property
+    def model_version(self):
+        return self.current.version if self.current is not None else self._pending_version
+
+    @property
+    def schema(self):
+        return self.current.schema if self.ensure_loaded() else None
+
+    @property
+    def model(self):
+        return self.current.model if self.ensure_loaded() else None
+
+    @property
+    def engine(self):
+        return self.current.engine if self.current is not None else None
+
+    @property
+    def feature_names(self):
+        return self.current.feature_names if self.current is not None else None
+
+    @property
+    def source(self):
+        return self.current.source if self.current is not None else None
+
+    def ensure_loaded(self) -> bool:
+        """Carga el modelo si aún no se intentó. Devuelve si hay modelo utilizable."""
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self.load_model()
+        return self.current is not None
+
+    # --- Carga / recarga ---
 
     def load_model(self):
+        """Carga inicial: un fallo se informa y deja la API sin modelo (como antes)."""
+        t0 = time.perf_counter()
+        self.loaded = True
         try:
-            print(f"🧠 Cargando modelo desde {MODEL_PATH}...")
-            self.model = joblib.load(MODEL_PATH)
-            # Intentar obtener nombres de features del modelo
-            if hasattr(self.model, "feature_names_in_"):
-                self.feature_names = self.model.feature_names_in_
-            else:
-                self.feature_names = [] # Fallback
-            print("✅ Modelo cargado en memoria.")
+            self._activate(self._load(*self._resolve()))
         except Exception as e:
             print(f"❌ Error fatal cargando modelo: {e}")
+            return
+        startup.record("model_load", time.perf_counter() - t0)
+        startup.mark("model_ready")
+
+    def reload(self, version: str = None):
+        """
+        Carga `version` (por defecto la activa del registro), la calienta con un lote de
+        prueba y la activa de golpe. Si algo falla lanza la excepción y la versión actual
+        sigue sirviendo. Devuelve el estado del servicio.
+        """
+        with self._reload_lock:
+            version, joblib_path, artifact_path = self._resolve(version)
+            if self.current is not None and version == self.current.version:
+                return {**self.status(), "changed": False}
+
+            # Se suelta la versión anterior ANTES de cargar: nunca más de 2 residentes
+            self.previous = None
+            t0 = time.perf_counter()
+            candidate = self._load(version, joblib_path, artifact_path)
+            self._warm(candidate)
+            old = self.current
+            self._activate(candidate)
+            self.loaded = True
+            self.reloads += 1
+            print(f"🔁 Modelo {candidate.version} activo en {time.perf_counter() - t0:.2f}s "
+                  f"(antes {old.version if old else '-'}).")
+            return {**self.status(), "changed": True}
+
+    def _activate(self, candidate):
+        # Una sola asignación: las peticiones nuevas ven la versión nueva y las que están en curso
+        # conservan su referencia a la anterior. La caché lleva la versión en la clave.
+        self.previous, self.current = self.current, candidate
+        self._pending_version = None
+        self.cache.clear()
+
+    def _resolve(self, version: str = None):
+        """(versión, joblib, npz) a cargar: la pedida, la activa del registro o el modelo suelto."""
+        version = version or self.registry.current()
+        if version is not None:
+            return (version, *self.registry.paths(version))
+        if not MODEL_PATH.exists():
+            raise FileNotFoundError(f"No hay modelo en {MODEL_PATH} ni en el registro {self.registry.root}.")
+        # Versión = huella del fichero: identifica predicciones guardadas fuera del proceso
+        return file_version(MODEL_PATH), MODEL_PATH, MODEL_ARTIFACT_PATH
+
+    def _load(self, version, joblib_path, artifact_path):
+        """Crea un LoadedModel: desde el artefacto compacto si está al día, si no desde el joblib."""
+        if self.engine_name == "compiled":
+            loaded = self._load_artifact(version, joblib_path, artifact_path)
+            if loaded is not None:
+                return loaded
+
+        model = _load_joblib(joblib_path)
+        # Intentar obtener nombres de features del modelo
+        feature_names = model.feature_names_in_ if hasattr(model, "feature_names_in_") else []
+        loaded = LoadedModel(version, feature_names, None, "joblib", joblib_path, artifact_path, model=model)
+        print(f"✅ Modelo cargado en memoria (versión {version}).")
+        if self.engine_name == "compiled":
+            loaded.engine = self._compile_engine(loaded)
+            if loaded.engine is not None:
+                self._save_artifact(loaded)
+        return loaded
+
+    def _load_artifact(self, version, joblib_path, artifact_path):
+        """Motor compilado desde el `.npz` (sin pickle ni sklearn), solo si es de esta versión."""
+        if not artifact_path.exists():
+            return None
+        try:
+            engine, meta = CompiledEnsemble.load(artifact_path)
+        except Exception as e:
+            print(f"⚠️ Artefacto del modelo ilegible, se usa el joblib: {e}")
+            return None
+        if meta.get("model_version") != version:
+            print(f"⚠️ Artefacto {artifact_path.name} desactualizado; se usa el joblib.")
+            return None
+
+        print(f"⚡ Motor compilado cargado desde {artifact_path.name} ({engine.n_trees} árboles, versión {version}).")
+        return LoadedModel(version, np.array(meta["feature_names"], dtype=object), engine, "artefacto", joblib_path, artifact_path)
+
+    def _save_artifact(self, loaded):
+        """Guarda el artefacto compacto junto al joblib (si el disco es de solo lectura, no pasa nada)."""
+        if loaded.artifact_path.exists():
+            return
+        try:
+            loaded.engine.save(loaded.artifact_path, feature_names=list(loaded.feature_names), model_version=loaded.version)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar {loaded.artifact_path.name}: {e}")
+
+    def export_artifact(self, path=None):
+        """Guarda el motor compilado + nombres de features + versión en un `.npz` compacto."""
+        if not self.ensure_loaded() or self.current.engine is None:
+            raise RuntimeError("No hay motor compilado que exportar (MODEL_ENGINE=compiled).")
+        loaded = self.current
+        path = path or loaded.artifact_path
+        loaded.engine.save(path, feature_names=list(loaded.feature_names), model_version=loaded.version)
+        return path
+
+    def _compile_engine(self, loaded):
+        """Aplana el ensemble y verifica que predice lo mismo que sklearn antes de usarlo."""
+        import pandas as pd
+
+        try:
+            engine = CompiledEnsemble.from_sklearn(loaded.model)
+            probe = self._probe_batch(loaded.schema)
+            max_err = check_equivalence(engine, loaded.model, pd.DataFrame(probe, columns=loaded.feature_names))
+            print(f"⚡ Motor compilado activo ({engine.n_trees} árboles, error máx. vs sklearn {max_err:.1e}).")
+            return engine
+        except Exception as e:
+            print(f"⚠️ Motor compilado no disponible, se usa sklearn: {e}")
+            return None
+
+    def _warm(self, loaded):
+        """Lote de prueba antes de activar: fuerza las cargas perezosas y comprueba que predice."""
+        import pandas as pd
+
+        probe = self._probe_batch(loaded.schema)[:COMPILED_MAX_BATCH]
+        if loaded.engine is not None:
+            preds = loaded.engine.predict(probe)
+        else:
+            preds = loaded.model.predict(pd.DataFrame(probe, columns=loaded.feature_names))
+        if not np.all(np.isfinite(preds)):
+            raise ValueError(f"El modelo {loaded.version} devuelve valores no finitos en el lote de prueba.")
+
+    def _probe_batch(self, schema):
+        """Lote de verificación: una semana hora a hora por cada zona, con temperaturas variadas."""
+        import pandas as pd
+
+        zones = schema.zones
+        timestamps = pd.date_range("2024-01-01", periods=24 * 7, freq="h")
+        n = len(timestamps)
+        temps = np.linspace(-5, 42, n)
+        return self._build_features(
+            schema,
+            np.tile(timestamps, len(zones)),
+            np.repeat(zones, n),
+            np.tile(temps, len(zones)),
+        )
+
+    def status(self):
+        """Versión activa y versiones residentes en memoria (para /health y /api/admin)."""
+        return {
+            "active": self.model_version,
+            "source": self.source,
+            "resident": [m.version for m in (self.current, self.previous) if m is not None],
+            "reloads": self.reloads,
+        }
+
+    # --- Predicción ---
 
     def predict(self, date_str: str, zone_name: str, temperature: float):
-        if not self.model:
+        if not self.ensure_loaded():
             return None
 
-        # 1. Procesar Fecha
-        dt = pd.to_datetime(date_str)
-        
-        # 2. Reconstruir Features Matemáticas (Idéntico al notebook)
-        # Esto es lo que hace "inteligente" al sistema
-        hour = dt.hour
-        month = dt.month
-        day_of_week = dt.dayofweek
-        
-        # Diccionario base con todas las columnas a 0
-        input_data = {col: 0 for col in self.feature_names}
-        
-        # Llenar datos numéricos
-        input_data.update({
-            'temperature': temperature,
-            'hour': hour,
-            'month': month,
-            'day_of_month': dt.day,
-            'day_of_week': day_of_week,
-            'year': dt.year,
-            'hour_sin': np.sin(2 * np.pi * hour / 24),
-            'hour_cos': np.cos(2 * np.pi * hour / 24),
-            'month_sin': np.sin(2 * np.pi * month / 12),
-            'month_cos': np.cos(2 * np.pi * month / 12),
-            'temp_sq': temperature ** 2,
-            'is_weekend': 1 if day_of_week >= 5 else 0,
-            'is_holiday': 1 if day_of_week >= 5 else 0, # Simplificado
-            'is_non_working': 1 if day_of_week >= 5 else 0
-        })
-        
-        # Llenar Zona (One-Hot)
-        # Busca la columna "zona_Albaicin_..." y la pone a 1
-        target_col_start = f"zona_{zone_name.replace(' ', '_')}"
-        for col in self.feature_names:
-            if col.lower().startswith(target_col_start.lower()):
-                input_data[col] = 1
-                break
-        
-        # Crear DataFrame y Predecir
-        df_input = pd.DataFrame([input_data])
-        df_input = df_input[self.feature_names] # Asegurar orden
-        
-        return round(self.model.predict(df_input)[0], 2)
+        # Una predicción suelta es un lote de tamaño 1
+        return self.predict_many([date_str], zone_name, [temperature])[0]
+
+    def predict_many(self, timestamps, zone_name: str, temperatures):
+        """
+        Predice un lote de instantes para UNA zona con una sola llamada al modelo.
+        Devuelve una lista de floats redondeados (mismo orden que `timestamps`).
+        """
+        return self.predict_many_zones(timestamps, zone_name, temperatures)
+
+    def predict_many_zones(self, timestamps, zone_names, temperatures):
+        """
+        Variante multi-zona: cada fila lleva su propia zona (o una sola zona para todo el lote).
+        Lanza UnknownZoneError si alguna zona no existe en el modelo.
+        Construye la matriz de features completa con NumPy y llama a `model.predict` una vez.
+        """
+        if not self.ensure_loaded():
+            return [None] * len(timestamps)
+        if len(timestamps) == 0:
+            return []
+
+        import pandas as pd
+
+        # Versión fijada para todo el lote (una recarga en paralelo no la cambia a medias)
+        loaded = self.current
+        t0 = time.perf_counter()
+        dt = pd.DatetimeIndex(pd.to_datetime(timestamps))
+        temperature = np.asarray(temperatures, dtype=np.float64)
+        if isinstance(zone_names, str):
+            zones = zone_slug(zone_names)
+            zone_keys = [zones] * len(dt)
+        else:
+            zones = np.array([zone_slug(z) for z in zone_names])
+            zone_keys = zones.tolist()
+
+        # 1. Buscar en caché por (versión, zona, franja de calendario, temperatura exacta)
+        keys = self._cache_keys(loaded.version, dt, zone_keys, temperature)
+        preds = [self.cache.get(key) for key in keys]
+        missing = [i for i, pred in enumerate(preds) if pred is None]
+
+        # 2. Solo los fallos pasan por el modelo, en un único lote
+        if missing:
+            batch_zones = zones if isinstance(zones, str) else zones[missing]
+            X = self._build_features(loaded.schema, dt[missing], batch_zones, temperature[missing])
+            for i, pred in zip(missing, self._predict_matrix(loaded, X)):
+                preds[i] = pred
+                self.cache.set(keys[i], pred)
+
+        # Fase "modelo" de la petición: caché + features + inferencia
+        add_phase("model", time.perf_counter() - t0)
+        return preds
+
+    def predict_bulk(self, timestamps, zone_names, temperatures):
+        """
+        Como `predict_many_zones` pero SIN caché, para trabajos masivos (exportación, backtest):
+        cada hora se predice una vez, así que las claves de caché solo costarían.
+        Devuelve un array float64 (redondeado igual que el resto de predicciones).
+        """
+        if not self.ensure_loaded():
+            return np.full(len(timestamps), np.nan)
+        if len(timestamps) == 0:
+            return np.empty(0)
+
+        loaded = self.current
+        t0 = time.perf_counter()
+        X = self._build_features(loaded.schema, timestamps, zone_names, temperatures)
+        preds = np.asarray(self._predict_matrix(loaded, X), dtype=np.float64)
+        add_phase("model", time.perf_counter() - t0)
+        return preds
+
+    def _predict_matrix(self, loaded, X):
+        # Lotes grandes: sklearn (cargado bajo demanda si se arrancó desde el artefacto)
+        model = loaded.model if loaded.engine is None or len(X) > COMPILED_MAX_BATCH else None
+        t0 = time.perf_counter()
+        if model is None:
+            engine = "compiled"
+            preds = loaded.engine.predict(X)
+        else:
+            import pandas as pd
+
+            engine = "sklearn"
+            # Un único DataFrame por lote (mantiene los nombres de columna que espera sklearn)
+            preds = model.predict(pd.DataFrame(X, columns=loaded.feature_names))
+        elapsed = time.perf_counter() - t0
+        MODEL_LATENCY.observe(elapsed, engine=engine)
+        MODEL_BATCH.observe(len(X), engine=engine)
+        return np.round(preds, 2).tolist()
+
+    def _cache_keys(self, version, dt, zone_keys, temperature):
+        """
+        Clave = versión + zona + features de calendario que usa el modelo + temperatura EXACTA:
+        un acierto devuelve justo lo que predeciría el modelo (misma petición, mismo resultado).
+        Las temperaturas simuladas ya llegan redondeadas a SIMULATION_TEMPERATURE_STEP.
+        """
+        day_of_week = dt.dayofweek.to_numpy()
+        return list(zip(
+            [version] * len(dt),
+            zone_keys,
+            dt.hour.tolist(),
+            day_of_week.tolist(),
+            dt.month.tolist(),
+            dt.day.tolist(),
+            dt.year.tolist(),
+            (day_of_week >= 5).tolist(),
+            temperature.tolist(),
+        ))
+
+    def cache_stats(self):
+        """Contadores de la caché de predicciones (para dimensionarla)."""
+        return self.cache.stats()
+
+    def _build_features(self, schema, timestamps, zone_names, temperatures):
+        """Reconstruye las features matemáticas (idéntico al notebook) para todo el lote."""
+        import pandas as pd
+
+        dt = pd.DatetimeIndex(pd.to_datetime(timestamps))
+        columns = calendar_features(dt, np.asarray(temperatures, dtype=np.float64))
+
+        # Buffer con la fila plantilla (todo a 0) y asignación por posición precalculada
+        X = schema.empty_matrix(len(dt))
+        for name, pos in schema.numeric:
+            X[:, pos] = columns[name]
+
+        # Zona (one-hot o categórica) por índice; una zona desconocida falla aquí
+        schema.fill_zones(X, zone_names)
+
+        return X
 
 # Instancia única
-predictor = ModelService()
\ No newline at end of file
+predictor = ModelService()
@@ -0,0 +1,207 @@
+"""
+Tablas de agregados pre-calculados (rollups) sobre `consumo_granada`.
+
+Niveles: hora (la propia tabla cruda) -> día -> mes. Cada bucket guarda por zona:
+número de filas, suma, mínimo y máximo de consumo y suma de temperatura.
+
+El planificador responde cualquier rango [inicio, fin] combinando meses completos
+en el centro, días completos alrededor y filas crudas solo en los bordes, todo en
+UNA consulta (UNION ALL + agregado final por zona).
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from src.database import fetch_all, table_exists
+
+RAW_TABLE = "consumo_granada"
+DAILY_TABLE = "consumo_granada_daily"
+MONTHLY_TABLE = "consumo_granada_monthly"
+
+# (tabla destino, unidad de date_trunc, tabla origen, columnas de origen)
+_LEVELS = (
+    (DAILY_TABLE, "day", RAW_TABLE,
+     "COUNT(*), SUM(consumption_kwh), MIN(consumption_kwh), MAX(consumption_kwh), SUM(temperature)",
+     "timestamp"),
+    (MONTHLY_TABLE, "month", DAILY_TABLE,
+     "SUM(n_rows), SUM(sum_kwh), MIN(min_kwh), MAX(max_kwh), SUM(sum_temp)",
+     "bucket"),
+)
+
+_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        zone_name TEXT NOT NULL,
+        bucket TIMESTAMP NOT NULL,
+        n_rows BIGINT NOT NULL,
+        sum_kwh DOUBLE PRECISION,
+        min_kwh DOUBLE PRECISION,
+        max_kwh DOUBLE PRECISION,
+        sum_temp DOUBLE PRECISION,
+        PRIMARY KEY (zone_name, bucket)
+    )
+"""
+
+
+# --- CONSTRUCCIÓN / MANTENIMIENTO (ingesta) ---
+
+def refresh_rollups(engine, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """
+    Recalcula los rollups. Sin rango: reconstrucción completa.
+    Con rango (p. ej. tras añadir filas nuevas): solo los días y meses que lo tocan.
+    """
+    with engine.begin() as conn:
+        for table, unit, source, aggregates, source_ts in _LEVELS:
+            conn.execute(text(_DDL.format(table=table)))
+
+            if start is None or end is None:
+                conn.execute(text(f"TRUNCATE {table}"))
+                where, params = "", {}
+            else:
+                # Rango de buckets afectados [trunc(start), trunc(end) + 1 unidad)
+                conn.execute(
+                    text(f"""
+                        DELETE FROM {table}
+                        WHERE bucket >= date_trunc('{unit}', CAST(:start AS TIMESTAMP))
+                          AND bucket < date_trunc('{unit}', CAST(:end AS TIMESTAMP)) + INTERVAL '1 {unit}'
+                    """),
+                    {"start": start, "end": end},
+                )
+                where = f"""
+                    WHERE {source_ts} >= date_trunc('{unit}', CAST(:start AS TIMESTAMP))
+                      AND {source_ts} < date_trunc('{unit}', CAST(:end AS TIMESTAMP)) + INTERVAL '1 {unit}'
+                """
+                params = {"start": start, "end": end}
+
+            conn.execute(
+                text(f"""
+                    INSERT INTO {table} (zone_name, bucket, n_rows, sum_kwh, min_kwh, max_kwh, sum_temp)
+                    SELECT zone_name, date_trunc('{unit}', {source_ts}), {aggregates}
+                    FROM {source}
+                    {where}
+                    GROUP BY 1, 2
+                """),
+                params,
+            )
+
+
+# --- PLANIFICADOR DE CONSULTAS ---
+
+@dataclass(frozen=True)
+class Segment:
+    source: str        # tabla a consultar
+    start: datetime    # inclusivo
+    end: datetime      # exclusivo salvo `inclusive_end`
+    inclusive_end: bool = False
+
+    @property
+    def is_raw(self):
+        return self.source == RAW_TABLE
+
+
+def _floor_day(ts):
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _ceil_day(ts):
+    floor = _floor_day(ts)
+    return floor if floor == ts else floor + timedelta(days=1)
+
+
+def _floor_month(ts):
+    return _floor_day(ts).replace(day=1)
+
+
+def _ceil_month(ts):
+    floor = _floor_month(ts)
+    if floor == ts:
+        return floor
+    return (floor + timedelta(days=32)).replace(day=1)
+
+
+def plan_range(start: datetime, end: datetime, use_rollups: bool = True, use_months: bool = True) -> List[Segment]:
+    """
+    Descompone [start, end] (ambos inclusivos, como en los endpoints) en segmentos:
+    crudo [start, d0) + días [d0, m0) + meses [m0, m1) + días [m1, d1) + crudo [d1, end].
+    Un día solo se toma del rollup si está completo dentro del rango.
+    `use_months=False` se queda en días (p. ej. para series semanales, que no caben en meses).
+    """
+    import pandas as pd
+
+    start, end = pd.Timestamp(start).to_pydatetime(), pd.Timestamp(end).to_pydatetime()
+    d0, d1 = _ceil_day(start), _floor_day(end)
+    if not use_rollups or d0 >= d1:
+        return [Segment(RAW_TABLE, start, end, inclusive_end=True)]
+
+    segments = [Segment(RAW_TABLE, start, d0)]
+    m0, m1 = _ceil_month(d0), _floor_month(d1)
+    if use_months and m0 < m1:
+        segments += [Segment(DAILY_TABLE, d0, m0), Segment(MONTHLY_TABLE, m0, m1), Segment(DAILY_TABLE, m1, d1)]
+    else:
+        segments.append(Segment(DAILY_TABLE, d0, d1))
+    segments.append(Segment(RAW_TABLE, d1, end, inclusive_end=True))
+
+    return [s for s in segments if s.start < s.end or (s.inclusive_end and s.start <= s.end)]
+
+
+def build_aggregate_query(segments: List[Segment], zone: Optional[str] = None):
+    """Una sola consulta que suma los segmentos del plan y agrega por zona."""
+    parts, params = [], {}
+    for i, seg in enumerate(segments):
+        lo, hi = f"s{i}_lo", f"s{i}_hi"
+        params[lo], params[hi] = seg.start, seg.end
+        op = "<=" if seg.inclusive_end else "<"
+        if seg.is_raw:
+            select = """zone_name, COUNT(*) AS n_rows, SUM(consumption_kwh) AS sum_kwh,
+                       MIN(consumption_kwh) AS min_kwh, MAX(consumption_kwh) AS max_kwh,
+                       SUM(temperature) AS sum_temp"""
+            ts_col, group = "timestamp", "GROUP BY zone_name"
+        else:
+            select = "zone_name, n_rows, sum_kwh, min_kwh, max_kwh, sum_temp"
+            ts_col, group = "bucket", ""
+        zone_filter = "AND zone_name = :zone" if zone is not None else ""
+        parts.append(f"""
+            SELECT {select}
+            FROM {seg.source}
+            WHERE {ts_col} >= :{lo} AND {ts_col} {op} :{hi} {zone_filter}
+            {group}
+        """)
+    if zone is not None:
+        params["zone"] = zone
+
+    query = f"""
+        SELECT zone_name, SUM(n_rows), SUM(sum_kwh), MIN(min_kwh), MAX(max_kwh), SUM(sum_temp)
+        FROM ({" UNION ALL ".join(parts)}) AS plan
+        GROUP BY zone_name
+        ORDER BY zone_name ASC
+    """
+    return text(query), params
+
+
+async def rollups_ready() -> bool:
+    """Los rollups pueden no existir aún (BD sin ingesta nueva)."""
+    return await table_exists(DAILY_TABLE) and await table_exists(MONTHLY_TABLE)
+
+
+async def range_aggregates(start: datetime, end: datetime, zone: Optional[str] = None):
+    """
+    Agregados por zona para [start, end]: {zona: {n_rows, sum, min, max, avg, temp_avg}}.
+    Usa los rollups si existen; si no, agrega sobre la tabla cruda.
+    """
+    segments = plan_range(start, end, use_rollups=await rollups_ready())
+    query, params = build_aggregate_query(segments, zone)
+    rows = await fetch_all(query, params, name="range_aggregates")
+
+    result = {}
+    for zone_name, n_rows, sum_kwh, min_kwh, max_kwh, sum_temp in rows:
+        n_rows = int(n_rows or 0)
+        result[zone_name] = {
+            "n_rows": n_rows,
+            "sum": float(sum_kwh or 0),
+            "min": float(min_kwh) if min_kwh is not None else 0.0,
+            "max": float(max_kwh) if max_kwh is not None else 0.0,
+            "avg": float(sum_kwh or 0) / n_rows if n_rows else 0.0,
+            "temp_avg": float(sum_temp or 0) / n_rows if n_rows else 0.0,
+        }
+    return result
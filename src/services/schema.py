@@ -0,0 +1,154 @@
+"""
+Esquema de `consumo_granada`: tabla particionada por año + índices de series temporales.
+
+Todas las consultas calientes filtran por `zone_name` y un rango de `timestamp`:
+- índice compuesto (zone_name, timestamp) -> index scan por zona y rango
+- índice BRIN en timestamp -> rangos de varias zonas a la vez casi gratis (datos en orden de llegada)
+- particiones anuales -> el planificador descarta los años fuera del rango (partition pruning)
+
+`ensure_schema` lo crea (lo lanza la ingesta) y `check_schema` informa de lo que falte
+en la base de datos viva (se comprueba al arrancar la API).
+"""
+from typing import Iterable, List
+
+import anyio
+from sqlalchemy import text
+
+TABLE = "consumo_granada"
+
+COLUMNS = {
+    "timestamp": "TIMESTAMP NOT NULL",
+    "zone_name": "TEXT NOT NULL",
+    "consumption_kwh": "DOUBLE PRECISION",
+    "temperature": "DOUBLE PRECISION",
+    "hour": "INTEGER",
+    "month": "INTEGER",
+    "year": "INTEGER",
+    "day_of_week": "INTEGER",
+    "is_holiday": "INTEGER",
+}
+
+# Los índices creados sobre la tabla padre se propagan a cada partición
+INDEXES = {
+    f"idx_{TABLE}_zone_ts": f"CREATE INDEX IF NOT EXISTS idx_{TABLE}_zone_ts ON {TABLE} (zone_name, timestamp)",
+    f"idx_{TABLE}_ts_brin": f"CREATE INDEX IF NOT EXISTS idx_{TABLE}_ts_brin ON {TABLE} USING BRIN (timestamp)",
+}
+
+
+def partition_name(year: int) -> str:
+    return f"{TABLE}_{int(year)}"
+
+
+def _table_info(conn):
+    """(existe, está particionada) de la tabla principal."""
+    row = conn.execute(
+        text("""
+            SELECT c.relkind
+            FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.relname = :table AND n.nspname = current_schema()
+        """),
+        {"table": TABLE},
+    ).fetchone()
+    if row is None:
+        return False, False
+    return True, row[0] == "p"
+
+
+def _existing_partitions(conn):
+    rows = conn.execute(
+        text("""
+            SELECT child.relname
+            FROM pg_inherits i
+            JOIN pg_class parent ON parent.oid = i.inhparent
+            JOIN pg_class child ON child.oid = i.inhrelid
+            WHERE parent.relname = :table
+        """),
+        {"table": TABLE},
+    ).fetchall()
+    return {name for (name,) in rows}
+
+
+def _existing_indexes(conn):
+    rows = conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = :table AND schemaname = current_schema()"),
+        {"table": TABLE},
+    ).fetchall()
+    return {name for (name,) in rows}
+
+
+def ensure_partitions(conn, years: Iterable[int]) -> List[int]:
+    """Crea las particiones anuales que falten. Devuelve los años creados."""
+    if not _table_info(conn)[1]:
+        return []  # tabla antigua sin particionar: no admite particiones
+    existing = _existing_partitions(conn)
+    created = []
+    for year in sorted({int(y) for y in years}):
+        name = partition_name(year)
+        if name in existing:
+            continue
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE}
+            FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')
+        """))
+        created.append(year)
+    return created
+
+
+def ensure_schema(conn, years: Iterable[int] = (), recreate: bool = False):
+    """
+    Deja `consumo_granada` con particiones anuales e índices.
+    Si la tabla existe sin particionar (creada por el antiguo `to_sql`) solo se
+    recrea con `recreate=True` (recarga completa); si no, se le añaden los índices.
+    """
+    exists, partitioned = _table_info(conn)
+
+    if exists and not partitioned and recreate:
+        print(f"🔧 {TABLE} no está particionada: se recrea (recarga completa).")
+        conn.execute(text(f"DROP TABLE {TABLE}"))
+        exists = False
+
+    if not exists:
+        columns = ",\n                ".join(f"{col} {tipo}" for col, tipo in COLUMNS.items())
+        conn.execute(text(f"""
+            CREATE TABLE {TABLE} (
+                {columns}
+            ) PARTITION BY RANGE (timestamp)
+        """))
+        partitioned = True
+
+    if partitioned:
+        ensure_partitions(conn, years)
+    else:
+        # Sin particiones pero con índices: las consultas ya van por index scan
+        print(f"⚠️ {TABLE} sigue sin particionar; usa --mode full para migrarla.")
+
+    for ddl in INDEXES.values():
+        conn.execute(text(ddl))
+
+
+def check_schema(conn) -> List[str]:
+    """Lista de problemas del esquema vivo (vacía si está todo en orden)."""
+    exists, partitioned = _table_info(conn)
+    if not exists:
+        return [f"falta la tabla {TABLE}"]
+
+    issues = []
+    if not partitioned:
+        issues.append(f"{TABLE} no está particionada por año")
+    indexes = _existing_indexes(conn)
+    issues.extend(f"falta el índice {name}" for name in INDEXES if name not in indexes)
+    return issues
+
+
+async def verify_schema(engine) -> List[str]:
+    """Comprobación de arranque: avisa por consola si el esquema vivo no está optimizado."""
+    def _check():
+        with engine.connect() as conn:
+            return check_schema(conn)
+
+    issues = await anyio.to_thread.run_sync(_check)
+    if issues:
+        print(f"⚠️ Esquema de {TABLE} incompleto: {'; '.join(issues)}. Ejecuta scripts/ingest_data.py --mode full.")
+    else:
+        print(f"🗂️ Esquema de {TABLE} OK (particiones anuales + índices).")
+    return issues
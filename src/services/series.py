@@ -0,0 +1,130 @@
+"""
+Series temporales con resolución adaptativa y presupuesto fijo de puntos.
+
+- `choose_resolution`: hora / día / semana / mes, la más fina que quepa en el presupuesto.
+- `bucketed_series`: serie agregada por bucket (suma, mín, máx, temperatura) desde los
+  rollups, así el trabajo en BD está acotado aunque el rango sea de años.
+- `lttb_indices`: submuestreo Largest-Triangle-Three-Buckets para series horarias largas
+  (conserva picos y forma con pocos puntos).
+- `json_values`: array NumPy -> lista JSON (NaN -> null) sin bucles Python.
+"""
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import text
+
+from src.database import fetch_all
+from src.services.rollups import plan_range, rollups_ready, MONTHLY_TABLE
+
+# Columnas de la serie horaria cruda (lectura columnar, ver database.fetch_columns)
+HOURLY_COLUMNS = {"timestamp": "datetime64[us]", "consumption_kwh": np.float32, "temperature": np.float32}
+
+# (nombre, unidad de date_trunc, ancho aproximado del bucket, formato de etiqueta)
+RESOLUTIONS = (
+    ("hour", "hour", timedelta(hours=1), "%d/%m %H:%M"),
+    ("day", "day", timedelta(days=1), "%d/%m/%Y"),
+    ("week", "week", timedelta(weeks=1), "%d/%m/%Y"),
+    ("month", "month", timedelta(days=30), "%m/%Y"),
+)
+
+
+def choose_resolution(start, end, budget: int):
+    """Devuelve (nombre, unidad, formato) de la resolución más fina con <= budget puntos."""
+    span = end - start
+    for name, unit, width, label_format in RESOLUTIONS:
+        if span // width + 1 <= budget:
+            return name, unit, label_format
+    name, unit, _, label_format = RESOLUTIONS[-1]
+    return name, unit, label_format
+
+
+async def bucketed_series(zone: str, start, end, unit: str):
+    """
+    Serie de una zona agregada por `unit` (day/week/month).
+    Bordes crudos + días/meses completos de los rollups, re-agrupados por bucket en una consulta.
+    Devuelve filas (bucket, n_rows, sum_kwh, min_kwh, max_kwh, sum_temp) ordenadas.
+    """
+    # Las semanas no caben en meses: para day/week solo se usan rollups diarios
+    segments = plan_range(start, end, use_rollups=await rollups_ready(), use_months=(unit == "month"))
+
+    parts, params = [], {"zone": zone}
+    for i, seg in enumerate(segments):
+        lo, hi = f"s{i}_lo", f"s{i}_hi"
+        params[lo], params[hi] = seg.start, seg.end
+        op = "<=" if seg.inclusive_end else "<"
+        if seg.is_raw:
+            parts.append(f"""
+                SELECT date_trunc('{unit}', timestamp) AS bucket, COUNT(*) AS n_rows,
+                       SUM(consumption_kwh) AS sum_kwh, MIN(consumption_kwh) AS min_kwh,
+                       MAX(consumption_kwh) AS max_kwh, SUM(temperature) AS sum_temp
+                FROM {seg.source}
+                WHERE zone_name = :zone AND timestamp >= :{lo} AND timestamp {op} :{hi}
+                GROUP BY 1
+            """)
+        else:
+            bucket = "bucket" if seg.source == MONTHLY_TABLE else f"date_trunc('{unit}', bucket)"
+            parts.append(f"""
+                SELECT {bucket} AS bucket, n_rows, sum_kwh, min_kwh, max_kwh, sum_temp
+                FROM {seg.source}
+                WHERE zone_name = :zone AND bucket >= :{lo} AND bucket {op} :{hi}
+            """)
+
+    query = f"""
+        SELECT bucket, SUM(n_rows), SUM(sum_kwh), MIN(min_kwh), MAX(max_kwh), SUM(sum_temp)
+        FROM ({" UNION ALL ".join(parts)}) AS plan
+        GROUP BY bucket
+        ORDER BY bucket ASC
+    """
+    return await fetch_all(text(query), params, name="bucketed_series")
+
+
+def lttb_indices(values, n_out: int):
+    """
+    Índices a conservar según Largest-Triangle-Three-Buckets (siempre incluye primero, último,
+    máximo y mínimo).
+    Si la serie ya cabe en `n_out` devuelve todos los índices.
+    """
+    y = np.asarray(values, dtype=np.float64)
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n) if n <= n_out else np.array([0, n - 1])
+
+    # Los huecos (None/NaN) no deben ganar ni anular el triángulo
+    y = np.nan_to_num(y, nan=np.nanmean(y) if np.isfinite(y).any() else 0.0)
+    x = np.arange(n, dtype=np.float64)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)  # n_out - 2 buckets interiores
+    selected = np.empty(n_out, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        # Vértice C: media del bucket siguiente (o el último punto)
+        if i + 2 < len(edges):
+            nlo, nhi = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+            cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+
+    # El máximo y el mínimo globales siempre sobreviven (son los picos que se consultan)
+    for extreme in (int(np.argmax(y)), int(np.argmin(y))):
+        bucket = np.searchsorted(edges, extreme, side="right") - 1
+        if 0 <= bucket < n_out - 2:
+            selected[bucket + 1] = extreme
+    return selected
+
+
+def json_values(values, decimals: int = 2, fill=None):
+    """Redondea y convierte a lista; los NaN pasan a `fill` (None -> null en JSON)."""
+    values = np.asarray(values, dtype=np.float64).round(decimals)
+    missing = np.isnan(values)
+    if not missing.any():
+        return values.tolist()
+    if fill is not None:
+        return np.where(missing, fill, values).tolist()
+    out = values.astype(object)
+    out[missing] = None
+    return out.tolist()
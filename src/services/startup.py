@@ -0,0 +1,28 @@
+"""
+Desglose del arranque en frío (serverless): cuánto cuesta importar la app, cargar
+el modelo y servir la primera respuesta. Se expone en `/health` ("startup").
+
+Los instantes se miden desde el primer import de este módulo (lo primero que importa
+`src.main`); el arranque del intérprete queda fuera. Para el detalle por paquete:
+`python scripts/startup_report.py`.
+"""
+import time
+
+PROCESS_START = time.perf_counter()
+_phases = {}
+
+
+def record(phase: str, seconds: float):
+    """Duración de una fase (p. ej. "model_load"), en ms."""
+    _phases[f"{phase}_ms"] = round(seconds * 1000, 1)
+
+
+def mark(phase: str):
+    """Instante (ms desde el arranque) en que se alcanza un hito; solo cuenta la primera vez."""
+    key = f"{phase}_at_ms"
+    if key not in _phases:
+        _phases[key] = round((time.perf_counter() - PROCESS_START) * 1000, 1)
+
+
+def report() -> dict:
+    return dict(_phases)
@@ -0,0 +1,109 @@
+"""
+Capa de almacenamiento intercambiable (config.STORAGE_BACKEND).
+
+Los endpoints leen datos solo a través de `storage`:
+- "postgres": Supabase, con rollups y previsiones precalculadas (por defecto)
+- "local": almacén columnar en disco (`local_store.LocalStore`), sin servicios externos
+
+Interfaz común (todo async):
+    ping(), data_version(), zones(), hourly(zone, start, end), hourly_zones(zones, start, end),
+    hourly_batches(zones, start, end) (generador async de lotes),
+    range_aggregates(start, end, zone=None), bucketed_series(zone, start, end, unit),
+    window_aggregates(zone, start, end, series_limit), climatology() (o None),
+    read_forecasts(zone, start, end, model_version)
+"""
+from sqlalchemy import text, bindparam
+
+from src.config import STORAGE_BACKEND, LOCAL_STORE_DIR
+from src.database import fetch_all, fetch_columns, stream_columns
+from src.services.feature_schema import zone_display_name
+from src.services import rollups, series, forecast_service, window_aggregates, climatology
+from src.services.series import HOURLY_COLUMNS
+from src.services.window_aggregates import SERIES_LIMIT
+
+
+class PostgresStorage:
+    name = "postgres"
+
+    async def ping(self):
+        await fetch_all(text("SELECT 1"), name="ping")
+        return True
+
+    async def data_version(self):
+        """Huella barata de los datos: cambia con cada ingesta (filas o valores nuevos)."""
+        if await rollups.rollups_ready():
+            query = f"SELECT COUNT(*), MAX(bucket), SUM(n_rows), SUM(sum_kwh) FROM {rollups.MONTHLY_TABLE}"
+        else:
+            query = "SELECT MAX(timestamp), COUNT(*) FROM consumo_granada"
+        rows = await fetch_all(text(query), name="data_version")
+        return "|".join(str(value) for value in rows[0])
+
+    async def zones(self):
+        rows = await fetch_all(text("SELECT DISTINCT zone_name FROM consumo_granada ORDER BY zone_name ASC"), name="zones")
+        return [r[0] for r in rows]
+
+    async def hourly(self, zone_name, start, end):
+        query = text("""
+            SELECT timestamp, consumption_kwh, temperature
+            FROM consumo_granada
+            WHERE zone_name = :zone
+              AND timestamp >= :start
+              AND timestamp <= :end
+            ORDER BY timestamp ASC
+        """)
+        return await fetch_columns(query, HOURLY_COLUMNS, {"zone": zone_name, "start": start, "end": end}, name="hourly")
+
+    def _hourly_zones_query(self, zones, start, end):
+        if zones:
+            zone_filter = "AND zone_name IN :zones"
+            params = {"zones": sorted({zone_display_name(z) for z in zones})}
+        else:
+            zone_filter, params = "", {}
+
+        query = text(f"""
+            SELECT zone_name, timestamp, consumption_kwh, temperature
+            FROM consumo_granada
+            WHERE timestamp >= :start AND timestamp <= :end {zone_filter}
+            ORDER BY zone_name ASC, timestamp ASC
+        """)
+        if zones:
+            query = query.bindparams(bindparam("zones", expanding=True))
+        return query, {**params, "start": start, "end": end}
+
+    async def hourly_zones(self, zones, start, end):
+        query, params = self._hourly_zones_query(zones, start, end)
+        return await fetch_columns(query, {"zone_name": object, **HOURLY_COLUMNS}, params, name="hourly_zones")
+
+    async def hourly_batches(self, zones, start, end):
+        """Como `hourly_zones`, por lotes desde un cursor de servidor (memoria acotada)."""
+        query, params = self._hourly_zones_query(zones, start, end)
+        async for columns in stream_columns(query, {"zone_name": object, **HOURLY_COLUMNS}, params, name="hourly_batches"):
+            yield columns
+
+    async def range_aggregates(self, start, end, zone=None):
+        return await rollups.range_aggregates(start, end, zone=zone)
+
+    async def bucketed_series(self, zone_name, start, end, unit: str):
+        return await series.bucketed_series(zone_name, start, end, unit)
+
+    async def window_aggregates(self, zone_name, start, end, series_limit: int = SERIES_LIMIT):
+        return await window_aggregates.window_aggregates(zone_name, start, end, series_limit)
+
+    async def climatology(self):
+        return await climatology.read_climatology()
+
+    async def read_forecasts(self, zone_name, start, end, model_version):
+        return await forecast_service.read_forecasts(zone_name, start, end, model_version)
+
+
+def create_storage(backend: str = STORAGE_BACKEND):
+    if backend == "local":
+        from src.services.local_store import LocalStore
+        print(f"💾 Almacenamiento local: {LOCAL_STORE_DIR}")
+        return LocalStore(LOCAL_STORE_DIR)
+    if backend != "postgres":
+        print(f"⚠️ STORAGE_BACKEND desconocido '{backend}': se usa postgres.")
+    return PostgresStorage()
+
+
+storage = create_storage()
@@ -0,0 +1,134 @@
+"""
+Matriz de entrenamiento (features + objetivo) con el MISMO esquema que consume la API
+(`feature_schema`: features de calendario + zona), cacheada en disco en binario.
+
+La caché es un `.npz` por huella (sha256) del CSV: la primera vez se parsea el CSV
+(segundos a minutos), las siguientes se cargan los arrays directamente (milisegundos).
+Si el CSV cambia, cambia la huella y se reconstruye sola.
+"""
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from src.config import ZONES, TRAINING_CACHE_DIR
+from src.services.feature_schema import (
+    CALENDAR_FEATURES, ZONE_CODE_FEATURE, ZONE_PREFIX, calendar_features, zone_feature_name, zone_slug,
+)
+
+# Subirlo si cambia cómo se construyen las features: invalida las cachés existentes
+CACHE_FORMAT = 1
+ZONE_FEATURES = tuple(zone_feature_name(z) for z in ZONES)
+
+
+@dataclass
+class TrainingData:
+    X: np.ndarray            # float32 (filas x features), zona en one-hot
+    y: np.ndarray            # float64, consumo en kWh
+    feature_names: tuple     # CALENDAR_FEATURES + columnas one-hot (orden de config.ZONES)
+    zone_codes: np.ndarray   # int16, posición de la zona en config.ZONES
+    timestamps: np.ndarray   # datetime64[s]
+    source_hash: str
+
+    def __len__(self):
+        return len(self.y)
+
+    def frame(self, rows=None, categorical: bool = False):
+        """
+        DataFrame para sklearn (guarda los nombres en `feature_names_in_`, que es lo que lee la API).
+        `categorical=True`: la zona va en una sola columna `zone_code` en vez de one-hot.
+        """
+        import pandas as pd
+
+        rows = slice(None) if rows is None else rows
+        n_calendar = len(CALENDAR_FEATURES)
+        if not categorical:
+            return pd.DataFrame(self.X[rows], columns=list(self.feature_names))
+        frame = pd.DataFrame(self.X[rows, :n_calendar], columns=list(CALENDAR_FEATURES))
+        frame[ZONE_CODE_FEATURE] = self.zone_codes[rows]
+        return frame
+
+
+def file_hash(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(csv_path, source_hash: str, cache_dir=TRAINING_CACHE_DIR) -> Path:
+    return Path(cache_dir) / f"{Path(csv_path).stem}-{source_hash[:16]}-v{CACHE_FORMAT}.npz"
+
+
+def load_training_data(csv_path, cache_dir=TRAINING_CACHE_DIR, use_cache: bool = True):
+    """Devuelve (TrainingData, acierto_de_caché). Construye y guarda la caché si hace falta."""
+    source_hash = file_hash(csv_path)
+    path = cache_path(csv_path, source_hash, cache_dir)
+    if use_cache and path.exists():
+        with np.load(path, allow_pickle=False) as data:
+            return TrainingData(
+                X=data["X"], y=data["y"], feature_names=tuple(data["feature_names"].tolist()),
+                zone_codes=data["zone_codes"], timestamps=data["timestamps"], source_hash=source_hash,
+            ), True
+
+    data = parse_csv(csv_path, source_hash)
+    if use_cache:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp.npz")
+        # Sin comprimir: se lee a velocidad de disco
+        np.savez(
+            tmp, X=data.X, y=data.y, feature_names=np.array(data.feature_names),
+            zone_codes=data.zone_codes, timestamps=data.timestamps,
+        )
+        os.replace(tmp, path)
+    return data, False
+
+
+def parse_csv(csv_path, source_hash: str = "") -> TrainingData:
+    """
+    Lee el CSV procesado (`timestamp`, `consumption_kwh`, `temperature`, zona en one-hot `zona_*`
+    o en `zone_name`, y las features que traiga). Las columnas de calendario que falten se
+    calculan con `calendar_features`, igual que en la API; las que vengan en el CSV mandan
+    (p. ej. `is_holiday` con festivos reales).
+    """
+    import pandas as pd
+
+    t0 = time.perf_counter()
+    df = pd.read_csv(csv_path)
+    df.columns = [c.lower() if not c.lower().startswith(ZONE_PREFIX) else c for c in df.columns]
+    dt = pd.DatetimeIndex(pd.to_datetime(df["timestamp"]))
+    temperature = df["temperature"].to_numpy(np.float64)
+
+    # Zona de cada fila -> código (posición en config.ZONES)
+    zone_cols = [c for c in df.columns if c.lower().startswith(ZONE_PREFIX)]
+    if zone_cols:
+        names = df[zone_cols].to_numpy().argmax(axis=1)
+        slugs = np.array([zone_slug(c) for c in zone_cols])[names]
+    else:
+        slugs = np.array([zone_slug(z) for z in df["zone_name"]])
+    codes = {zone: code for code, zone in enumerate(ZONES)}
+    unknown = sorted(set(slugs) - set(codes))
+    if unknown:
+        raise ValueError(f"Zonas del CSV que no están en config.ZONES: {unknown}")
+    zone_codes = np.array([codes[z] for z in slugs], dtype=np.int16)
+
+    # Matriz en el orden del esquema: calendario + one-hot de zonas
+    derived = calendar_features(dt, temperature)
+    X = np.zeros((len(df), len(CALENDAR_FEATURES) + len(ZONES)), dtype=np.float32)
+    for pos, name in enumerate(CALENDAR_FEATURES):
+        X[:, pos] = df[name].to_numpy() if name in df.columns else derived[name]
+    X[np.arange(len(df)), len(CALENDAR_FEATURES) + zone_codes] = 1
+
+    print(f"📂 CSV parseado en {time.perf_counter() - t0:.1f}s ({len(df):,} filas).")
+    return TrainingData(
+        X=X,
+        y=df["consumption_kwh"].to_numpy(np.float64),
+        feature_names=tuple(CALENDAR_FEATURES) + ZONE_FEATURES,
+        zone_codes=zone_codes,
+        timestamps=dt.to_numpy().astype("datetime64[s]"),
+        source_hash=source_hash,
+    )
@@ -0,0 +1,160 @@
+"""
+Motor de inferencia "compilado" para el GradientBoostingRegressor.
+
+Aplana los 300 árboles del modelo en arrays contiguos (feature, umbral, valor de hoja)
+con disposición de árbol binario completo (heap): los hijos del nodo `h` son `2h+1` y `2h+2`,
+así que no hace falta guardar punteros a hijos y todos los árboles avanzan un nivel
+a la vez para todo el lote con NumPy vectorizado.
+
+Evita la sobrecarga fija del `predict` genérico de sklearn (validación, DataFrame, un
+recorrido por árbol), que domina en lotes pequeños. En lotes grandes el bucle en Cython
+de sklearn vuelve a ser más rápido: `ModelService` elige el motor según el tamaño del lote.
+"""
+import numpy as np
+
+# Filas procesadas por bloque: acota la memoria de las matrices (filas x árboles)
+CHUNK_ROWS = 4096
+
+
+class CompiledEnsemble:
+    def __init__(self, feature, threshold, leaf_value, depth, init_value, n_features):
+        self.feature = feature          # intp    (árboles * nodos internos)
+        self.threshold = threshold      # float32 (árboles * nodos internos)
+        self.leaf_value = leaf_value    # float64 (árboles * hojas) - ya multiplicado por learning_rate
+        self.depth = int(depth)
+        self.init_value = float(init_value)
+        self.n_features = int(n_features)
+
+        self.n_internal = 2 ** self.depth - 1
+        self.n_leaves = 2 ** self.depth
+        self.n_trees = len(feature) // self.n_internal
+        self._tree_base = (np.arange(self.n_trees, dtype=np.intp) * self.n_internal)[None, :]
+        self._leaf_base = (np.arange(self.n_trees, dtype=np.intp) * self.n_leaves)[None, :]
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Convierte un GradientBoostingRegressor ya entrenado en arrays planos."""
+        if not hasattr(model, "estimators_") or model.estimators_.shape[1] != 1:
+            raise TypeError("Solo se soportan GradientBoostingRegressor de una salida.")
+
+        init = model.init_
+        if isinstance(init, str) and init == "zero":
+            init_value = 0.0
+        elif hasattr(init, "constant_"):
+            init_value = float(np.ravel(init.constant_)[0])
+        else:
+            raise TypeError(f"Estimador inicial no soportado: {type(init).__name__}")
+
+        trees = [est.tree_ for est in model.estimators_[:, 0]]
+        depth = max(max(tree.max_depth for tree in trees), 1)
+        n_internal, n_leaves = 2 ** depth - 1, 2 ** depth
+
+        # Umbral +inf = "siempre a la izquierda": rellena las ramas que sklearn cortó antes
+        feature = np.zeros((len(trees), n_internal), dtype=np.intp)
+        threshold = np.full((len(trees), n_internal), np.inf, dtype=np.float64)
+        leaf_value = np.zeros((len(trees), n_leaves), dtype=np.float64)
+
+        for t, tree in enumerate(trees):
+            # Pila de (nodo sklearn, posición heap, nivel)
+            stack = [(0, 0, 0)]
+            while stack:
+                node, h, level = stack.pop()
+                if tree.children_left[node] == -1:
+                    # Hoja antes del fondo: baja siempre por la izquierda hasta el último nivel
+                    while level < depth:
+                        h, level = 2 * h + 1, level + 1
+                    leaf_value[t, h - n_internal] = tree.value[node, 0, 0] * model.learning_rate
+                    continue
+                feature[t, h] = tree.feature[node]
+                threshold[t, h] = tree.threshold[node]
+                stack.append((tree.children_left[node], 2 * h + 1, level + 1))
+                stack.append((tree.children_right[node], 2 * h + 2, level + 1))
+
+        return cls(
+            feature=np.ascontiguousarray(feature.ravel()),
+            threshold=_floor_to_float32(threshold.ravel()),
+            leaf_value=np.ascontiguousarray(leaf_value.ravel()),
+            depth=depth,
+            init_value=init_value,
+            n_features=model.n_features_in_,
+        )
+
+    def save(self, path, **meta):
+        """
+        Artefacto compacto `.npz` (sin pickle ni sklearn): arrays + metadatos de texto
+        (p. ej. `feature_names`, `model_version`). Se carga con `CompiledEnsemble.load`.
+        """
+        np.savez_compressed(
+            path,
+            feature=self.feature.astype(np.int32),  # n_features < 2^31: la mitad de bytes que intp
+            threshold=self.threshold,
+            leaf_value=self.leaf_value,
+            header=np.array([self.depth, self.n_features], dtype=np.int64),
+            init_value=np.array(self.init_value),
+            **{f"meta_{k}": np.asarray(v, dtype=str) for k, v in meta.items()},
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Devuelve (motor, metadatos) desde un artefacto creado con `save`."""
+        with np.load(path, allow_pickle=False) as data:
+            depth, n_features = (int(v) for v in data["header"])
+            engine = cls(
+                feature=data["feature"].astype(np.intp),
+                threshold=data["threshold"],
+                leaf_value=data["leaf_value"],
+                depth=depth,
+                init_value=float(data["init_value"]),
+                n_features=n_features,
+            )
+            meta = {k[len("meta_"):]: data[k].tolist() for k in data.files if k.startswith("meta_")}
+        return engine, meta
+
+    def predict(self, X):
+        """Predice un lote (n_filas x n_features). Devuelve float64 como sklearn."""
+        # sklearn evalúa los árboles sobre X en float32
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Se esperaban {self.n_features} features, recibido {X.shape}.")
+
+        out = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], CHUNK_ROWS):
+            block = X[start:start + CHUNK_ROWS]
+            out[start:start + len(block)] = self._predict_block(block)
+        return out
+
+    def _predict_block(self, X):
+        n = X.shape[0]
+        x_flat = X.ravel()
+        row_offset = (np.arange(n, dtype=np.intp) * self.n_features)[:, None]
+
+        # Posición heap actual de cada (fila, árbol); todos los árboles bajan un nivel por iteración
+        h = np.zeros((n, self.n_trees), dtype=np.intp)
+        for _ in range(self.depth):
+            node = self._tree_base + h
+            go_right = np.take(x_flat, row_offset + np.take(self.feature, node)) > np.take(self.threshold, node)
+            h = 2 * h + 1 + go_right
+
+        leaves = np.take(self.leaf_value, self._leaf_base + h - self.n_internal)
+        return self.init_value + leaves.sum(axis=1)
+
+
+def _floor_to_float32(threshold):
+    """
+    Redondea los umbrales float64 hacia abajo a float32.
+    Para x float32: x <= t (float64)  <=>  x <= floor32(t), así la comparación es exacta.
+    """
+    t32 = threshold.astype(np.float32)
+    over = t32.astype(np.float64) > threshold
+    t32[over] = np.nextafter(t32[over], np.float32(-np.inf))
+    return np.ascontiguousarray(t32)
+
+
+def check_equivalence(engine, model, X, rtol=1e-9, atol=1e-6):
+    """Compara el motor compilado con sklearn sobre un lote de prueba. Devuelve el error máximo."""
+    expected = model.predict(X)
+    got = engine.predict(np.asarray(X))
+    max_err = float(np.max(np.abs(expected - got))) if len(got) else 0.0
+    if not np.allclose(expected, got, rtol=rtol, atol=atol):
+        raise AssertionError(f"El motor compilado difiere de sklearn (error máximo {max_err:.3e}).")
+    return max_err
@@ -0,0 +1,85 @@
+"""
+Agregados de una ventana temporal en UNA sola lectura (`/api/dashboard/filtrar`).
+
+La ventana [start, end] se escanea una vez y se agrupa con GROUPING SETS en tres niveles:
+
+    (zone_name)   totales por zona (las 20): KPIs de la zona elegida + ranking de zonas
+    (sel_hour)    consumo por hora del día de la zona elegida
+    (sel_ts)      serie horaria de la zona elegida (primeros `series_limit` instantes)
+
+`sel_hour` / `sel_ts` solo tienen valor en las filas de la zona elegida; el resto cae en el
+grupo NULL, que se descarta en el HAVING. El resultado es independiente del backend:
+
+    {"zones":  {zona: {n_rows, sum, n_kwh, max, sum_temp, n_temp}},
+     "by_hour": [(hora, sum_kwh)],
+     "series":  [(timestamp, avg_kwh, avg_temp)]}
+
+`n_kwh` / `n_temp` cuentan los valores no nulos: AVG() del SQL = sum / n (no n_rows).
+"""
+from sqlalchemy import text
+
+from src.database import fetch_all
+
+# Instantes de la serie consumo/temperatura (una semana horaria)
+SERIES_LIMIT = 168
+
+# GROUPING(zone_name, sel_hour, sel_ts): bit a 1 = columna no agrupada en ese set
+ZONE_SET, HOUR_SET, SERIES_SET = 0b011, 0b101, 0b110
+
+
+def build_window_query(zone_name: str, start, end, series_limit: int = SERIES_LIMIT):
+    """Consulta única con los tres niveles de agregación. Devuelve (query, params)."""
+    query = text("""
+        WITH w AS (
+            SELECT zone_name, consumption_kwh, temperature,
+                   CASE WHEN zone_name = :zone THEN EXTRACT(HOUR FROM timestamp)::INTEGER END AS sel_hour,
+                   CASE WHEN zone_name = :zone THEN timestamp END AS sel_ts
+            FROM consumo_granada
+            WHERE timestamp BETWEEN :start AND :end
+        ),
+        agg AS (
+            SELECT GROUPING(zone_name, sel_hour, sel_ts) AS grp, zone_name, sel_hour, sel_ts,
+                   COUNT(*) AS n_rows, SUM(consumption_kwh) AS sum_kwh, COUNT(consumption_kwh) AS n_kwh,
+                   MAX(consumption_kwh) AS max_kwh, SUM(temperature) AS sum_temp, COUNT(temperature) AS n_temp,
+                   ROW_NUMBER() OVER (PARTITION BY GROUPING(zone_name, sel_hour, sel_ts) ORDER BY sel_ts) AS pos
+            FROM w
+            GROUP BY GROUPING SETS ((zone_name), (sel_hour), (sel_ts))
+            HAVING GROUPING(zone_name) = 0 OR sel_hour IS NOT NULL OR sel_ts IS NOT NULL
+        )
+        SELECT grp, zone_name, sel_hour, sel_ts, n_rows, sum_kwh, n_kwh, max_kwh, sum_temp, n_temp
+        FROM agg
+        WHERE grp <> :series_set OR pos <= :series_limit
+        ORDER BY grp, zone_name, sel_hour, sel_ts
+    """)
+    params = {
+        "zone": zone_name, "start": start, "end": end,
+        "series_set": SERIES_SET, "series_limit": series_limit,
+    }
+    return query, params
+
+
+def _avg(total, n):
+    return float(total) / n if n else None
+
+
+async def window_aggregates(zone_name: str, start, end, series_limit: int = SERIES_LIMIT):
+    """Los tres niveles de agregación de la ventana en un solo viaje a la BD."""
+    query, params = build_window_query(zone_name, start, end, series_limit)
+    rows = await fetch_all(query, params, name="window_aggregates")
+
+    result = {"zones": {}, "by_hour": [], "series": []}
+    for grp, zone, hour, ts, n_rows, sum_kwh, n_kwh, max_kwh, sum_temp, n_temp in rows:
+        if grp == ZONE_SET:
+            result["zones"][zone] = {
+                "n_rows": int(n_rows),
+                "sum": float(sum_kwh) if sum_kwh is not None else None,
+                "n_kwh": int(n_kwh),
+                "max": float(max_kwh) if max_kwh is not None else None,
+                "sum_temp": float(sum_temp) if sum_temp is not None else None,
+                "n_temp": int(n_temp),
+            }
+        elif grp == HOUR_SET:
+            result["by_hour"].append((int(hour), float(sum_kwh) if sum_kwh is not None else None))
+        elif grp == SERIES_SET:
+            result["series"].append((ts, _avg(sum_kwh or 0, n_kwh), _avg(sum_temp or 0, n_temp)))
+    return result
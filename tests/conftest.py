@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Permite importar src/ al lanzar "pytest" desde la raíz (igual que los scripts)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
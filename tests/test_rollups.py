@@ -0,0 +1,55 @@
+"""
+Planificador de rangos (`rollups.plan_range`): segmentos contiguos que cubren exactamente
+[start, end] y solo usan días/meses completos de los rollups.
+"""
+from datetime import datetime
+
+import pytest
+
+from src.services.rollups import DAILY_TABLE, MONTHLY_TABLE, RAW_TABLE, plan_range
+
+
+def _assert_covers(segments, start, end):
+    assert segments[0].start == start
+    assert segments[-1].end == end and segments[-1].inclusive_end
+    for prev, seg in zip(segments, segments[1:]):
+        assert prev.end == seg.start and not prev.inclusive_end
+
+
+def test_long_range_uses_days_and_months():
+    start, end = datetime(2023, 1, 15, 6), datetime(2023, 6, 10, 18)
+    segments = plan_range(start, end)
+    _assert_covers(segments, start, end)
+    assert [s.source for s in segments] == [RAW_TABLE, DAILY_TABLE, MONTHLY_TABLE, DAILY_TABLE, RAW_TABLE]
+    monthly = segments[2]
+    assert (monthly.start, monthly.end) == (datetime(2023, 2, 1), datetime(2023, 6, 1))
+
+
+def test_aligned_range_skips_empty_segments():
+    start, end = datetime(2023, 1, 1), datetime(2023, 12, 31, 23)
+    segments = plan_range(start, end)
+    _assert_covers(segments, start, end)
+    assert [s.source for s in segments] == [MONTHLY_TABLE, DAILY_TABLE, RAW_TABLE]
+
+
+def test_without_months_stays_in_days():
+    start, end = datetime(2023, 1, 15, 6), datetime(2023, 6, 10, 18)
+    segments = plan_range(start, end, use_months=False)
+    _assert_covers(segments, start, end)
+    assert [s.source for s in segments] == [RAW_TABLE, DAILY_TABLE, RAW_TABLE]
+
+
+@pytest.mark.parametrize("start, end", [
+    (datetime(2023, 3, 1, 5), datetime(2023, 3, 1, 20)),   # dentro de un día
+    (datetime(2023, 3, 1, 5), datetime(2023, 3, 2, 20)),   # ningún día completo
+])
+def test_short_range_is_raw(start, end):
+    segments = plan_range(start, end)
+    assert len(segments) == 1
+    assert segments[0].is_raw and segments[0].inclusive_end
+    assert (segments[0].start, segments[0].end) == (start, end)
+
+
+def test_rollups_disabled():
+    start, end = datetime(2020, 1, 1), datetime(2024, 1, 1)
+    assert [s.source for s in plan_range(start, end, use_rollups=False)] == [RAW_TABLE]
@@ -0,0 +1,45 @@
+"""
+Submuestreo LTTB de las series (`series.lttb_indices`): longitud pedida, extremos
+conservados y huecos (NaN) que no rompen la selección.
+"""
+import numpy as np
+import pytest
+
+from src.services.series import lttb_indices
+
+
+def _series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.sin(np.arange(n) / 24 * 2 * np.pi) * 50 + 100 + rng.normal(scale=5, size=n)
+
+
+@pytest.mark.parametrize("n", [0, 1, 10, 500])
+def test_short_series_keeps_every_point(n):
+    np.testing.assert_array_equal(lttb_indices(np.ones(n), 500), np.arange(n))
+
+
+@pytest.mark.parametrize("n_out", [3, 50, 499])
+def test_output_length_and_order(n_out):
+    idx = lttb_indices(_series(5000), n_out)
+    assert len(idx) == n_out
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_keeps_first_last_and_extremes():
+    y = _series(5000)
+    y[1234], y[3210] = 1000.0, -1000.0
+    idx = lttb_indices(y, 100)
+    assert {0, len(y) - 1, 1234, 3210} <= set(idx.tolist())
+
+
+def test_nan_gaps_are_not_selected_as_extremes():
+    y = _series(2000)
+    y[100:300] = np.nan
+    idx = lttb_indices(y, 80)
+    assert len(idx) == 80
+    assert {0, len(y) - 1, int(np.nanargmax(y)), int(np.nanargmin(y))} <= set(idx.tolist())
+
+
+def test_all_nan_series():
+    idx = lttb_indices(np.full(1000, np.nan), 50)
+    assert len(idx) == 50 and idx[0] == 0 and idx[-1] == 999
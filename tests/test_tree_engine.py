@@ -0,0 +1,83 @@
+"""
+Equivalencia del motor compilado (`tree_engine.CompiledEnsemble`) con el
+GradientBoostingRegressor de sklearn: mismo resultado en cualquier tamaño de lote,
+tras guardar/cargar el artefacto y con entradas justo en los umbrales.
+"""
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor
+
+from src.config import COMPILED_MAX_BATCH
+from src.services.tree_engine import CHUNK_ROWS, CompiledEnsemble, check_equivalence
+
+N_FEATURES = 6
+
+
+@pytest.fixture(scope="module", params=["default", "zero"])
+def model(request):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, N_FEATURES))
+    X[:, 3] = rng.integers(0, 2, size=len(X))  # columna binaria, como el one-hot de zonas
+    y = 3 * X[:, 0] - 2 * X[:, 1] ** 2 + 5 * X[:, 3] + rng.normal(scale=0.1, size=len(X))
+    # min_samples_leaf deja árboles incompletos: ramas cortadas antes del fondo del heap
+    params = {"init": "zero"} if request.param == "zero" else {}
+    return GradientBoostingRegressor(
+        n_estimators=25, max_depth=4, min_samples_leaf=40, random_state=0, **params
+    ).fit(X, y)
+
+
+def _random_rows(n, seed=1):
+    return np.random.default_rng(seed).normal(size=(n, N_FEATURES))
+
+
+@pytest.mark.parametrize("n_rows", [1, COMPILED_MAX_BATCH, COMPILED_MAX_BATCH + 1, CHUNK_ROWS + 7])
+def test_predict_matches_sklearn(model, n_rows):
+    X = _random_rows(n_rows)
+    engine = CompiledEnsemble.from_sklearn(model)
+    np.testing.assert_allclose(engine.predict(X), model.predict(X), rtol=1e-9, atol=1e-9)
+
+
+def test_inputs_on_thresholds(model):
+    """x == umbral va a la izquierda, igual que sklearn (que compara en float32)."""
+    rows = []
+    for est in model.estimators_[:, 0]:
+        tree = est.tree_
+        for f, t in zip(tree.feature, tree.threshold):
+            if f < 0:
+                continue
+            t32 = np.float32(t)
+            for value in (t32, np.nextafter(t32, np.float32(-np.inf)), np.nextafter(t32, np.float32(np.inf)), t):
+                row = np.zeros(N_FEATURES)
+                row[f] = value
+                rows.append(row)
+    X = np.array(rows)
+    engine = CompiledEnsemble.from_sklearn(model)
+    np.testing.assert_allclose(engine.predict(X), model.predict(X), rtol=1e-9, atol=1e-9)
+
+
+def test_save_load_round_trip(model, tmp_path):
+    engine = CompiledEnsemble.from_sklearn(model)
+    path = tmp_path / "model.npz"
+    engine.save(path, feature_names=[f"f{i}" for i in range(N_FEATURES)], model_version="abc123")
+
+    loaded, meta = CompiledEnsemble.load(path)
+    X = _random_rows(500, seed=2)
+    np.testing.assert_array_equal(loaded.predict(X), engine.predict(X))
+    assert meta == {"feature_names": [f"f{i}" for i in range(N_FEATURES)], "model_version": "abc123"}
+    assert (loaded.depth, loaded.n_features, loaded.n_trees) == (engine.depth, engine.n_features, engine.n_trees)
+
+
+def test_check_equivalence_detects_mismatch(model):
+    engine = CompiledEnsemble.from_sklearn(model)
+    X = _random_rows(64)
+    assert check_equivalence(engine, model, X) < 1e-6
+
+    engine.leaf_value = engine.leaf_value + 1.0
+    with pytest.raises(AssertionError):
+        check_equivalence(engine, model, X)
+
+
+def test_rejects_wrong_feature_count(model):
+    engine = CompiledEnsemble.from_sklearn(model)
+    with pytest.raises(ValueError):
+        engine.predict(np.zeros((3, N_FEATURES + 1)))